@@ -0,0 +1,455 @@
+"""Asyncio-версия бота на AsyncTeleBot.
+
+Тот же диалог UserState и те же тексты, что в main.py, но обработчики
+ждут сетевых вызовов Bot API асинхронно, поэтому тысячи незавершенных
+диалогов обслуживаются одним циклом событий.
+
+Запуск: python async_main.py
+"""
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from telebot import asyncio_helper, types
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_filters import StateFilter
+from telebot.asyncio_handler_backends import State, StatesGroup
+
+import drivers
+import keyboards
+import messages
+import tariff
+import validation
+from logging_setup import setup_logging
+from quote_cache import QuoteCache
+from quote_history import QuoteHistory
+from sessions import AsyncSessionStore
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+# Запись логов идет в фоновом потоке и не блокирует цикл событий
+setup_logging(
+    path=os.getenv('LOG_FILE') or None,
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    fmt=os.getenv('LOG_FORMAT', 'text'),
+    max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+    when=os.getenv('LOG_ROTATE_WHEN'),
+)
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = int(os.getenv('HISTORY_LIMIT', 5))
+MAX_DRIVERS = int(os.getenv('MAX_DRIVERS', 50))
+SESSION_TTL = int(os.getenv('SESSION_TTL', 3600))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', 10000))
+
+
+class UserState(StatesGroup):
+    waiting_for_insurance_type = State()
+    waiting_for_city = State()
+    waiting_for_power = State()
+    waiting_for_experience = State()
+    waiting_for_age = State()
+    waiting_for_period = State()
+    waiting_for_novice = State()
+    waiting_for_accidents = State()
+    waiting_for_accident_period = State()
+    waiting_for_drivers = State()
+
+
+def create_bot(token, api_url=None, history=None):
+    """Создает асинхронного бота со всеми обработчиками диалога.
+
+    history — quote_history.QuoteHistory; без нее расчеты не сохраняются,
+    а /history и /repeat не регистрируются.
+    """
+    if api_url:
+        asyncio_helper.API_URL = api_url.rstrip('/') + '/bot{0}/{1}'
+        asyncio_helper.FILE_URL = api_url.rstrip('/') + '/file/bot{0}/{1}'
+
+    # Состояния FSM, черновики диалога и последние расчеты чатов: устаревшие и лишние записи вытесняются
+    bot = AsyncTeleBot(token, state_storage=AsyncSessionStore(maxsize=SESSION_MAX_ENTRIES, ttl=SESSION_TTL))
+    user_data = TTLCache(maxsize=SESSION_MAX_ENTRIES, ttl=SESSION_TTL)
+    last_quotes = TTLCache(maxsize=SESSION_MAX_ENTRIES, ttl=SESSION_TTL)
+    quote_cache = QuoteCache()
+
+    def draft(chat_id):
+        """Данные текущего расчета чата; InputError, если расчет не начат или устарел."""
+        data = user_data.get(chat_id)
+        if data is None:
+            raise validation.InputError(messages.DATA_NOT_FOUND)
+        return data
+
+    async def start(message):
+        logger.info(f"Пользователь {message.chat.id} запустил бота")
+        await bot.send_message(message.chat.id, messages.WELCOME, reply_markup=keyboards.start_menu())
+
+    async def show_help(message):
+        await bot.send_message(message.chat.id, messages.HELP, parse_mode='HTML')
+
+    async def start_calculation(message):
+        try:
+            user_data.set(message.chat.id, {})
+            await bot.send_message(
+                message.chat.id, messages.ASK_INSURANCE_TYPE, reply_markup=keyboards.insurance_types()
+            )
+            await bot.set_state(message.from_user.id, UserState.waiting_for_insurance_type, message.chat.id)
+            logger.info(f"Пользователь {message.chat.id} начал расчет")
+        except Exception as e:
+            logger.error(f"Ошибка в start_calculation: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def show_instructions(message):
+        await bot.send_message(
+            message.chat.id, messages.INSTRUCTIONS, parse_mode='HTML',
+            reply_markup=keyboards.instructions_menu()
+        )
+
+    async def quick_quote(message):
+        try:
+            data = validation.parse_quote(message.text)
+        except validation.InputError as e:
+            text = str(e) if e.field is None else f"❌ {e}\n\n{messages.QUOTE_USAGE}"
+            await bot.send_message(message.chat.id, text)
+            return
+        except Exception as e:
+            logger.error(f"Ошибка в quick_quote: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+            return
+        await perform_calculation(message.chat.id, message.from_user.id, data, finish_session=False)
+
+    async def compare_quotes(message):
+        data = last_quotes.get(message.chat.id)
+        if not data:
+            await bot.send_message(message.chat.id, messages.COMPARE_NO_QUOTE)
+            return
+        if 'drivers' in data:
+            await bot.send_message(message.chat.id, messages.COMPARE_SINGLE_DRIVER)
+            return
+        try:
+            # NumPy нужен только для сравнения — не при запуске бота
+            import batch_quote
+
+            cities = [] if message.text == messages.BTN_COMPARE else validation.parse_compare_cities(message.text)
+            grid = batch_quote.compare_profile(data, cities or batch_quote.COMPARE_CITIES)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+            return
+        except Exception as e:
+            logger.error(f"Ошибка в compare_quotes: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+            return
+        await bot.send_message(message.chat.id, messages.format_compare(data, grid), parse_mode='HTML')
+
+    async def add_drivers(message):
+        data = last_quotes.get(message.chat.id)
+        if not data:
+            await bot.send_message(message.chat.id, messages.DRIVERS_NO_QUOTE)
+            return
+        text = message.text.split(maxsplit=1)[1:] if message.text.startswith('/') else []
+        if text:
+            await price_drivers(message, data, text[0])
+            return
+        count = drivers.count(data['drivers']) if 'drivers' in data else 1
+        await bot.send_message(
+            message.chat.id, messages.ASK_DRIVERS.format(count=count, limit=MAX_DRIVERS),
+            reply_markup=keyboards.remove(), parse_mode='HTML'
+        )
+        await bot.set_state(message.from_user.id, UserState.waiting_for_drivers, message.chat.id)
+
+    async def price_drivers(message, data, text):
+        try:
+            added = validation.parse_drivers(text)
+            packed = data.get('drivers') or drivers.pack([drivers.from_profile(data)])
+            if drivers.count(packed) + len(added) > MAX_DRIVERS:
+                await bot.send_message(
+                    message.chat.id,
+                    messages.DRIVERS_TOO_MANY.format(limit=MAX_DRIVERS, count=drivers.count(packed))
+                )
+                return
+            await perform_calculation(
+                message.chat.id, message.from_user.id, {**data, 'drivers': packed + drivers.pack(added)}
+            )
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в price_drivers: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_drivers(message):
+        data = last_quotes.get(message.chat.id)
+        if not data:
+            await bot.send_message(message.chat.id, messages.DATA_NOT_FOUND)
+            return
+        await price_drivers(message, data, message.text)
+
+    async def show_history(message):
+        try:
+            # Чтение SQLite блокирует — в пуле потоков, чтобы не останавливать цикл событий
+            entries = await asyncio.to_thread(history.recent, message.chat.id, HISTORY_LIMIT)
+        except Exception as e:
+            logger.error(f"Ошибка в show_history: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+            return
+        await bot.send_message(
+            message.chat.id, messages.format_history(entries) if entries else messages.HISTORY_EMPTY,
+            parse_mode='HTML'
+        )
+
+    async def repeat_last_quote(message):
+        try:
+            entry = await asyncio.to_thread(history.last, message.chat.id)
+        except Exception as e:
+            logger.error(f"Ошибка в repeat_last_quote: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+            return
+        if entry is None:
+            await bot.send_message(message.chat.id, messages.HISTORY_EMPTY)
+            return
+        if entry['quote']['tariff_version'] != tariff.VERSION:
+            await perform_calculation(message.chat.id, message.from_user.id, entry['data'], finish_session=False)
+            return
+        await bot.send_message(
+            message.chat.id, messages.format_result(entry['data'], entry['quote']),
+            reply_markup=keyboards.result_menu(), parse_mode='HTML'
+        )
+        last_quotes.set(message.chat.id, entry['data'])
+
+    async def get_insurance_type(message):
+        try:
+            data = draft(message.chat.id)
+            insurance_type = validation.parse_insurance_type(message.text)
+            data['insurance_type'] = insurance_type
+            data['ko'] = tariff.KO_COEFFICIENTS[insurance_type]
+            await bot.send_message(message.chat.id, messages.ASK_CITY, reply_markup=keyboards.cities())
+            await bot.set_state(message.from_user.id, UserState.waiting_for_city, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_insurance_type: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_city(message):
+        try:
+            data = draft(message.chat.id)
+            city = validation.parse_city(message.text)
+            data['city'] = city
+            data['kt'] = tariff.KT_COEFFICIENTS[city]
+            await bot.send_message(message.chat.id, messages.ASK_POWER, reply_markup=keyboards.remove())
+            await bot.set_state(message.from_user.id, UserState.waiting_for_power, message.chat.id)
+        except validation.InputError as e:
+            markup = keyboards.city_suggestions(e.options) if e.options else keyboards.cities()
+            await bot.send_message(message.chat.id, str(e), reply_markup=markup)
+        except Exception as e:
+            logger.error(f"Ошибка в get_city: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_power(message):
+        try:
+            data = draft(message.chat.id)
+            data['power'] = validation.parse_power(message.text)
+            await bot.send_message(message.chat.id, messages.ASK_EXPERIENCE)
+            await bot.set_state(message.from_user.id, UserState.waiting_for_experience, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_power: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_experience(message):
+        try:
+            data = draft(message.chat.id)
+            data['experience'] = validation.parse_experience(message.text)
+            await bot.send_message(message.chat.id, messages.ASK_AGE)
+            await bot.set_state(message.from_user.id, UserState.waiting_for_age, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_experience: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_age(message):
+        try:
+            data = draft(message.chat.id)
+            data['age'] = validation.parse_age(message.text)
+            await bot.send_message(message.chat.id, messages.ASK_PERIOD, reply_markup=keyboards.periods())
+            await bot.set_state(message.from_user.id, UserState.waiting_for_period, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_age: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_period(message):
+        try:
+            data = draft(message.chat.id)
+            period = validation.parse_period(message.text)
+            data['period'] = period
+            data['kc'] = tariff.KC_COEFFICIENTS[period]
+            await bot.send_message(message.chat.id, messages.ASK_NOVICE, reply_markup=keyboards.yes_no())
+            await bot.set_state(message.from_user.id, UserState.waiting_for_novice, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_period: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_novice(message):
+        try:
+            data = draft(message.chat.id)
+            is_novice = validation.parse_yes_no(message.text)
+            data['is_novice'] = is_novice
+            if is_novice:
+                data['kbm'] = tariff.NOVICE_KBM
+                await perform_calculation(message.chat.id, message.from_user.id)
+            else:
+                await bot.send_message(message.chat.id, messages.ASK_ACCIDENTS, reply_markup=keyboards.accidents())
+                await bot.set_state(message.from_user.id, UserState.waiting_for_accidents, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_novice: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_accidents(message):
+        try:
+            data = draft(message.chat.id)
+            data['accidents'] = validation.parse_accidents(message.text)
+            await bot.send_message(
+                message.chat.id, messages.ASK_ACCIDENT_PERIOD, reply_markup=keyboards.accident_periods()
+            )
+            await bot.set_state(message.from_user.id, UserState.waiting_for_accident_period, message.chat.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_accidents: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def get_accident_period(message):
+        try:
+            data = draft(message.chat.id)
+            accident_period = validation.parse_accident_period(message.text)
+            data['accident_period'] = accident_period
+            accidents = data.get('accidents', 0)
+            data['kbm'] = tariff.kbm_coef(accident_period, accidents)
+            await perform_calculation(message.chat.id, message.from_user.id)
+        except validation.InputError as e:
+            await bot.send_message(message.chat.id, str(e))
+        except Exception as e:
+            logger.error(f"Ошибка в get_accident_period: {e}")
+            await bot.send_message(message.chat.id, messages.ERROR)
+
+    async def perform_calculation(chat_id, user_id, data=None, finish_session=True):
+        try:
+            if data is None:
+                data = user_data.get(chat_id, {})
+            if not data:
+                await bot.send_message(chat_id, messages.DATA_NOT_FOUND)
+                return
+            result, price_text = quote_cache.quote(data)
+            await bot.send_message(
+                chat_id, messages.format_result(data, result, price_text),
+                reply_markup=keyboards.result_menu(), parse_mode='HTML'
+            )
+            data = dict(data)
+            last_quotes.set(chat_id, data)
+            if history is not None:
+                history.record(chat_id, data, result)
+            logger.info(f"Пользователь {chat_id} выполнил расчет: {result['summa_min']} - {result['summa_max']} руб.")
+        except Exception as e:
+            logger.error(f"Ошибка в perform_calculation для пользователя {chat_id}: {e}")
+            await bot.send_message(chat_id, messages.CALCULATION_ERROR)
+        finally:
+            if finish_session:
+                try:
+                    await bot.delete_state(user_id, chat_id)
+                    user_data.pop(chat_id, None)
+                except Exception:
+                    pass
+
+    async def handle_other_messages(message):
+        if message.text and len(message.text.split()) >= validation.QUOTE_MIN_WORDS:
+            try:
+                data = validation.parse_quote(message.text)
+            except validation.InputError:
+                pass
+            else:
+                await perform_calculation(message.chat.id, message.from_user.id, data, finish_session=False)
+                return
+        if message.text not in messages.MENU_BUTTONS:
+            await bot.send_message(
+                message.chat.id, messages.OTHER_MESSAGE, reply_markup=keyboards.other_messages_menu()
+            )
+
+    async def inline_quote(inline_query):
+        try:
+            try:
+                data = validation.parse_quote(inline_query.query, partial=True)
+            except validation.InputError:
+                results = [types.InlineQueryResultArticle(
+                    'help', messages.INLINE_HELP_TITLE,
+                    types.InputTextMessageContent(messages.QUOTE_USAGE),
+                    description=messages.INLINE_HELP_DESCRIPTION
+                )]
+            else:
+                result, price_text = quote_cache.quote(data)
+                results = [types.InlineQueryResultArticle(
+                    f"{result['summa_min']}-{result['summa_max']}", messages.format_inline_title(result),
+                    types.InputTextMessageContent(messages.format_result(data, result, price_text), parse_mode='HTML'),
+                    description=messages.format_inline_description(data, result)
+                )]
+            await bot.answer_inline_query(inline_query.id, results, cache_time=300)
+        except Exception as e:
+            logger.error(f"Ошибка в inline_quote: {e}")
+
+    # Порядок регистрации совпадает с main.py
+    bot.register_message_handler(start, commands=['start'])
+    bot.register_message_handler(show_help, commands=['help'])
+    bot.register_message_handler(show_help, func=lambda message: message.text == messages.BTN_HELP)
+    bot.register_message_handler(start_calculation, commands=['calc'])
+    bot.register_message_handler(start_calculation, func=lambda message: message.text == messages.BTN_START_CALC)
+    bot.register_message_handler(show_instructions, func=lambda message: message.text == messages.BTN_INSTRUCTIONS)
+    bot.register_message_handler(quick_quote, commands=['quote'])
+    bot.register_message_handler(compare_quotes, commands=['compare'])
+    bot.register_message_handler(compare_quotes, func=lambda message: message.text == messages.BTN_COMPARE)
+    bot.register_message_handler(add_drivers, commands=['drivers'])
+    bot.register_message_handler(add_drivers, func=lambda message: message.text == messages.BTN_ADD_DRIVERS)
+    if history is not None:
+        bot.register_message_handler(show_history, commands=['history'])
+        bot.register_message_handler(repeat_last_quote, commands=['repeat'])
+        bot.register_message_handler(repeat_last_quote, func=lambda message: message.text == messages.BTN_REPEAT)
+    bot.register_message_handler(get_insurance_type, state=UserState.waiting_for_insurance_type)
+    bot.register_message_handler(get_city, state=UserState.waiting_for_city)
+    bot.register_message_handler(get_power, state=UserState.waiting_for_power)
+    bot.register_message_handler(get_experience, state=UserState.waiting_for_experience)
+    bot.register_message_handler(get_age, state=UserState.waiting_for_age)
+    bot.register_message_handler(get_period, state=UserState.waiting_for_period)
+    bot.register_message_handler(get_novice, state=UserState.waiting_for_novice)
+    bot.register_message_handler(get_accidents, state=UserState.waiting_for_accidents)
+    bot.register_message_handler(get_accident_period, state=UserState.waiting_for_accident_period)
+    bot.register_message_handler(get_drivers, state=UserState.waiting_for_drivers)
+    bot.register_message_handler(start_calculation, func=lambda message: message.text == messages.BTN_NEW_CALC)
+    bot.register_message_handler(handle_other_messages, func=lambda message: True)
+    bot.register_inline_handler(inline_quote, func=lambda query: True)
+    bot.add_custom_filter(StateFilter(bot))
+    return bot
+
+
+async def main():
+    token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not token:
+        logger.error("Токен бота не найден! Убедитесь, что файл .env существует и содержит TELEGRAM_BOT_TOKEN")
+        raise ValueError("Токен бота не найден")
+    history = QuoteHistory(os.getenv('HISTORY_DB_PATH', 'history.db')).start()
+    bot = create_bot(token, os.getenv('TELEGRAM_API_URL'), history=history)
+    logger.info("Асинхронный бот запускается...")
+    try:
+        await bot.infinity_polling(timeout=60)
+    finally:
+        history.stop(timeout=10)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
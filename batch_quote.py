@@ -0,0 +1,225 @@
+"""Пакетный расчет ОСАГО для автопарков (юридических лиц).
+
+Принимает столбцы одинаковой длины и считает summa_min/summa_max для всех
+строк сразу векторными выборками из таблиц KT/KBS/KBM/KM/KC. quote_grid
+тем же способом считает один профиль водителя на сетке «период × город ×
+стаж» для сравнения вариантов. driver_coefficients находит КВС и КБМ
+полиса на длинный список водителей одной выборкой.
+
+Модуль импортирует NumPy, поэтому бот импортирует его только там, где
+он нужен (сравнение, автопарк, длинный список водителей), а не при
+запуске.
+"""
+import numpy as np
+
+import drivers
+import tariff
+
+FLEET_INSURANCE_TYPE = 'Юридическое лицо'
+
+# Сравнение вариантов: город профиля и эти города, стаж ± столько лет
+COMPARE_CITIES = ('Москва', 'Санкт-Петербург')
+COMPARE_EXPERIENCE_DELTA = 2
+COMPARE_MAX_CITIES = 4
+
+
+class BatchTables:
+    """Таблицы коэффициентов одной версии тарифов в виде массивов NumPy."""
+
+    def __init__(self, current):
+        self.tariff = current
+        self.kbs_bounds = np.array(current.kbs_age_bounds, dtype=np.float64)
+        self.kbs_bands = current.kbs_bands
+        self.kbs = np.array(current.kbs_table, dtype=np.float64)
+
+        max_period = max(per for per, _ in current.kbm_table)
+        max_accidents = max(acc for _, acc in current.kbm_table)
+        self.kbm = np.full((max_period + 1, max_accidents + 1), tariff.DEFAULT_KBM)
+        for (per, acc), coef in current.kbm_table.items():
+            if per >= 0 and acc >= 0:
+                self.kbm[per, acc] = coef
+
+        self.kc = np.full(max(current.kc_coefficients) + 1, float(tariff.DEFAULT_KC))
+        for period, coef in current.kc_coefficients.items():
+            self.kc[period] = coef
+
+        self.km_limits = np.array(current.km_limits, dtype=np.float64)
+        # Последний элемент — коэффициент для мощности выше максимальной
+        self.km = np.append(np.array(current.km_values), tariff.KM_OVER_MAX)
+
+
+_tables = None
+
+
+def get_tables(current=None):
+    """Массивы для тарифов current (по умолчанию текущих); пересобираются при их смене."""
+    global _tables
+    current = current or tariff.current()
+    tables = _tables
+    if tables is None or tables.tariff is not current:
+        tables = _tables = BatchTables(current)
+    return tables
+
+
+def _int_index(values, size):
+    """Индексы целых значений в диапазоне [0, size) и маска допустимых строк."""
+    valid = (values == np.floor(values)) & (values >= 0) & (values < size)
+    return np.where(valid, values, 0).astype(np.intp), valid
+
+
+def ko_column(insurance_type, rows, current):
+    if insurance_type is None:
+        return np.full(rows, current.ko_coef(FLEET_INSURANCE_TYPE))
+    if isinstance(insurance_type, str):
+        return np.full(rows, current.ko_coef(insurance_type))
+    return map_column(insurance_type, current.ko_coef)
+
+
+def map_column(values, coef):
+    """Применяет coef только к уникальным значениям столбца."""
+    codes = {}
+    index = np.fromiter((codes.setdefault(value, len(codes)) for value in values),
+                        dtype=np.intp, count=len(values))
+    mapped = np.array([coef(value) for value in codes], dtype=np.float64)
+    return mapped[index]
+
+
+def kt_column(city, current):
+    # Город из файла сверяется с таблицей без учета регистра, ё/е и дефисов
+    find = current.city_index.find
+    return map_column(city, lambda name: current.kt_coef(find(str(name)) or name))
+
+
+def kbs_column(experience, age, tables):
+    exp = np.trunc(np.minimum(experience, tariff.MAX_EXPERIENCE))
+    band = np.searchsorted(tables.kbs_bounds, age, side='right') - 1
+    valid = (exp >= 0) & (band >= 0) & (age < tables.kbs_bounds[-1])
+    index = np.where(valid, exp * tables.kbs_bands + band, 0).astype(np.intp)
+    return np.where(valid, tables.kbs[index], tariff.DEFAULT_KBS)
+
+
+def kbm_column(period, accidents, tables):
+    per, per_valid = _int_index(period, tables.kbm.shape[0])
+    acc, acc_valid = _int_index(accidents, tables.kbm.shape[1])
+    return np.where(per_valid & acc_valid, tables.kbm[per, acc], tariff.DEFAULT_KBM)
+
+
+def kc_column(period, tables):
+    index, valid = _int_index(period, tables.kc.shape[0])
+    return np.where(valid, tables.kc[index], float(tariff.DEFAULT_KC))
+
+
+def km_column(power, tables):
+    km = tables.km[np.searchsorted(tables.km_limits, power, side='left')]
+    # NaN не попадает ни в одну границу и получает коэффициент 1
+    return np.where(np.isnan(power), 1.0, km)
+
+
+def quote_batch(city, power, experience, age, period, accidents, accident_period,
+                insurance_type=None, novice=None, current=None):
+    """Считает стоимость полиса для всех строк.
+
+    insurance_type — строка для всего пакета или столбец (по умолчанию
+    юридическое лицо). accident_period 0 — история аварий не указана,
+    КБМ базовый (tariff.BASE_KBM). novice — необязательный булев столбец:
+    для новичков КБМ равен 1.17, аварии не учитываются. current — тарифы для расчета
+    (по умолчанию текущие).
+
+    Возвращает словарь столбцов ko, kt, kbs, kc, kbm, km, summa_min, summa_max
+    и tariff_version — версию тарифов, по которой посчитаны все строки.
+    """
+    tables = get_tables(current)
+    current = tables.tariff
+    power = np.asarray(power, dtype=np.float64)
+    experience = np.asarray(experience, dtype=np.float64)
+    age = np.asarray(age, dtype=np.float64)
+    period = np.asarray(period, dtype=np.float64)
+    accidents = np.asarray(accidents, dtype=np.float64)
+    accident_period = np.asarray(accident_period, dtype=np.float64)
+    rows = len(power)
+
+    ko = ko_column(insurance_type, rows, current)
+    kt = kt_column(city, current)
+    kbs = kbs_column(experience, age, tables)
+    kc = kc_column(period, tables)
+    kbm = np.where(accident_period > 0, kbm_column(accident_period, accidents, tables), float(tariff.BASE_KBM))
+    if novice is not None:
+        kbm = np.where(np.asarray(novice, dtype=bool), tariff.NOVICE_KBM, kbm)
+    km = km_column(power, tables)
+
+    # Порядок умножения совпадает с tariff.calculate
+    summa_min = (current.tarif_min * ko * km * kc * kbs * kbm * kt).astype(np.int64)
+    summa_max = (current.tarif_max * ko * km * kc * kbs * kbm * kt).astype(np.int64)
+    return {
+        'ko': ko, 'kt': kt, 'kbs': kbs, 'kc': kc, 'kbm': kbm, 'km': km,
+        'summa_min': summa_min, 'summa_max': summa_max,
+        'tariff_version': current.version,
+    }
+
+
+def quote_grid(data, periods, cities, experiences, current=None):
+    """Стоимость профиля data для всех сочетаний периода, города и стажа.
+
+    Остальные коэффициенты (КО, КМ, КБМ, возраст) берутся из data как
+    в tariff.quote. Возвращает словарь с осями periods, cities, experiences,
+    массивами summa_min и summa_max формы (периоды, города, стаж) и
+    tariff_version.
+    """
+    tables = get_tables(current)
+    current = tables.tariff
+    base = current.coefficients(data)
+    experience = np.asarray(experiences, dtype=np.float64)
+
+    kc = kc_column(np.asarray(periods, dtype=np.float64), tables)[:, None, None]
+    kt = kt_column(cities, current)[None, :, None]
+    kbs = kbs_column(experience, np.full(len(experience), float(base['age'])), tables)[None, None, :]
+
+    # Порядок умножения совпадает с tariff.calculate, поэтому суммы те же, что в обычном расчете
+    summa_min = (current.tarif_min * base['ko'] * base['km'] * kc * kbs * base['kbm'] * kt).astype(np.int64)
+    summa_max = (current.tarif_max * base['ko'] * base['km'] * kc * kbs * base['kbm'] * kt).astype(np.int64)
+    return {
+        'periods': list(periods), 'cities': list(cities), 'experiences': list(experiences),
+        'summa_min': summa_min, 'summa_max': summa_max,
+        'kbm': base['kbm'], 'tariff_version': current.version,
+    }
+
+
+def driver_coefficients(packed, current=None):
+    """То же, что drivers.coefficients, одной выборкой из таблиц по всему списку.
+
+    Наибольшие КВС и КБМ ищутся по массивам; значения для ответа берутся
+    из тарифов скалярно только для найденных водителей, поэтому совпадают
+    с расчетом на одного водителя (и с ключами кэша расчетов).
+    """
+    tables = get_tables(current)
+    current = tables.tariff
+    table = drivers.unpack(packed)
+    experience = table['experience'] / 10
+    kbs = kbs_column(experience, table['age'].astype(np.float64), tables)
+    accident_period = table['accident_period'].astype(np.float64)
+    kbm = np.where(
+        table['novice'] == 1, tariff.NOVICE_KBM,
+        np.where(accident_period > 0, kbm_column(accident_period, table['accidents'].astype(np.float64), tables),
+                 float(tariff.BASE_KBM))
+    )
+    i = int(np.argmax(kbs))
+    j = int(np.argmax(kbm))
+    return {
+        'kbs': current.kbs_coef(float(experience[i]), int(table['age'][i])),
+        'kbm': drivers.kbm(table['novice'][j], int(table['accidents'][j]), int(table['accident_period'][j]), current),
+        'drivers': len(table), 'kbs_driver': i + 1, 'kbm_driver': j + 1,
+    }
+
+
+def compare_profile(data, cities=COMPARE_CITIES, experience_delta=COMPARE_EXPERIENCE_DELTA,
+                    max_cities=COMPARE_MAX_CITIES, current=None):
+    """Сетка сравнения для профиля data: все периоды КС, город профиля и cities,
+    стаж от experience - experience_delta до experience + experience_delta."""
+    current = current or tariff.current()
+    find = current.city_index.find
+    names = [find(name) for name in (data['city'], *cities)]
+    names = list(dict.fromkeys(name for name in names if name is not None))[:max_cities]
+    experience = data['experience']
+    experiences = [experience + delta for delta in range(-experience_delta, experience_delta + 1)
+                   if experience + delta >= 0]
+    return quote_grid(data, sorted(current.kc_coefficients), names, experiences, current)
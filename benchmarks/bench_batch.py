@@ -0,0 +1,68 @@
+"""Сравнение пакетного расчета с построчным циклом на 10 тыс. и 1 млн строк.
+
+Запуск: python benchmarks/bench_batch.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tariff
+from batch_quote import FLEET_INSURANCE_TYPE, quote_batch
+
+
+def make_rows(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = np.array(list(tariff.KT_COEFFICIENTS) + ['Тверь'], dtype=object)
+    return {
+        'city': cities[rng.integers(0, len(cities), rows)],
+        'power': rng.integers(40, 250, rows).astype(np.float64),
+        'experience': rng.integers(0, 40, rows).astype(np.float64),
+        'age': rng.integers(18, 80, rows).astype(np.float64),
+        'period': rng.integers(3, 13, rows).astype(np.float64),
+        'accidents': rng.integers(0, 6, rows).astype(np.float64),
+        'accident_period': rng.integers(1, 13, rows).astype(np.float64),
+    }
+
+
+def quote_loop(columns):
+    ko = tariff.ko_coef(FLEET_INSURANCE_TYPE)
+    summa_min = []
+    summa_max = []
+    for city, power, experience, age, period, accidents, accident_period in zip(
+            columns['city'], columns['power'].tolist(), columns['experience'].tolist(),
+            columns['age'].tolist(), columns['period'].tolist(),
+            columns['accidents'].tolist(), columns['accident_period'].tolist()):
+        low, high = tariff.calculate(
+            ko, tariff.km_coef(power), tariff.kc_coef(int(period)),
+            tariff.kbs_coef(experience, age), tariff.kbm_coef(int(accident_period), int(accidents)),
+            tariff.kt_coef(city),
+        )
+        summa_min.append(low)
+        summa_max.append(high)
+    return summa_min, summa_max
+
+
+def main():
+    for rows in (10_000, 1_000_000):
+        columns = make_rows(rows)
+
+        started = time.perf_counter()
+        loop_min, loop_max = quote_loop(columns)
+        loop_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = quote_batch(**columns)
+        batch_seconds = time.perf_counter() - started
+
+        assert result['summa_min'].tolist() == loop_min
+        assert result['summa_max'].tolist() == loop_max
+        print(f"{rows:>9} строк: цикл {loop_seconds:.3f} с, пакет {batch_seconds:.3f} с, "
+              f"ускорение x{loop_seconds / batch_seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
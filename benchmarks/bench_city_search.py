@@ -0,0 +1,129 @@
+"""Поиск города: время запроса и точность на полной таблице территорий.
+
+Полной таблицы муниципальных образований в репозитории нет, поэтому
+названия генерируются: корни и суффиксы русских топонимов, составные
+«Ново-»/«Верхне-», «X-на-Y», одинаковые названия в разных областях.
+К реальным городам из tariffs.json добавляется столько синтетических,
+сколько задано (по умолчанию 25 000).
+
+Запросы четырех видов: точное название с другим регистром и ё/е,
+начало названия (2–6 букв), название с одной опечаткой и начало второго
+слова. Для точных названий и опечаток считается доля запросов, где
+нужный город (без учета области) попал в первые 5 подсказок.
+
+Запуск: python benchmarks/bench_city_search.py [названий] [запросов]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tariff
+from city_search import CityIndex
+
+ROOTS = [
+    'Бор', 'Вол', 'Гор', 'Дуб', 'Ель', 'Жуков', 'Звенигор', 'Иван', 'Кам', 'Кир',
+    'Клин', 'Кол', 'Крас', 'Кур', 'Лес', 'Лип', 'Луг', 'Мир', 'Мох', 'Неж',
+    'Озер', 'Орл', 'Пес', 'Полев', 'Рыб', 'Сад', 'Свет', 'Сел', 'Сосн', 'Стар',
+    'Тих', 'Топ', 'Уст', 'Хол', 'Чер', 'Шир', 'Яр', 'Берез', 'Вишн', 'Гриб',
+    'Дон', 'Заре', 'Кедр', 'Лебед', 'Медв', 'Никол', 'Петр', 'Роман', 'Сокол', 'Троиц',
+]
+SUFFIXES = [
+    'ск', 'овск', 'евск', 'ово', 'ево', 'ино', 'ка', 'овка', 'евка', 'ное',
+    'ный', 'поль', 'град', 'город', 'ец', 'ицы', 'ичи', 'ань', 'ля', 'ьево',
+]
+PREFIXES = ['', '', '', 'Ново', 'Старо', 'Верхне', 'Нижне', 'Красно', 'Бело', 'Большое ', 'Малое ']
+RIVERS = ['Волге', 'Дону', 'Оке', 'Амуре', 'Каме', 'Неве', 'Урале', 'Оби']
+REGIONS = ['Тамбовская обл.', 'Курганская обл.', 'Омская обл.', 'Кемеровская обл.', 'Иркутская обл.', 'Пензенская обл.']
+LETTERS = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+
+def make_names(count, seed=1):
+    rng = random.Random(seed)
+    names = list(tariff.KT_COEFFICIENTS)
+    seen = set(names)
+    while len(names) < count:
+        name = rng.choice(PREFIXES) + rng.choice(ROOTS)
+        name = name[0] + name[1:].lower() if name[-1] != ' ' else name
+        name += rng.choice(SUFFIXES)
+        if rng.random() < 0.05:
+            name += '-на-' + rng.choice(RIVERS)
+        if name in seen:
+            name = f'{name} ({rng.choice(REGIONS)})'
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def base_name(name):
+    return name.split(' (')[0]
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word))
+    kind = rng.randrange(3)
+    if kind == 0 and len(word) > 4:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rng.choice(LETTERS) + word[i + 1:]
+    return word[:i] + rng.choice(LETTERS) + word[i:]
+
+
+def make_queries(names, count, seed=2):
+    rng = random.Random(seed)
+    queries = {'точное': [], 'префикс': [], 'опечатка': [], 'второе слово': []}
+    for _ in range(count):
+        name = rng.choice(names)
+        queries['точное'].append((name.upper().replace('Е', 'Ё'), name))
+        queries['префикс'].append((name[:rng.randint(2, 6)].lower(), name))
+        queries['опечатка'].append((typo(base_name(name), rng), name))
+        words = name.replace('-', ' ').split()
+        if len(words) > 1:
+            queries['второе слово'].append((words[1][:4], name))
+    return queries
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 25_000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    names = make_names(size)
+
+    # Массивы триграмм собираются при первой опечатке — здесь сразу, вместе с индексом
+    import numpy  # noqa: F401 — время импорта NumPy не входит в построение
+
+    started = time.perf_counter()
+    index = CityIndex(names)
+    index._trigram_index()
+    build = time.perf_counter() - started
+    tracemalloc.start()
+    measured = CityIndex(names)
+    measured._trigram_index()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del measured
+    print(f"названий: {len(index):,}, построение индекса {build * 1000:.0f} мс, "
+          f"память {memory / 2 ** 20:.1f} МБ")
+
+    for kind, pairs in make_queries(names, count).items():
+        timings = []
+        hits = 0
+        for query, expected in pairs:
+            started = time.perf_counter()
+            found = index.search(query)
+            timings.append(time.perf_counter() - started)
+            # Одинаковые названия из разных областей не различить по опечатке
+            hits += base_name(expected) in {base_name(name) for name in found}
+        timings.sort()
+        line = (f"{kind:>13}: {len(pairs):>5} запросов, в среднем {sum(timings) / len(timings) * 1e6:5.1f} мкс, "
+                f"p99 {timings[int(len(timings) * 0.99)] * 1e6:6.1f} мкс, max {timings[-1] * 1e6:5.0f} мкс")
+        if kind in ('точное', 'опечатка'):
+            line += f", город в подсказках: {hits / len(pairs):.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
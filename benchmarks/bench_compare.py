@@ -0,0 +1,60 @@
+"""Сравнение вариантов: одна сетка NumPy против расчета каждой ячейки.
+
+Профиль из диалога, все периоды КС, город пользователя и еще три города,
+стаж ±2 года — 10 × 4 × 5 = 200 ячеек. Скалярный вариант вызывает
+tariff.quote на каждую ячейку, как сделал бы обработчик без сетки.
+Заодно проверяется, что обе стоимости совпадают во всех ячейках.
+
+Запуск: python benchmarks/bench_compare.py [повторов]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_quote
+import tariff
+
+PROFILE = {
+    'insurance_type': 'Физическое лицо', 'city': 'Казань', 'power': 105, 'experience': 5,
+    'age': 30, 'period': 12, 'is_beginner': 'Нет', 'accidents': 0, 'accident_period': 3,
+}
+CITIES = ['Москва', 'Санкт-Петербург', 'Омск']
+
+
+def scalar(data, grid):
+    prices = []
+    for period in grid['periods']:
+        for city in grid['cities']:
+            for experience in grid['experiences']:
+                result = tariff.quote({**data, 'period': period, 'city': city, 'experience': experience})
+                prices.append((result['summa_min'], result['summa_max']))
+    return prices
+
+
+def measure(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    grid = batch_quote.compare_profile(PROFILE, CITIES)
+    cells = grid['summa_min'].size
+
+    expected = scalar(PROFILE, grid)
+    actual = list(zip(grid['summa_min'].ravel().tolist(), grid['summa_max'].ravel().tolist()))
+    mismatches = sum(a != b for a, b in zip(actual, expected))
+
+    vector = measure(lambda: batch_quote.compare_profile(PROFILE, CITIES), repeat)
+    loop = measure(lambda: scalar(PROFILE, grid), max(1, repeat // 10))
+    print(f"ячеек: {cells}, расхождений со скалярным расчетом: {mismatches}")
+    print(f"сетка NumPy: {vector * 1000:6.2f} мс на запрос")
+    print(f"по ячейкам:  {loop * 1000:6.2f} мс на запрос ({loop / vector:.0f}× медленнее)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Выбор обработчика: TeleBot против IndexedTeleBot при росте числа обработчиков.
+
+Регистрируется N обработчиков, как в main.py: команды, кнопки (text=[...]),
+обработчики состояний и последний func=lambda message: True. Сообщения —
+смесь ввода в диалоге, нажатий кнопок, команд и свободного текста.
+Обработчики пустые, threaded=False, так что замеряется только выбор
+обработчика и чтение состояний.
+
+Запуск: python benchmarks/bench_dispatch.py [сообщений]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telebot
+from telebot import custom_filters, types
+from telebot.storage import StateMemoryStorage
+
+from router import IndexedTeleBot
+
+HANDLER_COUNTS = (10, 50, 200, 1000)
+USERS = 100
+
+
+class CountingStorage(StateMemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_state(self, chat_id, user_id):
+        self.reads += 1
+        return super().get_state(chat_id, user_id)
+
+
+def make_bot(cls, count):
+    storage = CountingStorage()
+    bot = cls('1:bench', threaded=False, state_storage=storage)
+    quarter = max(1, count // 4)
+
+    def noop(message):
+        pass
+
+    for i in range(quarter):
+        bot.register_message_handler(noop, commands=[f'cmd{i}'])
+    for i in range(quarter):
+        bot.register_message_handler(noop, text=[f'Кнопка {i}'])
+    for i in range(count - 3 * quarter - 1):
+        bot.register_message_handler(noop, state=f'step{i}')
+    # Хвост: проверки через func, как у show_instructions до индекса
+    for i in range(quarter):
+        bot.register_message_handler(noop, func=lambda message, i=i: message.text == f'Пункт {i}')
+    bot.register_message_handler(noop, func=lambda message: True)
+    bot.add_custom_filter(custom_filters.StateFilter(bot))
+    bot.add_custom_filter(custom_filters.TextMatchFilter())
+
+    states = count - 3 * quarter - 1
+    for user_id in range(1, USERS + 1):
+        if states > 0 and user_id % 2:
+            storage.set_state(user_id, user_id, f'step{user_id % states}')
+    return bot, storage
+
+
+def make_messages(count, handler_count):
+    quarter = max(1, handler_count // 4)
+    texts = ['150', f'/cmd{quarter - 1}', f'Кнопка {quarter // 2}', 'просто текст']
+    result = []
+    for i in range(count):
+        user_id = i % USERS + 1
+        chat = types.Chat(user_id, 'private')
+        user = types.User(user_id, False, 'bench')
+        result.append(types.Message(i, user, 0, chat, 'text', {'text': texts[i % len(texts)]}, ''))
+    return result
+
+
+def measure(cls, handler_count, messages):
+    bot, storage = make_bot(cls, handler_count)
+    bot.process_new_messages(messages[:USERS])  # прогрев и построение индекса
+    storage.reads = 0
+    started = time.perf_counter()
+    bot.process_new_messages(messages)
+    elapsed = time.perf_counter() - started
+    return elapsed / len(messages), storage.reads / len(messages)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"сообщений: {count:,}")
+    print(f"{'обработчиков':>12} {'TeleBot, мкс':>14} {'чтений':>8} {'Indexed, мкс':>14} {'чтений':>8}")
+    for handler_count in HANDLER_COUNTS:
+        messages = make_messages(count, handler_count)
+        plain, plain_reads = measure(telebot.TeleBot, handler_count, messages)
+        indexed, indexed_reads = measure(IndexedTeleBot, handler_count, messages)
+        print(f"{handler_count:>12} {plain * 1e6:>14.1f} {plain_reads:>8.1f} "
+              f"{indexed * 1e6:>14.1f} {indexed_reads:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
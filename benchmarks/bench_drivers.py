@@ -0,0 +1,81 @@
+"""Полис на несколько водителей: выборка по списку против kbs_coef/kbm_coef.
+
+Для списков из 5, 15, 50 и 1000 случайных водителей КВС и КБМ полиса
+ищутся тремя способами: выборкой NumPy по строке drivers.pack
+(batch_quote.driver_coefficients), циклом по той же строке (drivers
+берет его для списков короче SCALAR_DRIVERS) и вызовом kbs_coef и kbm_coef на каждого водителя из списка словарей
+в JSON, как сделал бы обработчик без упакованного списка. Проверяется,
+что коэффициенты совпадают, и сравнивается размер списка в сессии.
+
+Запуск: python benchmarks/bench_drivers.py [повторов]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_quote
+import drivers
+import tariff
+
+SIZES = (5, 15, 50, 1000)
+
+
+def random_drivers(count, rng):
+    result = []
+    for _ in range(count):
+        experience = round(rng.uniform(0, 40), 1)
+        if rng.random() < 0.5:
+            result.append(drivers.Driver(experience, rng.randint(18, 80)))
+        else:
+            result.append(drivers.Driver(
+                experience, rng.randint(18, 80), accidents=rng.randint(0, 4), accident_period=rng.randint(1, 12)
+            ))
+    return result
+
+
+def scalar(as_json, current):
+    items = [drivers.Driver(**d) for d in json.loads(as_json)]
+    kbs = max(current.kbs_coef(d.experience, d.age) for d in items)
+    kbm = max(
+        tariff.NOVICE_KBM if d.novice else current.kbm_coef(d.accident_period, d.accidents) if d.accident_period else 1
+        for d in items
+    )
+    return kbs, kbm
+
+
+def measure(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(1)
+    current = tariff.current()
+    print(f"{'водителей':>9}{'NumPy, мкс':>12}{'цикл, мкс':>11}{'JSON, мкс':>11}{'строка, Б':>11}{'JSON, Б':>9}")
+    for size in SIZES:
+        items = random_drivers(size, rng)
+        packed = drivers.pack(items)
+        as_json = json.dumps([{name: getattr(d, name) for name in drivers.Driver.__slots__} for d in items])
+
+        expected = scalar(as_json, current)
+        found = [batch_quote.driver_coefficients(packed, current), drivers._scan(packed, current)]
+        mismatch = any((f['kbs'], f['kbm']) != expected for f in found) or found[0] != found[1]
+
+        numpy_time = measure(lambda: batch_quote.driver_coefficients(packed, current), repeat)
+        loop_time = measure(lambda: drivers._scan(packed, current), repeat)
+        json_time = measure(lambda: scalar(as_json, current), repeat)
+        print(
+            f"{size:>9}{numpy_time * 1e6:>12.1f}{loop_time * 1e6:>11.1f}{json_time * 1e6:>11.1f}"
+            f"{len(packed):>11}{len(as_json):>9}" + ("  РАСХОЖДЕНИЕ" if mismatch else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
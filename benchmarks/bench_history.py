@@ -0,0 +1,79 @@
+"""История расчетов: запись пачками в фоне против COMMIT на каждый расчет.
+
+Замеряется время, которое обработчик тратит на сохранение расчета:
+QuoteHistory.record (очередь, запись пачками в фоновом потоке) и прямой
+INSERT с COMMIT в той же базе (WAL, synchronous=NORMAL). Затем в базе
+с историей многих чатов замеряется чтение последних расчетов чата
+(/history, /repeat) по индексу (chat_id, created_at).
+
+Запуск: python benchmarks/bench_history.py [расчетов] [чатов]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tariff
+from quote_history import _COLUMNS, QuoteHistory, _row
+
+DATA = {
+    'insurance_type': 'Физическое лицо', 'city': 'Казань', 'power': 105, 'experience': 5,
+    'age': 30, 'period': 12, 'is_novice': False, 'accidents': 0, 'accident_period': 3,
+}
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (f"в среднем {sum(timings) / len(timings) * 1e6:7.1f} мкс, "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1e6:7.1f} мкс")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    workdir = tempfile.mkdtemp(prefix='history_')
+    result = tariff.quote(DATA)
+
+    history = QuoteHistory(os.path.join(workdir, 'batched.db')).start()
+    timings = []
+    started = time.perf_counter()
+    for i in range(count):
+        begin = time.perf_counter()
+        history.record(i % chats, DATA, result)
+        timings.append(time.perf_counter() - begin)
+    history.stop()
+    total = time.perf_counter() - started
+    stats = history.stats()
+    print(f"   пачками: {percentiles(timings)}; все {count} записаны за {total:.2f} с, "
+          f"транзакций {stats['batches']}")
+
+    history = QuoteHistory(os.path.join(workdir, 'direct.db'))
+    conn = history._connect()
+    timings = []
+    for i in range(count // 10):
+        begin = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(f'INSERT INTO quotes ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     _row(i % chats, time.time(), DATA, result))
+        conn.execute('COMMIT')
+        timings.append(time.perf_counter() - begin)
+    conn.close()
+    history.stop()
+    print(f"по одному: {percentiles(timings)} ({len(timings)} расчетов)")
+
+    history = QuoteHistory(os.path.join(workdir, 'batched.db'))
+    rows = sqlite3.connect(os.path.join(workdir, 'batched.db')).execute('SELECT COUNT(*) FROM quotes').fetchone()[0]
+    timings = []
+    for i in range(2000):
+        begin = time.perf_counter()
+        history.recent((i * 7919) % chats)
+        timings.append(time.perf_counter() - begin)
+    history.stop()
+    print(f"   /history: {percentiles(timings)} при {rows:,} расчетах в базе")
+
+
+if __name__ == "__main__":
+    main()
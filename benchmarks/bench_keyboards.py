@@ -0,0 +1,49 @@
+"""Стоимость клавиатур на одно обновление: сборка с нуля против реестра.
+
+Сравнивается то, что уходит в Bot API: построение ReplyKeyboardMarkup и
+его сериализация в JSON против готовой строки из KeyboardRegistry.
+
+Запуск: python benchmarks/bench_keyboards.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper
+
+import keyboards
+
+
+def allocated(func, repeat=1000):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [func() for _ in range(repeat)]
+    total = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del results
+    return total / repeat
+
+
+def main():
+    number = 20_000
+    print(f"{'клавиатура':<22}{'сборка, мкс':>14}{'реестр, мкс':>14}{'сборка, байт':>15}{'реестр, байт':>15}")
+    for name, build in keyboards.BUILDERS.items():
+        def rebuild():
+            return apihelper._convert_markup(build())
+
+        def cached():
+            return apihelper._convert_markup(keyboards.registry.get(name))
+
+        assert rebuild() == cached()
+        rebuild_time = min(timeit.repeat(rebuild, number=number, repeat=3)) / number * 1e6
+        cached_time = min(timeit.repeat(cached, number=number, repeat=3)) / number * 1e6
+        print(f"{name:<22}{rebuild_time:>14.2f}{cached_time:>14.2f}"
+              f"{allocated(rebuild):>15.0f}{allocated(cached):>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
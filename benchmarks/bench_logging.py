@@ -0,0 +1,93 @@
+"""Задержка logger.info в обработчике: синхронный FileHandler против очереди.
+
+Несколько потоков, как воркеры бота, непрерывно пишут записи с extra.
+Для каждого вызова замеряется время, на которое он задерживает поток
+обработчика. Синхронный вариант повторяет прежний basicConfig
+(FileHandler и StreamHandler), очередь — logging_setup.setup_logging.
+
+Запуск: python benchmarks/bench_logging.py [записей_на_поток] [потоков]
+"""
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import TEXT_FORMAT, setup_logging
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run(records, threads):
+    logger = logging.getLogger('bench')
+    timings = [[] for _ in range(threads)]
+
+    def worker(index):
+        own = timings[index]
+        for i in range(records):
+            started = time.perf_counter()
+            logger.info(f"Пользователь {i} выполнил расчет: 5000 - 9000 руб.",
+                        extra={'chat_id': i, 'handler': 'perform_calculation', 'latency': 0.001})
+            own.append(time.perf_counter() - started)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sorted(t for own in timings for t in own), elapsed
+
+
+def report(name, timings, elapsed):
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"{name:<14}{statistics.median(timings) * 1e6:>10.1f}{p99 * 1e6:>10.1f}"
+          f"{timings[-1] * 1e3:>10.2f}{len(timings) / elapsed:>12,.0f}")
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    workdir = tempfile.mkdtemp()
+    # Консольный вывод направлен в файл, чтобы терминал не влиял на замер
+    console = open(os.path.join(workdir, 'console.log'), 'w', encoding='utf-8')
+    stderr, sys.stderr = sys.stderr, console
+
+    results = []
+    try:
+        reset_root()
+        logging.basicConfig(
+            level=logging.INFO, format=TEXT_FORMAT,
+            handlers=[logging.FileHandler(os.path.join(workdir, 'sync.log')), logging.StreamHandler()]
+        )
+        results.append(('sync',) + run(records, threads))
+
+        for fmt in ('text', 'json'):
+            reset_root()
+            listener = setup_logging(path=os.path.join(workdir, f'queue_{fmt}.log'), fmt=fmt,
+                                     queue_size=records * threads)
+            results.append((f'queue ({fmt})',) + run(records, threads))
+            listener.stop()
+    finally:
+        reset_root()
+        sys.stderr = stderr
+        console.close()
+
+    print(f"{threads} потока по {records} записей")
+    print(f"{'вариант':<14}{'p50, мкс':>10}{'p99, мкс':>10}{'max, мс':>10}{'записей/с':>12}")
+    for name, timings, elapsed in results:
+        report(name, timings, elapsed)
+
+
+if __name__ == "__main__":
+    main()
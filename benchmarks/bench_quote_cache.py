@@ -0,0 +1,86 @@
+"""Кэш расчетов: доля попаданий и время на запрос с кэшем и без.
+
+Запросы генерируются с неравномерной популярностью городов и
+профилей водителей, как инлайн-запросы на каждое нажатие клавиши:
+один и тот же профиль повторяется, пока пользователь дописывает строку.
+
+Запуск: python benchmarks/bench_quote_cache.py [запросов]
+"""
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import messages
+import tariff
+from quote_cache import QuoteCache
+
+
+def make_requests(count, seed=1):
+    rng = random.Random(seed)
+    cities = list(tariff.KT_COEFFICIENTS)
+    # Популярность городов и мощностей убывает по закону Ципфа
+    city_weights = [1 / (rank + 1) for rank in range(len(cities))]
+    powers = [70, 75, 90, 98, 102, 105, 110, 123, 150, 170, 190, 249]
+    power_weights = [1 / (rank + 1) for rank in range(len(powers))]
+    requests = []
+    while len(requests) < count:
+        city = rng.choices(cities, city_weights)[0]
+        data = {
+            'ko': tariff.KO_COEFFICIENTS['Физическое лицо'],
+            'city': city,
+            'kt': tariff.KT_COEFFICIENTS[city],
+            'power': float(rng.choices(powers, power_weights)[0]),
+            'experience': float(rng.randint(0, 25)),
+            'age': rng.randint(18, 70),
+            'period': 12,
+            'kc': 1,
+            'kbm': tariff.NOVICE_KBM,
+        }
+        # Пока пользователь печатает, один профиль приходит несколько раз подряд
+        requests.extend([data] * rng.randint(1, 4))
+    return requests[:count]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    requests = make_requests(count)
+
+    started = time.perf_counter()
+    for data in requests:
+        result = tariff.quote(data)
+        messages.format_result(data, result)
+    uncached = (time.perf_counter() - started) / count
+
+    cache = QuoteCache()
+    started = time.perf_counter()
+    for data in requests:
+        result, price_text = cache.quote(data)
+        messages.format_result(data, result, price_text)
+    cached = (time.perf_counter() - started) / count
+
+    stats = cache.stats()
+    # Только попадания: последние профили заведомо еще в кэше
+    recent = requests[-1000:]
+    started = time.perf_counter()
+    for _ in range(100):
+        for data in recent:
+            cache.quote(data)
+    hit = (time.perf_counter() - started) / (100 * len(recent))
+
+    uncached_price = min(timeit.repeat(lambda: [messages.format_price(tariff.quote(data)) for data in recent], number=10, repeat=3))
+    uncached_price /= 10 * len(recent)
+
+    print(f"запросов: {count:,}, наборов коэффициентов в кэше: {stats['size']:,}")
+    print(f"доля попаданий: {stats['hit_rate']:.1%}")
+    print(f"без кэша: {uncached * 1e6:.2f} мкс/запрос, с кэшем: {cached * 1e6:.2f} мкс/запрос")
+    print(f"попадание в кэш: {hit * 1e6:.2f} мкс/запрос, расчет с format_price: {uncached_price * 1e6:.2f} мкс/запрос")
+    print(f"выбор коэффициентов и поиск в кэше (выборка): в среднем {stats['lookup_avg_seconds'] * 1e6:.2f} мкс, "
+          f"максимум {stats['lookup_max_seconds'] * 1e6:.0f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Проверка и замер хранилищ сессий: memory, SQLite (WAL) и Redis-протокол.
+
+Для Redis используется локальный тестовый сервер fake_redis. Скрипт
+проверяет, что сессия переживает пересоздание хранилища (перезапуск
+воркера), и считает обращения к Redis на один переход диалога.
+
+Запуск: python benchmarks/bench_sessions.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_redis import FakeRedis
+from session_backends import MemoryBackend, RedisBackend, SQLiteBackend
+from sessions import SessionStore
+
+STEPS = 8  # переходов в полном диалоге
+CHATS = 2000
+
+
+def run_dialogs(store):
+    started = time.perf_counter()
+    for chat_id in range(1, CHATS + 1):
+        store.start(chat_id, chat_id, 'UserState:waiting_for_insurance_type')
+        for step in range(STEPS):
+            store.get_state(chat_id, chat_id)
+            store.advance(chat_id, chat_id, f'UserState:step_{step}', **{f'field_{step}': step})
+        store.finish(chat_id)
+    return time.perf_counter() - started
+
+
+def check_restart(make_store):
+    store = make_store()
+    store.start(42, 42, 'UserState:waiting_for_city')
+    store.advance(42, 42, 'UserState:waiting_for_power', city='Казань', kt=1.7)
+    store.backend.close()
+
+    store = make_store()
+    assert store.get_state(42, 42) == 'UserState:waiting_for_power'
+    assert store.get(42) == {'city': 'Казань', 'kt': 1.7}
+    store.finish(42)
+    assert store.get(42) is None and store.get_state(42, 42) is None
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'sessions.db')
+    redis = FakeRedis().start()
+    try:
+        check_restart(lambda: SessionStore(SQLiteBackend(db_path)))
+        check_restart(lambda: SessionStore(RedisBackend(redis.url)))
+        print("Сессии SQLite и Redis переживают перезапуск хранилища")
+
+        store = SessionStore(RedisBackend(redis.url))
+        store.get_state(1, 1)  # соединение уже установлено
+        before = redis.round_trips
+        store.advance(1, 1, 'UserState:waiting_for_power', city='Москва', kt=1.8)
+        print(f"Обращений к Redis на переход диалога: {redis.round_trips - before}")
+        store.finish(1)
+
+        operations = CHATS * (2 * STEPS + 2)
+        for name, backend in (
+            ('memory', MemoryBackend()),
+            ('sqlite', SQLiteBackend(db_path)),
+            ('redis', RedisBackend(redis.url)),
+        ):
+            elapsed = run_dialogs(SessionStore(backend))
+            print(f"{name:>7}: {operations / elapsed:,.0f} операций/с")
+            backend.close()
+    finally:
+        redis.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Холодный старт бота: время импорта и время до первого ответа.
+
+Импорт: python -X importtime -c "import main" в отдельном процессе —
+общее время и самые дорогие модули, которые main импортирует сам.
+Первый ответ: в fake_bot_api заранее лежит /start, main.py запускается
+в режиме polling, как после перезапуска дино, и замеряется время от
+запуска процесса до первого getUpdates и до первого sendMessage.
+Каждый замер повторяется, выводится медиана.
+
+Запуск: python benchmarks/bench_startup.py [повторов]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_bot_api import FakeBotAPI, make_message_update
+from replay import ROOT, bot_environment
+
+TOP = 8
+_IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+
+def import_times(env, workdir):
+    """Общее время импорта main и время модулей, импортированных самим main (мс)."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import os, main; os._exit(0)'],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            rows.append((len(match.group(3)), int(match.group(2)) / 1000, match.group(4)))
+    # Строки идут после вложенных импортов: модули main — с отступом на уровень глубже, до строки main
+    children = {}
+    main_index = max(i for i, row in enumerate(rows) if row[2] == 'main')
+    depth = rows[main_index][0]
+    total = rows[main_index][1]
+    for row_depth, cumulative, name in reversed(rows[:main_index]):
+        if row_depth <= depth:
+            break
+        if row_depth == depth + 2:
+            children[name] = cumulative
+    return total, children
+
+
+def first_reply(env, workdir):
+    """Секунды от запуска main.py до первого getUpdates и до первого ответа."""
+    api = FakeBotAPI().start()
+    api.push_update(make_message_update(1, 1, '/start'))
+    env = dict(env, TELEGRAM_API_URL=api.url)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py')], cwd=workdir, env=env)
+    try:
+        polled = None
+        deadline = time.monotonic() + 30
+        while not api.sent and time.monotonic() < deadline:
+            if polled is None and api.calls['getUpdates']:
+                polled = time.perf_counter() - started
+            if process.poll() is not None:
+                raise RuntimeError(f"Бот завершился с кодом {process.returncode}")
+            time.sleep(0.001)
+        if not api.sent:
+            raise TimeoutError("Бот не ответил")
+        replied = time.perf_counter() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        api.stop()
+    return polled or replied, replied
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp(prefix='startup_')
+    api = FakeBotAPI()
+    env = bot_environment(api, 'polling', workdir)
+    # Адрес Bot API у каждого запуска свой (first_reply)
+    api.server_close()
+    env.update({
+        'PYTHONPATH': ROOT,
+        'UPDATE_OFFSET_FILE': os.path.join(workdir, 'update_offset'),
+        'HISTORY_DB_PATH': os.path.join(workdir, 'history.db'),
+    })
+
+    imports = [import_times(env, workdir) for _ in range(repeat)]
+    print(f"импорт main: {statistics.median(total for total, _ in imports):.0f} мс")
+    children = {name: statistics.median(times.get(name, 0.0) for _, times in imports) for name in imports[0][1]}
+    for name, elapsed in sorted(children.items(), key=lambda item: item[1], reverse=True)[:TOP]:
+        print(f"  {name:<20}{elapsed:8.1f} мс")
+
+    runs = []
+    for _ in range(repeat):
+        if os.path.exists(env['UPDATE_OFFSET_FILE']):
+            os.remove(env['UPDATE_OFFSET_FILE'])
+        runs.append(first_reply(env, workdir))
+    print(f"до первого getUpdates: {statistics.median(polled for polled, _ in runs) * 1000:.0f} мс")
+    print(f"до первого ответа:     {statistics.median(replied for _, replied in runs) * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Скорость скомпилированного тарифного движка против исходных функций.
+
+Совпадение результатов проверяет tests/test_tariff.py.
+
+Запуск: python benchmarks/bench_tariff.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tariff
+from tariff import KBS_COEFFICIENTS, KM_COEFFICIENTS
+
+
+# Исходные реализации из main.py (линейный поиск)
+def ref_kbs_coef(experience, age):
+    max_exp = int(min(experience, 20))
+    for (exp, min_age, max_age), coef in KBS_COEFFICIENTS.items():
+        if exp == max_exp and min_age <= age < max_age:
+            return coef
+    return 1.5
+
+
+def ref_km_coef(power):
+    for key in sorted(KM_COEFFICIENTS):
+        if power <= key:
+            return KM_COEFFICIENTS[key]
+    if power > 150:
+        return 1.6
+    return 1
+
+
+def ref_quote(ko, kt, power, experience, age, kc, kbm):
+    kbs = ref_kbs_coef(experience, age)
+    km = ref_km_coef(power)
+    summa_min = int(1646 * ko * km * kc * kbs * kbm * kt)
+    summa_max = int(3535 * ko * km * kc * kbs * kbm * kt)
+    return summa_min, summa_max
+
+
+def new_quote(ko, kt, power, experience, age, kc, kbm):
+    kbs = tariff.kbs_coef(experience, age)
+    km = tariff.km_coef(power)
+    return tariff.calculate(ko, km, kc, kbs, kbm, kt)
+
+
+def main():
+    number = 200_000
+    args = (3.16, 1.7, 105, 5, 30, 1, 1)
+    for name, func in (("исходный", ref_quote), ("скомпилированный", new_quote)):
+        seconds = min(timeit.repeat(lambda: func(*args), number=number, repeat=5))
+        print(f"{name:>18}: {seconds / number * 1e6:.3f} мкс/расчет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Один чат засыпает бота сообщениями: сколько работы отсекает Throttle.
+
+Через main.bot (threaded=False, Bot API — fake_bot_api без задержки)
+проходят N обычных пользователей с полным диалогом и один чат, который
+между их шагами присылает пачки произвольного текста. Прогон
+повторяется без ограничения и с ограничением по умолчанию; выводятся
+время обработки, число отправленных ботом сообщений и счетчики Throttle.
+
+Запуск: python benchmarks/bench_throttle.py [пользователей] [сообщений флудера на шаг]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import types
+
+from fake_bot_api import CONVERSATION, FakeBotAPI, make_message_update
+
+FLOODER = 10 ** 9
+
+
+def make_updates(users, flood):
+    updates = []
+    update_id = 0
+    for text in CONVERSATION:
+        for user_id in range(1, users + 1):
+            update_id += 1
+            updates.append(make_message_update(update_id, user_id, text))
+        for i in range(flood):
+            update_id += 1
+            updates.append(make_message_update(update_id, FLOODER, f'спам {i}'))
+    return [types.Update.de_json(update) for update in updates]
+
+
+def run(main, api, updates, throttle):
+    main.bot.throttle = throttle
+    sent_before = api.sent
+    dropped_before = main.outbox.stats()['dropped']
+    started = time.perf_counter()
+    for i in range(0, len(updates), 100):
+        main.bot.process_new_updates(updates[i:i + 100])
+    elapsed = time.perf_counter() - started
+    # Ответы уходят через очередь исходящих — дожидаемся их
+    while main.outbox.stats()['depth']:
+        time.sleep(0.01)
+    time.sleep(0.2)  # последние сообщения уже взяты из очереди, но еще отправляются
+    return elapsed, api.sent - sent_before, main.outbox.stats()['dropped'] - dropped_before
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    flood = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    api = FakeBotAPI().start()
+    os.environ.update({'TELEGRAM_BOT_TOKEN': '1:throttle', 'TELEGRAM_API_URL': api.url})
+    os.environ.setdefault('OUTBOX_RATE', '100000')
+    os.environ.setdefault('OUTBOX_CHAT_RATE', '100000')
+    import main as bot_main
+    from throttle import Throttle
+    bot_main.start()
+    # Без ограничения очередь исходящих флудера переполняется — предупреждения не выводим
+    logging.getLogger().setLevel(logging.ERROR)
+    bot_main.bot.threaded = False
+
+    updates = make_updates(users, flood)
+    print(f"обновлений: {len(updates)}, из них от флудера {flood * len(CONVERSATION)}")
+    try:
+        for name, throttle in (
+            ('без ограничения', None),
+            ('с ограничением', Throttle(
+                rate=bot_main.THROTTLE_RATE or 1, burst=bot_main.THROTTLE_BURST,
+                notify=lambda chat_id: bot_main.send_message(chat_id, bot_main.messages.THROTTLED)
+            )),
+        ):
+            bot_main.sessions.finish(FLOODER)
+            for user_id in range(1, users + 1):
+                bot_main.sessions.finish(user_id)
+            elapsed, sent, dropped = run(bot_main, api, updates, throttle)
+            line = f"{name:>16}: {elapsed:.2f} с, отправлено сообщений {sent}, отброшено очередью исходящих {dropped}"
+            if throttle is not None:
+                line += f", {throttle.stats()}"
+            print(line)
+    finally:
+        bot_main.outbox.stop(timeout=10)
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
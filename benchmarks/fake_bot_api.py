@@ -0,0 +1,235 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов.
+
+Отвечает на вызовы вида /bot<token>/<method> с настраиваемой искусственной
+задержкой и считает отправленные ботом сообщения. Обновления, добавленные
+через push_update, бот получает так же, как от Telegram: через getUpdates
+(с long polling и подтверждением по offset) или, после setWebhook, POST
+на адрес вебхука с секретным заголовком.
+"""
+import json
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SENDING_METHODS = ('sendMessage', 'editMessageText', 'sendDocument')
+MAX_POLL_TIMEOUT = 50  # секунд, как у Telegram
+
+
+class ApiError(Exception):
+    def __init__(self, code, description):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+class FakeBotAPI(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, webhook_connections=40):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.sent_changed = threading.Condition(self.lock)
+        self.message_id = 0
+        self.thread = None
+        # Вызывается после каждого отправленного ботом сообщения: on_sent(chat_id, method, params)
+        self.on_sent = None
+        self.calls = Counter()
+
+        self.updates = []
+        self.update_id = 0
+        self.updates_changed = threading.Condition(self.lock)
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.webhook_pool = ThreadPoolExecutor(max_workers=webhook_connections, thread_name_prefix='fake-webhook')
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='fake-bot-api', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.updates_changed:
+            self.updates_changed.notify_all()
+        self.shutdown()
+        self.server_close()
+        self.webhook_pool.shutdown(wait=False, cancel_futures=True)
+
+    def wait_sent(self, count, timeout=60):
+        """Ждет, пока бот отправит count сообщений с момента запуска."""
+        deadline = time.monotonic() + timeout
+        with self.sent_changed:
+            while self.sent < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Отправлено {self.sent} из {count} сообщений")
+                self.sent_changed.wait(remaining)
+
+    def push_update(self, update):
+        """Добавляет обновление для бота; update_id присваивается по порядку."""
+        with self.updates_changed:
+            self.update_id += 1
+            update = dict(update, update_id=self.update_id)
+            if 'message' in update:
+                update['message'] = dict(update['message'], message_id=self.update_id)
+            webhook_url, secret = self.webhook_url, self.webhook_secret
+            if not webhook_url:
+                self.updates.append(update)
+                self.updates_changed.notify_all()
+        if webhook_url:
+            self.webhook_pool.submit(self._deliver, webhook_url, secret, update)
+        return update['update_id']
+
+    def push_message(self, user_id, text):
+        return self.push_update(make_message_update(0, user_id, text))
+
+    def _deliver(self, url, secret, update):
+        request = urllib.request.Request(
+            url, data=json.dumps(update).encode(), headers={'Content-Type': 'application/json'}
+        )
+        if secret:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', secret)
+        # Как Telegram, повторяем доставку, пока вебхук не примет обновление
+        for attempt in range(10):
+            try:
+                with urllib.request.urlopen(request, timeout=30):
+                    return
+            except Exception:
+                time.sleep(0.1 * 2 ** attempt)
+
+    def get_updates(self, offset=0, limit=100, timeout=0):
+        deadline = time.monotonic() + min(timeout, MAX_POLL_TIMEOUT)
+        with self.updates_changed:
+            if self.webhook_url:
+                raise ApiError(409, "Conflict: can't use getUpdates method while webhook is active; "
+                                    "use deleteWebhook to delete the webhook first")
+            # Обновления с update_id меньше offset подтверждены ботом
+            if offset:
+                self.updates = [update for update in self.updates if update['update_id'] >= offset]
+            while not self.updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.webhook_url:
+                    return []
+                self.updates_changed.wait(remaining)
+            return self.updates[:limit]
+
+    def call(self, method, params):
+        with self.lock:
+            self.calls[method] += 1
+        if method in SENDING_METHODS:
+            chat_id = int(params.get('chat_id', 0))
+            with self.sent_changed:
+                self.sent += 1
+                self.message_id += 1
+                message_id = self.message_id
+                self.sent_changed.notify_all()
+            if self.on_sent:
+                self.on_sent(chat_id, method, params)
+            return {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'OSAGO', 'username': 'osago_bot'}
+        if method == 'getUpdates':
+            return self.get_updates(
+                int(params.get('offset') or 0), int(params.get('limit') or 100),
+                float(params.get('timeout') or 0)
+            )
+        if method == 'setWebhook':
+            with self.updates_changed:
+                self.webhook_url = params.get('url') or None
+                self.webhook_secret = params.get('secret_token') or None
+                webhook_url, secret = self.webhook_url, self.webhook_secret
+                pending, self.updates = (self.updates, []) if webhook_url else ([], self.updates)
+                self.updates_changed.notify_all()
+            for update in pending:
+                self.webhook_pool.submit(self._deliver, webhook_url, secret, update)
+            return True
+        if method == 'deleteWebhook':
+            with self.updates_changed:
+                self.webhook_url = self.webhook_secret = None
+            return True
+        if method == 'getWebhookInfo':
+            return {'url': self.webhook_url or '', 'pending_update_count': len(self.updates)}
+        return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят отдельными записями: без TCP_NODELAY keep-alive ждет ACK ~40 мс
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if body:
+            content_type = self.headers.get('Content-Type', '')
+            if content_type.startswith('application/json'):
+                params.update(json.loads(body))
+            elif content_type.startswith('application/x-www-form-urlencoded'):
+                params.update({key: values[0] for key, values in parse_qs(body.decode()).items()})
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        try:
+            status, response = 200, {'ok': True, 'result': self.server.call(method, params)}
+        except ApiError as e:
+            status, response = e.code, {'ok': False, 'error_code': e.code, 'description': e.description}
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_message_update(update_id, user_id, text):
+    """Синтетическое обновление с текстовым сообщением от пользователя."""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def make_inline_query_update(update_id, user_id, query):
+    """Синтетический инлайн-запрос пользователя."""
+    return {
+        'update_id': update_id,
+        'inline_query': {
+            'id': str(update_id),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'query': query,
+            'offset': '',
+        },
+    }
+
+
+# Полный диалог /calc → get_accident_period, на каждый шаг бот отвечает одним сообщением
+CONVERSATION = ['/calc', 'Физическое лицо', 'Москва', '105', '5', '30', '12', 'Нет', '0', '3']
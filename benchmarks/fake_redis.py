@@ -0,0 +1,120 @@
+"""Минимальный сервер с протоколом Redis (RESP) для проверки RedisBackend.
+
+Поддерживает команды, которые использует хранилище сессий: PING, HSET,
+HGETALL, HDEL, DEL, EXPIRE, MULTI/EXEC. Сроки жизни ключей не соблюдаются.
+
+Запуск: python benchmarks/fake_redis.py [порт]
+"""
+import socketserver
+import sys
+import threading
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.hashes = {}
+        self.commands = 0
+        self.round_trips = 0  # отдельные команды и блоки MULTI/EXEC
+
+    @property
+    def url(self):
+        return f"redis://{self.server_address[0]}:{self.server_address[1]}/0"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-redis', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def execute(self, args):
+        command = args[0].upper()
+        self.commands += 1
+        if command == b'PING':
+            return 'PONG'
+        if command in (b'CLIENT', b'SELECT', b'EXPIRE'):
+            return 'OK' if command != b'EXPIRE' else 1
+        if command == b'HSET':
+            values = self.hashes.setdefault(args[1], {})
+            added = 0
+            for field, value in zip(args[2::2], args[3::2]):
+                added += field not in values
+                values[field] = value
+            return added
+        if command == b'HGETALL':
+            values = self.hashes.get(args[1], {})
+            return [item for pair in values.items() for item in pair]
+        if command == b'HDEL':
+            values = self.hashes.get(args[1], {})
+            removed = sum(values.pop(field, None) is not None for field in args[2:])
+            if not values:
+                self.hashes.pop(args[1], None)
+            return removed
+        if command == b'DEL':
+            return sum(self.hashes.pop(key, None) is not None for key in args[1:])
+        return Exception(f"ERR unknown command '{command.decode()}'")
+
+
+def _encode(value):
+    if isinstance(value, Exception):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    return b"$-1\r\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                break
+            command = args[0].upper()
+            if command == b'MULTI':
+                queued = []
+                reply = 'OK'
+            elif command == b'EXEC':
+                with self.server.lock:
+                    self.server.round_trips += 1
+                    reply = [self.server.execute(queued_args) for queued_args in queued or []]
+                queued = None
+            elif queued is not None:
+                queued.append(args)
+                reply = 'QUEUED'
+            else:
+                with self.server.lock:
+                    self.server.round_trips += 1
+                    reply = self.server.execute(args)
+            self.wfile.write(_encode(reply))
+
+
+if __name__ == "__main__":
+    server = FakeRedis(port=int(sys.argv[1]) if len(sys.argv) > 1 else 6379)
+    print(f"Тестовый Redis слушает {server.url}")
+    server.serve_forever()
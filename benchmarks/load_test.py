@@ -0,0 +1,88 @@
+"""Нагрузочный тест: обновления в секунду для синхронного и asyncio-бота.
+
+N синтетических пользователей проходят полный диалог расчета; Bot API
+заменен локальным сервером с задержкой ответа.
+
+Запуск: python benchmarks/load_test.py [пользователей] [задержка_мс]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import types
+
+from fake_bot_api import CONVERSATION, FakeBotAPI, make_message_update
+
+TOKEN = '1:load-test'
+
+
+def conversation_steps(users):
+    update_id = 0
+    for text in CONVERSATION:
+        batch = []
+        for user_id in range(1, users + 1):
+            update_id += 1
+            batch.append(types.Update.de_json(make_message_update(update_id, user_id, text)))
+        yield batch
+
+
+def run_sync(api, users):
+    os.environ['TELEGRAM_BOT_TOKEN'] = TOKEN
+    os.environ['TELEGRAM_API_URL'] = api.url
+    # Замеряется обработка обновлений, а не лимиты Telegram
+    os.environ.setdefault('OUTBOX_RATE', '100000')
+    os.environ.setdefault('OUTBOX_CHAT_RATE', '100000')
+    os.environ.setdefault('OUTBOX_WORKERS', '16')
+    os.environ.setdefault('THROTTLE_RATE', '0')
+    import main
+    main.start()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    expected = api.sent
+    started = time.perf_counter()
+    for batch in conversation_steps(users):
+        main.bot.process_new_updates(batch)
+        # Следующий шаг диалога возможен только после ответа на предыдущий
+        expected += len(batch)
+        api.wait_sent(expected)
+    return time.perf_counter() - started
+
+
+def run_async(api, users):
+    import async_main
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def scenario():
+        bot = async_main.create_bot(TOKEN, api.url)
+        started = time.perf_counter()
+        for batch in conversation_steps(users):
+            await bot.process_new_updates(batch)
+        elapsed = time.perf_counter() - started
+        await bot.close_session()
+        return elapsed
+
+    expected = api.sent + users * len(CONVERSATION)
+    elapsed = asyncio.run(scenario())
+    api.wait_sent(expected)
+    return elapsed
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    api = FakeBotAPI(latency=latency).start()
+    updates = users * len(CONVERSATION)
+    try:
+        for name, run in (('sync', run_sync), ('asyncio', run_async)):
+            elapsed = run(api, users)
+            print(f"{name:>8}: {updates} обновлений за {elapsed:.2f} с — {updates / elapsed:.0f} обновл./с")
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Сквозной бенчмарк: бот в отдельном процессе против локального Bot API.
+
+main.py запускается как в продакшене (polling или webhook), но с
+TELEGRAM_API_URL, указывающим на fake_bot_api. N синтетических
+пользователей одновременно проходят диалог /calc → get_accident_period:
+следующий шаг пользователь отправляет, как только получил ответ на
+предыдущий. Скрипт выводит обновления в секунду, p50/p99 задержки ответа
+(от появления обновления до sendMessage) и пиковый RSS процесса бота.
+
+Запуск: python benchmarks/replay.py [--users 200] [--latency 20] [--mode polling|webhook]
+"""
+import argparse
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from fake_bot_api import CONVERSATION, FakeBotAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = '1:replay'
+
+
+class Conversations:
+    """Ведет каждого пользователя по диалогу, отвечая на сообщения бота."""
+
+    def __init__(self, api, users):
+        self.api = api
+        self.users = users
+        self.lock = threading.Lock()
+        self.steps = {}
+        self.pushed_at = {}
+        self.latencies = []
+        self.finished = 0
+        self.done = threading.Event()
+
+    def start(self):
+        self.api.on_sent = self.on_sent
+        for user_id in range(1, self.users + 1):
+            self.steps[user_id] = 0
+            self._push(user_id)
+
+    def _push(self, user_id):
+        self.pushed_at[user_id] = time.perf_counter()
+        self.api.push_message(user_id, CONVERSATION[self.steps[user_id]])
+
+    def on_sent(self, chat_id, method, params):
+        if method != 'sendMessage' or chat_id not in self.steps:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            self.latencies.append(now - self.pushed_at[chat_id])
+            self.steps[chat_id] += 1
+            if self.steps[chat_id] == len(CONVERSATION):
+                self.finished += 1
+                if self.finished == self.users:
+                    self.done.set()
+                return
+        self._push(chat_id)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bot_environment(api, mode, workdir):
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_BOT_TOKEN': TOKEN,
+        'TELEGRAM_API_URL': api.url,
+        'BOT_MODE': mode,
+        'LOG_FILE': os.path.join(workdir, 'bot.log'),
+        'LOG_LEVEL': 'WARNING',
+    })
+    # Замеряется сам бот, а не лимиты Telegram на исходящие сообщения
+    env.setdefault('OUTBOX_RATE', '100000')
+    env.setdefault('OUTBOX_CHAT_RATE', '100000')
+    # Синтетические пользователи отвечают быстрее людей — входящий лимит не нужен
+    env.setdefault('THROTTLE_RATE', '0')
+    if mode == 'webhook':
+        port = free_port()
+        env.update({
+            'WEBHOOK_HOST': '127.0.0.1',
+            'PORT': str(port),
+            'WEBHOOK_URL': f'http://127.0.0.1:{port}/telegram',
+            'WEBHOOK_SECRET': 'replay-secret',
+        })
+    return env
+
+
+def wait_ready(api, mode, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Бот завершился с кодом {process.returncode}")
+        if (api.webhook_url if mode == 'webhook' else api.calls['getUpdates']):
+            return
+        time.sleep(0.05)
+    raise TimeoutError("Бот не начал получать обновления")
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=20, help='задержка Bot API, мс')
+    parser.add_argument('--mode', choices=('polling', 'webhook'), default='polling')
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='replay_')
+    api = FakeBotAPI(latency=args.latency / 1000).start()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'main.py')], cwd=workdir,
+        env=bot_environment(api, args.mode, workdir)
+    )
+    try:
+        wait_ready(api, args.mode, process)
+        conversations = Conversations(api, args.users)
+        started = time.perf_counter()
+        conversations.start()
+        if not conversations.done.wait(args.timeout):
+            raise TimeoutError(f"Диалог завершили {conversations.finished} из {args.users} пользователей")
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        api.stop()
+
+    latencies = sorted(conversations.latencies)
+    updates = len(latencies)
+    # ru_maxrss дочерних процессов — в КБ на Linux, в байтах на macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    print(f"режим {args.mode}, пользователей {args.users}, задержка Bot API {args.latency:g} мс")
+    print(f"обновлений: {updates} за {elapsed:.2f} с — {updates / elapsed:.0f} обновл./с")
+    print(f"задержка ответа: p50 {percentile(latencies, 0.5) * 1000:.1f} мс, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} мс")
+    print(f"пиковый RSS бота: {peak_rss / 1024:.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
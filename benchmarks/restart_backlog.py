@@ -0,0 +1,71 @@
+"""Перезапуск воркера посреди очереди обновлений: нет ни повторов, ни потерь.
+
+В fake_bot_api заранее накапливается N обновлений /help от разных
+пользователей (на каждое бот отвечает ровно одним сообщением). main.py
+в режиме polling начинает разбирать очередь, после первой трети ответов
+получает SIGTERM, как при перезапуске дино, и запускается снова с тем же
+файлом смещения. В конце проверяется, что каждый пользователь получил
+ровно один ответ, и выводится скорость разбора очереди.
+
+Запуск: python benchmarks/restart_backlog.py [обновлений] [задержка Bot API, мс]
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from fake_bot_api import FakeBotAPI, make_message_update
+from replay import ROOT, bot_environment, wait_ready
+
+
+def start_bot(api, workdir):
+    env = bot_environment(api, 'polling', workdir)
+    env.update({'UPDATE_OFFSET_FILE': os.path.join(workdir, 'update_offset'), 'TARIFF_WATCH_INTERVAL': '0'})
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py')], cwd=workdir, env=env)
+    wait_ready(api, 'polling', process)
+    return process
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workdir = tempfile.mkdtemp(prefix='restart_')
+    api = FakeBotAPI(latency=latency / 1000).start()
+    replies = Counter()
+    api.on_sent = lambda chat_id, method, params: replies.update([chat_id])
+    for update_id in range(1, count + 1):
+        api.push_update(make_message_update(update_id, update_id, '/help'))
+
+    try:
+        started = time.perf_counter()
+        process = start_bot(api, workdir)
+        api.wait_sent(count // 3)
+        stopping = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        code = process.wait(timeout=30)
+        stopped = time.perf_counter()
+        before_restart = sum(replies.values())
+
+        process = start_bot(api, workdir)
+        api.wait_sent(count)
+        # Повторы пришли бы сразу за последним ответом
+        time.sleep(1)
+        elapsed = time.perf_counter() - started
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+    finally:
+        api.stop()
+
+    duplicates = sum(1 for n in replies.values() if n > 1)
+    missing = count - len(replies)
+    print(f"обновлений: {count}, задержка Bot API {latency:g} мс")
+    print(f"к выходу первого процесса отвечено {before_restart}, остановка {stopped - stopping:.2f} с (код {code})")
+    print(f"вся очередь: {elapsed:.2f} с — {count / elapsed:.0f} обновл./с с учетом перезапуска")
+    print(f"повторных ответов: {duplicates}, без ответа: {missing}")
+
+
+if __name__ == "__main__":
+    main()
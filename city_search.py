@@ -0,0 +1,158 @@
+"""Поиск города по таблице территорий КТ.
+
+Полная таблица — тысячи муниципальных образований, кнопками ее не
+показать, поэтому город вводится текстом. CityIndex строится один раз на
+версию тарифов и отвечает на запрос за десятки микросекунд:
+
+- точное совпадение без учета регистра, ё/е, дефисов и лишних пробелов;
+- префикс названия или любого его слова («новгор» → «Нижний Новгород») —
+  bisect по отсортированному списку;
+- опечатки — триграммы слов со сходством Жаккара. Кандидаты берутся из
+  списков названий по редким триграммам (массивы NumPy), а частые
+  триграммы («ск », «  н») хранятся масками и только добавляют общие
+  триграммы уже найденным кандидатам.
+
+При равном качестве совпадения выше город, который стоит раньше
+в таблице (в tariffs.json крупные города идут первыми).
+
+Массивы триграмм собираются при первом поиске с опечаткой: точное
+совпадение и префиксы NumPy не нужны, поэтому загрузка тарифов и запуск
+бота не ждут импорта NumPy.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+_SEPARATORS = re.compile(r'[\s\-‐–—.,()«»"\']+')
+
+PREFIX_SCAN = 200  # сколько совпадений по префиксу просматривать при ранжировании
+MIN_SIMILARITY = 0.3  # минимальное сходство триграмм для исправления опечатки
+FREQUENT_SHARE = 0.01  # триграмма частая, если встречается в большей доле названий
+MIN_FREQUENT = 256  # но не реже, чем в стольких названиях
+
+
+def normalize(text):
+    """Ключ сравнения: нижний регистр, ё как е, слова через один пробел."""
+    return ' '.join(_SEPARATORS.split(text.lower().replace('ё', 'е'))).strip()
+
+
+def trigrams(key):
+    """Триграммы слов ключа с отступами, как в pg_trgm: «  к», « ка», ..., «нь »."""
+    result = set()
+    for word in key.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class CityIndex:
+    def __init__(self, names):
+        self.names = list(names)
+        self.exact = {}
+        prefixes = []
+        self._postings = {}
+        self._sizes = []
+        self._trigrams = None  # (postings, masks, sizes) — при первом _similar
+        self._lock = threading.Lock()
+        for position, name in enumerate(self.names):
+            key = normalize(name)
+            self.exact.setdefault(key, position)
+            words = key.split()
+            # Ключи для префиксного поиска: название с каждого слова
+            for start in range(len(words)):
+                prefixes.append((' '.join(words[start:]), start > 0, position))
+            grams = trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+        prefixes.sort()
+        self.prefix_keys = [key for key, _, _ in prefixes]
+        self.prefix_entries = [(inner, position) for _, inner, position in prefixes]
+
+    def _trigram_index(self):
+        """Списки названий по редким триграммам и маски частых (массивы NumPy)."""
+        with self._lock:
+            if self._trigrams is None:
+                import numpy as np
+
+                frequent = max(MIN_FREQUENT, int(len(self.names) * FREQUENT_SHARE))
+                postings = {}
+                masks = {}
+                for gram, positions in self._postings.items():
+                    if len(positions) > frequent:
+                        mask = np.zeros(len(self.names), dtype=np.uint8)
+                        mask[positions] = 1
+                        masks[gram] = mask
+                    else:
+                        postings[gram] = np.array(positions, dtype=np.int32)
+                self._trigrams = postings, masks, np.array(self._sizes, dtype=np.float64)
+                self._postings = self._sizes = None
+            return self._trigrams
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, text):
+        """Название из таблицы при точном совпадении ключа, иначе None."""
+        position = self.exact.get(normalize(text))
+        return None if position is None else self.names[position]
+
+    def search(self, text, limit=5):
+        """До limit названий: точное совпадение, затем префиксы, затем похожие."""
+        key = normalize(text)
+        if not key:
+            return []
+        found = []
+        position = self.exact.get(key)
+        if position is not None:
+            found.append(position)
+        if len(found) < limit:
+            found.extend(p for p in self._prefix(key, limit) if p not in found)
+        # Опечатку исправляем, только если такого названия нет
+        if position is None and len(found) < limit and len(key) >= 3:
+            found.extend(p for p in self._similar(key, limit) if p not in found)
+        return [self.names[p] for p in found[:limit]]
+
+    def _prefix(self, key, limit):
+        start = bisect_left(self.prefix_keys, key)
+        stop = bisect_left(self.prefix_keys, key + '\uffff', start, min(start + PREFIX_SCAN, len(self.prefix_keys)))
+        found = []
+        # Начало названия важнее начала второго слова, дальше — порядок в таблице
+        for _, position in sorted(self.prefix_entries[start:stop]):
+            if position not in found:
+                found.append(position)
+                if len(found) == limit:
+                    break
+        return found
+
+    def _similar(self, key, limit):
+        import numpy as np
+
+        postings, masks, sizes = self._trigram_index()
+        grams = trigrams(key)
+        rare = [postings[g] for g in grams if g in postings]
+        frequent = [masks[g] for g in grams if g in masks]
+        if rare:
+            candidates, shared = np.unique(np.concatenate(rare), return_counts=True)
+            for mask in frequent:
+                shared += mask[candidates]
+        elif frequent:
+            shared = frequent[0].copy()
+            for mask in frequent[1:]:
+                shared += mask
+            # При сходстве не ниже MIN_SIMILARITY общих триграмм не меньше такой доли запроса
+            candidates = np.flatnonzero(shared >= MIN_SIMILARITY * len(grams))
+            shared = shared[candidates]
+        else:
+            return []
+        similarity = shared / (len(grams) + sizes[candidates] - shared)
+        keep = similarity >= MIN_SIMILARITY
+        candidates, similarity = candidates[keep], similarity[keep]
+        if len(candidates) > limit:
+            # Граница отбора с запасом на равные значения сходства
+            best = np.argpartition(-similarity, limit)[:limit]
+            keep = similarity >= similarity[best].min()
+            candidates, similarity = candidates[keep], similarity[keep]
+        # Выше сходство, при равном — раньше в таблице
+        order = np.lexsort((candidates, -similarity))[:limit]
+        return candidates[order].tolist()
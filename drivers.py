@@ -0,0 +1,110 @@
+"""Список водителей полиса в компактном виде для сессии.
+
+Каждый водитель — 6 байт (struct '<HBBBB'): стаж в десятых долях года
+(с отбрасыванием, а не округлением: КВС зависит от целых лет стажа),
+возраст, признак новичка, число аварий и период их учета в годах
+(0 — аварии не указаны). Список хранится в сессии строкой base64:
+6 байт кодируются ровно 8 символами, поэтому добавление водителей —
+конкатенация строк без декодирования, а список из тысячи водителей
+занимает 8 КБ вместо сотен килобайт JSON.
+
+coefficients находит КВС и КБМ полиса: короткий список — циклом по
+записям, длинный — одной выборкой NumPy (batch_quote.driver_coefficients).
+NumPy импортируется только для длинных списков.
+"""
+import base64
+import math
+import struct
+
+import tariff
+
+_RECORD = struct.Struct('<HBBBB')
+FIELDS = [('experience', '<u2'), ('age', 'u1'), ('novice', 'u1'), ('accidents', 'u1'), ('accident_period', 'u1')]
+NOVICE_EXPERIENCE = 3  # стаж меньше и аварии не указаны — начинающий водитель
+MAX_EXPERIENCE = 0xFFFF / 10  # наибольший стаж, который помещается в запись
+# Списки короче считаются циклом: накладные расходы выборки NumPy больше (benchmarks/bench_drivers.py)
+SCALAR_DRIVERS = 40
+
+
+class Driver:
+    __slots__ = ('experience', 'age', 'novice', 'accidents', 'accident_period')
+
+    def __init__(self, experience, age, novice=None, accidents=0, accident_period=0):
+        self.experience = experience
+        self.age = age
+        # Указанные аварии важнее стажа: КБМ тогда берется по таблице аварийности
+        if novice is None:
+            novice = experience < NOVICE_EXPERIENCE and not accident_period
+        self.novice = novice
+        self.accidents = accidents
+        self.accident_period = accident_period
+
+
+def from_profile(data):
+    """Водитель из данных обычного расчета (диалог, /quote)."""
+    return Driver(
+        data.get('experience', 5), data.get('age', 30), novice=bool(data.get('is_novice')),
+        accidents=data.get('accidents', 0) if 'accident_period' in data else 0,
+        accident_period=data.get('accident_period', 0),
+    )
+
+
+def pack(drivers):
+    """Строка для сессии; строки двух списков можно просто сложить."""
+    raw = b''.join(
+        _RECORD.pack(
+            math.floor(min(d.experience, MAX_EXPERIENCE) * 10), min(d.age, 255), bool(d.novice),
+            min(d.accidents, 255), min(d.accident_period, 255),
+        )
+        for d in drivers
+    )
+    return base64.b64encode(raw).decode('ascii')
+
+
+def count(packed):
+    return len(packed) // 8
+
+
+def records(packed):
+    """Кортежи (стаж в десятых, возраст, новичок, аварии, период аварий)."""
+    return _RECORD.iter_unpack(base64.b64decode(packed))
+
+
+def unpack(packed):
+    """Структурированный массив NumPy с полями FIELDS; стаж — в десятых долях года."""
+    import numpy as np
+
+    return np.frombuffer(base64.b64decode(packed), dtype=FIELDS)
+
+
+def kbm(novice, accidents, accident_period, current):
+    """КБМ одного водителя: как в расчете на одного водителя."""
+    if novice:
+        return tariff.NOVICE_KBM
+    return current.kbm_coef(accident_period, accidents) if accident_period else tariff.BASE_KBM
+
+
+def coefficients(packed, current=None):
+    """КВС и КБМ полиса на несколько водителей — наибольшие среди водителей.
+
+    Возвращает kbs, kbm, число водителей drivers и номера водителей (с 1),
+    по которым взяты КВС и КБМ: kbs_driver, kbm_driver.
+    """
+    current = current or tariff.current()
+    if count(packed) >= SCALAR_DRIVERS:
+        import batch_quote
+
+        return batch_quote.driver_coefficients(packed, current)
+    return _scan(packed, current)
+
+
+def _scan(packed, current):
+    kbs = max_kbm = None
+    for number, (experience, age, novice, accidents, accident_period) in enumerate(records(packed), 1):
+        driver_kbs = current.kbs_coef(experience / 10, age)
+        driver_kbm = kbm(novice, accidents, accident_period, current)
+        if kbs is None or driver_kbs > kbs:
+            kbs, kbs_driver = driver_kbs, number
+        if max_kbm is None or driver_kbm > max_kbm:
+            max_kbm, kbm_driver = driver_kbm, number
+    return {'kbs': kbs, 'kbm': max_kbm, 'drivers': count(packed), 'kbs_driver': kbs_driver, 'kbm_driver': kbm_driver}
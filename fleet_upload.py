@@ -0,0 +1,254 @@
+"""Расчет ОСАГО по таблице водителей и ТС (CSV/XLSX).
+
+Файл читается потоково, строки обрабатываются блоками фиксированного
+размера через batch_quote, результат пишется в выходной файл по мере
+расчета — память не растет с размером таблицы.
+"""
+import csv
+import math
+import os
+
+import messages
+import tariff
+import validation
+
+CHUNK_SIZE = 5000
+
+# Допустимые заголовки столбцов (в нижнем регистре)
+COLUMNS = {
+    'insurance_type': ('insurance_type', 'вид страхователя', 'страхователь'),
+    'city': ('city', 'город'),
+    'power': ('power', 'мощность'),
+    'experience': ('experience', 'стаж'),
+    'age': ('age', 'возраст'),
+    'period': ('period', 'период'),
+    'novice': ('novice', 'новичок'),
+    'accidents': ('accidents', 'аварии', 'количество аварий'),
+    'accident_period': ('accident_period', 'период аварий', 'период аварийности'),
+}
+REQUIRED_COLUMNS = ('city', 'power', 'experience', 'age', 'period')
+RESULT_HEADER = ('КО', 'КТ', 'КВС', 'КС', 'КБМ', 'КМ', 'Стоимость от', 'Стоимость до', 'Тарифы', 'Ошибка')
+YES = ('да', 'yes', 'true', '1')
+
+
+class FleetFileError(ValueError):
+    pass
+
+
+def map_header(header):
+    """Возвращает {поле: номер столбца} по строке заголовка."""
+    names = [str(name).strip().lower() if name is not None else '' for name in header]
+    mapping = {}
+    for field, aliases in COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                mapping[field] = index
+                break
+    missing = [field for field in REQUIRED_COLUMNS if field not in mapping]
+    if missing:
+        raise FleetFileError(messages.FLEET_MISSING_COLUMNS.format(columns=', '.join(missing)))
+    return mapping
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).strip().replace(',', '.'))
+
+
+def parse_row(row, mapping, current=None):
+    """Проверяет строку по тем же правилам, что и обработчики диалога.
+
+    Город ищется в таблице КТ тарифов current (по умолчанию текущих).
+    Возвращает (поля, None) или (None, текст ошибки).
+    """
+    def cell(field, default=None):
+        index = mapping.get(field)
+        if index is None or index >= len(row) or row[index] in (None, ''):
+            return default
+        return row[index]
+
+    try:
+        power = _number(cell('power'))
+        experience = _number(cell('experience'))
+        age = _number(cell('age'))
+        period = _number(cell('period'))
+    except (TypeError, ValueError):
+        return None, messages.FLEET_NOT_NUMBER
+    if not power > 0:
+        return None, messages.FLEET_POWER_NOT_POSITIVE
+    if not experience >= 0:
+        return None, messages.FLEET_EXPERIENCE_NEGATIVE
+    if age != math.floor(age) or age < 18:
+        return None, messages.FLEET_AGE_INVALID
+    if period != math.floor(period) or not 3 <= period <= 12:
+        return None, messages.FLEET_PERIOD_OUT_OF_RANGE
+
+    city = cell('city')
+    if city is None:
+        return None, messages.FLEET_NO_CITY
+    found = (current or tariff.current()).city_index.find(str(city))
+    if found is None:
+        # Иначе строка молча посчиталась бы с КТ по умолчанию
+        return None, messages.FLEET_UNKNOWN_CITY.format(city=str(city).strip())
+    insurance_type = str(cell('insurance_type', 'Юридическое лицо')).strip()
+    try:
+        insurance_type = validation.parse_insurance_type(insurance_type)
+    except validation.InputError:
+        # Иначе строка молча посчиталась бы с КО по умолчанию
+        return None, messages.FLEET_UNKNOWN_INSURANCE_TYPE.format(insurance_type=insurance_type)
+    novice = str(cell('novice', '')).strip().lower() in YES
+    # Период аварий 0 — история не указана, КБМ базовый, как в /quote и у водителей полиса
+    accidents = 0.0
+    accident_period = 0.0
+    if not novice and cell('accident_period') is not None:
+        try:
+            accidents = _number(cell('accidents', 0))
+            accident_period = _number(cell('accident_period'))
+        except (TypeError, ValueError):
+            return None, messages.FLEET_NOT_NUMBER
+        if accidents != math.floor(accidents) or accidents < 0:
+            return None, messages.FLEET_ACCIDENTS_NEGATIVE
+        if accident_period != math.floor(accident_period) or not 1 <= accident_period <= 12:
+            return None, messages.FLEET_ACCIDENT_PERIOD_OUT_OF_RANGE
+    elif not novice and cell('accidents') is not None:
+        return None, messages.FLEET_NO_ACCIDENT_PERIOD
+
+    return {
+        'insurance_type': insurance_type,
+        'city': found,
+        'power': power,
+        'experience': experience,
+        'age': age,
+        'period': period,
+        'novice': novice,
+        'accidents': accidents,
+        'accident_period': accident_period,
+    }, None
+
+
+def price_chunk(rows, mapping, current=None, width=0):
+    """Считает блок строк, возвращает строки результата в исходном порядке.
+
+    Строки короче width (числа столбцов заголовка) дополняются пустыми
+    ячейками, чтобы результат всегда попадал под свои заголовки.
+    """
+    current = current or tariff.current()
+    parsed = [parse_row(row, mapping, current) for row in rows]
+    valid = [fields for fields, error in parsed if fields is not None]
+    priced = iter(())
+    if valid:
+        # NumPy нужен только для автопарков — не при запуске бота
+        from batch_quote import quote_batch
+
+        columns = {field: [fields[field] for fields in valid] for field in valid[0]}
+        result = quote_batch(**columns, current=current)
+        priced = zip(*(result[name].tolist() for name in
+                       ('ko', 'kt', 'kbs', 'kc', 'kbm', 'km', 'summa_min', 'summa_max')))
+        version = result['tariff_version']
+
+    output = []
+    for row, (fields, error) in zip(rows, parsed):
+        row = list(row)
+        row += [''] * (width - len(row))
+        if fields is None:
+            output.append(row + [''] * (len(RESULT_HEADER) - 1) + [error])
+        else:
+            output.append(row + list(next(priced)) + [version, ''])
+    return output
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        sample = source.read(4096)
+        source.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(source, dialect):
+            if any(cell.strip() for cell in row):
+                yield row
+
+
+def _read_xlsx(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            if any(cell not in (None, '') for cell in row):
+                yield row
+    finally:
+        workbook.close()
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file, delimiter=';')
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('ОСАГО')
+
+    def write(self, row):
+        self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+def process_file(source_path, result_path, progress=None, chunk_size=CHUNK_SIZE):
+    """Рассчитывает файл source_path и пишет результат в result_path.
+
+    Формат определяется по расширению (.csv или .xlsx). progress(rows)
+    вызывается после каждого блока. Возвращает (всего строк, с ошибками).
+    """
+    is_xlsx = os.path.splitext(source_path)[1].lower() == '.xlsx'
+    rows = _read_xlsx(source_path) if is_xlsx else _read_csv(source_path)
+    header = next(rows, None)
+    if header is None:
+        raise FleetFileError(messages.FLEET_EMPTY)
+    mapping = map_header(header)
+
+    writer = _XlsxWriter(result_path) if is_xlsx else _CsvWriter(result_path)
+    # Весь файл считается по одной версии тарифов, даже если их заменят во время расчета
+    current = tariff.current()
+    total = errors = 0
+    try:
+        writer.write(list(header) + list(RESULT_HEADER))
+        for chunk in _chunks(rows, chunk_size):
+            for row in price_chunk(chunk, mapping, current, width=len(header)):
+                writer.write(row)
+                if row[-1]:
+                    errors += 1
+            total += len(chunk)
+            if progress:
+                progress(total)
+    finally:
+        writer.close()
+    return total, errors
+
@@ -0,0 +1,186 @@
+# Клавиатуры бота (общие для синхронной и asyncio-версии).
+# Статичные клавиатуры строятся один раз и хранятся уже сериализованными
+# в JSON. Клавиатуры из тарифных таблиц (города, периоды) перестраиваются
+# только при смене версии тарифов. Подсказки городов зависят от ввода и
+# строятся на каждый запрос.
+import threading
+
+from telebot import types
+
+import messages
+import tariff
+
+# Таблица КТ не длиннее — все города показываются кнопками; длиннее — только ввод с подсказками
+CITY_BUTTONS_MAX = 40
+
+
+class CachedMarkup(types.JsonSerializable):
+    """Готовая клавиатура: to_json возвращает заранее сериализованную строку."""
+
+    __slots__ = ('json',)
+
+    def __init__(self, markup):
+        self.json = markup.to_json()
+
+    def to_json(self):
+        return self.json
+
+
+def _rows(markup, labels, width):
+    for i in range(0, len(labels), width):
+        markup.row(*[types.KeyboardButton(str(label)) for label in labels[i:i + width]])
+    return markup
+
+
+def build_start_menu():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(
+        types.KeyboardButton(messages.BTN_START_CALC),
+        types.KeyboardButton(messages.BTN_INSTRUCTIONS),
+        types.KeyboardButton(messages.BTN_HELP),
+    )
+    markup.add(types.KeyboardButton(messages.BTN_REPEAT))
+    return markup
+
+
+def build_instructions_menu():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(types.KeyboardButton(messages.BTN_START_CALC))
+    return markup
+
+
+def build_other_messages_menu():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(types.KeyboardButton(messages.BTN_START_CALC), types.KeyboardButton(messages.BTN_HELP))
+    return markup
+
+
+def build_result_menu():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(types.KeyboardButton(messages.BTN_COMPARE), types.KeyboardButton(messages.BTN_ADD_DRIVERS))
+    markup.add(types.KeyboardButton(messages.BTN_NEW_CALC), types.KeyboardButton(messages.BTN_HELP))
+    return markup
+
+
+def build_insurance_types():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=1)
+    markup.add(*[types.KeyboardButton(label) for label in messages.INSURANCE_TYPES])
+    return markup
+
+
+def build_cities():
+    cities = list(tariff.KT_COEFFICIENTS)
+    if len(cities) > CITY_BUTTONS_MAX:
+        return types.ReplyKeyboardRemove()
+    return _rows(types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2), cities, 2)
+
+
+def build_periods():
+    return _rows(types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3), list(tariff.KC_COEFFICIENTS), 3)
+
+
+def build_yes_no():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    markup.add(types.KeyboardButton(messages.YES), types.KeyboardButton(messages.NO))
+    return markup
+
+
+def build_accidents():
+    return _rows(types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3), list(range(0, 5)), 3)
+
+
+def build_accident_periods():
+    return _rows(types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3), list(range(1, 13)), 3)
+
+
+def build_remove():
+    return types.ReplyKeyboardRemove()
+
+
+BUILDERS = {
+    'start_menu': build_start_menu,
+    'instructions_menu': build_instructions_menu,
+    'other_messages_menu': build_other_messages_menu,
+    'result_menu': build_result_menu,
+    'insurance_types': build_insurance_types,
+    'cities': build_cities,
+    'periods': build_periods,
+    'yes_no': build_yes_no,
+    'accidents': build_accidents,
+    'accident_periods': build_accident_periods,
+    'remove': build_remove,
+}
+
+
+class KeyboardRegistry:
+    def __init__(self, builders):
+        self.builders = builders
+        self.lock = threading.Lock()
+        self.version = None
+        self.markups = {}
+
+    def build_all(self):
+        version = tariff.VERSION
+        markups = {name: CachedMarkup(build()) for name, build in self.builders.items()}
+        with self.lock:
+            self.markups = markups
+            self.version = version
+
+    def get(self, name):
+        if self.version != tariff.VERSION:
+            self.build_all()
+        return self.markups[name]
+
+
+registry = KeyboardRegistry(BUILDERS)
+registry.build_all()
+
+
+def start_menu():
+    return registry.get('start_menu')
+
+
+def instructions_menu():
+    return registry.get('instructions_menu')
+
+
+def other_messages_menu():
+    return registry.get('other_messages_menu')
+
+
+def result_menu():
+    return registry.get('result_menu')
+
+
+def insurance_types():
+    return registry.get('insurance_types')
+
+
+def cities():
+    """Все города кнопками, если их не больше CITY_BUTTONS_MAX; иначе клавиатура убирается."""
+    return registry.get('cities')
+
+
+def city_suggestions(cities):
+    """Найденные по вводу города: клавиатура строится на каждый запрос, в реестр не попадает."""
+    return _rows(types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2), list(cities), 2)
+
+
+def periods():
+    return registry.get('periods')
+
+
+def yes_no():
+    return registry.get('yes_no')
+
+
+def accidents():
+    return registry.get('accidents')
+
+
+def accident_periods():
+    return registry.get('accident_periods')
+
+
+def remove():
+    return registry.get('remove')
@@ -0,0 +1,110 @@
+"""Неблокирующее логирование: очередь и фоновый поток записи.
+
+Обработчики обновлений только кладут запись в очередь, а файл и консоль
+пишет отдельный поток (QueueListener), поэтому медленный диск не
+задерживает ответы пользователям. Файл лога ротируется по размеру или
+по времени. Формат text — привычные строки, json — JSON Lines с полями
+из extra (chat_id, handler, latency и другими).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Стандартные атрибуты LogRecord: все остальное пришло из extra
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна компактная строка JSON."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str, separators=(',', ':'))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не ждет."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Форматирование выполняет фоновый поток; здесь только фиксируем текст сообщения
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueueWriter(logging.handlers.QueueListener):
+    """QueueListener, который можно останавливать повторно (вручную и при выходе)."""
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def _file_handler(path, max_bytes, backup_count, when):
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+    )
+
+
+def setup_logging(path='bot.log', level=logging.INFO, fmt='text', max_bytes=10 * 1024 * 1024,
+                  backup_count=5, when=None, console=True, queue_size=10000):
+    """Подключает к корневому логгеру очередь с фоновой записью.
+
+    path=None отключает файл, when (например 'midnight') включает ротацию
+    по времени вместо ротации по размеру. Возвращает запущенный
+    QueueWriter; при выходе из процесса он дописывает очередь.
+    """
+    formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if path:
+        handlers.append(_file_handler(path, max_bytes, backup_count, when))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    listener = QueueWriter(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,29 +1,63 @@
 import telebot
-from telebot import types
+from telebot import apihelper
 from telebot.handler_backends import State, StatesGroup
-from telebot.storage import StateMemoryStorage
 from telebot import custom_filters
+from telebot import types
+import io
 import os
 import logging
+import shutil
+import signal
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import math
+import requests
+
+import drivers
+import fleet_upload
+import keyboards
+import messages
+import tariff
+import validation
+from logging_setup import setup_logging
+from metrics import Metrics
+from outbox import Outbox
+from polling import Poller, create_checkpoint
+from profiler import MODES as PROFILE_MODES, ProfileBusy, Profiler
+from quote_cache import QuoteCache
+from quote_history import QuoteHistory
+from router import IndexedTeleBot
+from session_backends import create_backend
+from sessions import SessionStore
+from throttle import Throttle
+from webhook_server import run_webhook
 
 # Загружаем переменные окружения
 load_dotenv()
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
+# Настройка логирования: запись в файл и консоль идет в фоновом потоке,
+# файл ротируется по размеру (LOG_MAX_BYTES) или по времени (LOG_ROTATE_WHEN)
+setup_logging(
+    path=os.getenv('LOG_FILE', 'bot.log') or None,
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    fmt=os.getenv('LOG_FORMAT', 'text'),
+    max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+    when=os.getenv('LOG_ROTATE_WHEN'),
 )
 logger = logging.getLogger(__name__)
 
-# Хранилище состояний
-state_storage = StateMemoryStorage()
+# Хранилище сессий: состояние диалога и данные расчета с ограничением по времени и количеству.
+# memory — в памяти процесса; sqlite и redis переживают перезапуск и общие для нескольких воркеров.
+# Само хранилище (файл, соединение с Redis) открывает start()
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+SESSION_TTL = int(os.getenv('SESSION_TTL', 3600))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', 10000))
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+REDIS_URL = os.getenv('REDIS_URL')
+sessions = SessionStore(None)
 
 # Получаем токен из переменных окружения
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -31,112 +65,104 @@ if not BOT_TOKEN:
     logger.error("Токен бота не найден! Убедитесь, что файл .env существует и содержит TELEGRAM_BOT_TOKEN")
     raise ValueError("Токен бота не найден")
 
-bot = telebot.TeleBot(BOT_TOKEN, state_storage=state_storage)
-
-# Коэффициенты (взяты из вашего Tkinter кода)
-KT_COEFFICIENTS = {
-    'Москва': 1.8, 'Санкт-Петербург': 1.64, 'Воронеж': 1.35,
-    'Ростов-на-Дону': 1.56, 'Уфа': 1.56, 'Смоленск': 1.16,
-    'Брянск': 1.4, 'Калининград': 1.08, 'Казань': 1.7,
-    'Нижний Новгород': 1.56, 'Омск': 1.42, 'Пермь': 1.7,
-    'Волгоград': 1.21, 'Краснодар': 1.56, 'Новосибирск': 1.56,
-    'Челябинск': 1.77, 'Саратов': 1.42, 'Томск': 1.48,
-    'Владивосток': 1.36, 'Рязань': 1.32
-}
-
-KC_COEFFICIENTS = {
-    3: 0.5, 4: 0.6, 5: 0.65, 6: 0.7,
-    7: 0.8, 8: 0.9, 9: 0.95, 10: 1,
-    11: 1, 12: 1
-}
-
-KBS_COEFFICIENTS = {
-    # Стаж 0 лет
-    (0, 18, 22): 2.27, (0, 22, 25): 1.88, (0, 25, 30): 1.72,
-    (0, 30, 35): 1.56, (0, 35, 40): 1.54, (0, 40, 50): 1.50,
-    (0, 50, 60): 1.46, (0, 60, 150): 1.43,
-    # Стаж 1 год
-    (1, 18, 22): 1.92, (1, 22, 25): 1.72, (1, 25, 30): 1.60,
-    (1, 30, 35): 1.50, (1, 35, 40): 1.47, (1, 40, 50): 1.44,
-    (1, 50, 60): 1.40, (1, 60, 150): 1.36,
-    # Стаж 2 года
-    (2, 18, 22): 1.84, (2, 22, 25): 1.71, (2, 25, 30): 1.54,
-    (2, 30, 35): 1.48, (2, 35, 40): 1.46, (2, 40, 50): 1.43,
-    (2, 50, 60): 1.39, (2, 60, 150): 1.35,
-    # Стаж 3-4 года
-    (3, 18, 22): 1.65, (3, 22, 25): 1.13, (3, 25, 30): 1.09,
-    (3, 30, 35): 1.05, (3, 35, 40): 1.00, (3, 40, 50): 0.96,
-    (3, 50, 60): 0.93, (3, 60, 150): 0.91,
-    (4, 18, 22): 1.65, (4, 22, 25): 1.13, (4, 25, 30): 1.09,
-    (4, 30, 35): 1.05, (4, 35, 40): 1.00, (4, 40, 50): 0.96,
-    (4, 50, 60): 0.93, (4, 60, 150): 0.91,
-    # Стаж 5-6 лет
-    (5, 18, 22): 1.62, (5, 22, 25): 1.10, (5, 25, 30): 1.08,
-    (5, 30, 35): 1.04, (5, 35, 40): 0.97, (5, 40, 50): 0.95,
-    (5, 50, 60): 0.92, (5, 60, 150): 0.90,
-    (6, 18, 22): 1.62, (6, 22, 25): 1.10, (6, 25, 30): 1.08,
-    (6, 30, 35): 1.04, (6, 35, 40): 0.97, (6, 40, 50): 0.95,
-    (6, 50, 60): 0.92, (6, 60, 150): 0.90,
-    # Стаж 7-9 лет
-    (7, 22, 25): 1.09, (7, 25, 30): 1.07, (7, 30, 35): 1.01,
-    (7, 35, 40): 0.95, (7, 40, 50): 0.94, (7, 50, 60): 0.91,
-    (7, 60, 150): 0.89,
-    (8, 22, 25): 1.09, (8, 25, 30): 1.07, (8, 30, 35): 1.01,
-    (8, 35, 40): 0.95, (8, 40, 50): 0.94, (8, 50, 60): 0.91,
-    (8, 60, 150): 0.89,
-    (9, 22, 25): 1.09, (9, 25, 30): 1.07, (9, 30, 35): 1.01,
-    (9, 35, 40): 0.95, (9, 40, 50): 0.94, (9, 50, 60): 0.91,
-    (9, 60, 150): 0.89,
-    # Стаж 10-14 лет
-    (10, 25, 30): 1.02, (10, 30, 35): 0.97, (10, 35, 40): 0.94,
-    (10, 40, 50): 0.93, (10, 50, 60): 0.90, (10, 60, 150): 0.88,
-    (11, 25, 30): 1.02, (11, 30, 35): 0.97, (11, 35, 40): 0.94,
-    (11, 40, 50): 0.93, (11, 50, 60): 0.90, (11, 60, 150): 0.88,
-    (12, 25, 30): 1.02, (12, 30, 35): 0.97, (12, 35, 40): 0.94,
-    (12, 40, 50): 0.93, (12, 50, 60): 0.90, (12, 60, 150): 0.88,
-    (13, 25, 30): 1.02, (13, 30, 35): 0.97, (13, 35, 40): 0.94,
-    (13, 40, 50): 0.93, (13, 50, 60): 0.90, (13, 60, 150): 0.88,
-    (14, 25, 30): 1.02, (14, 30, 35): 0.97, (14, 35, 40): 0.94,
-    (14, 40, 50): 0.93, (14, 50, 60): 0.90, (14, 60, 150): 0.88,
-    # Стаж 15+ лет
-    (15, 30, 35): 0.95, (15, 35, 40): 0.93, (15, 40, 50): 0.91,
-    (15, 50, 60): 0.86, (15, 60, 150): 0.83,
-    (16, 30, 35): 0.95, (16, 35, 40): 0.93, (16, 40, 50): 0.91,
-    (16, 50, 60): 0.86, (16, 60, 150): 0.83,
-    (17, 30, 35): 0.95, (17, 35, 40): 0.93, (17, 40, 50): 0.91,
-    (17, 50, 60): 0.86, (17, 60, 150): 0.83,
-    (18, 30, 35): 0.95, (18, 35, 40): 0.93, (18, 40, 50): 0.91,
-    (18, 50, 60): 0.86, (18, 60, 150): 0.83,
-    (19, 30, 35): 0.95, (19, 35, 40): 0.93, (19, 40, 50): 0.91,
-    (19, 50, 60): 0.86, (19, 60, 150): 0.83,
-    (20, 30, 35): 0.95, (20, 35, 40): 0.93, (20, 40, 50): 0.91,
-    (20, 50, 60): 0.86, (20, 60, 150): 0.83,
-}
-
-KO_COEFFICIENTS = {
-    'Физическое лицо': 3.16,
-    'Юридическое лицо': 1.97,
-    'Ограниченная страховка': 1
-}
-
-KBM_COEFFICIENTS = {
-    (1, 0): 1.76, (1, 1): 3.92,
-    (2, 0): 1.17, (2, 1): 2.25, (2, 2): 3.92,
-    (3, 0): 1, (3, 1): 2.25, (3, 2): 3.92,
-    (4, 0): 0.91, (4, 1): 1.76, (4, 2): 2.25, (4, 3): 3.92,
-    (5, 0): 0.83, (5, 1): 1.17, (5, 2): 2.25, (5, 3): 3.92,
-    (6, 0): 0.78, (6, 1): 1, (6, 2): 1.76, (6, 3): 3.92,
-    (7, 0): 0.74, (7, 1): 1, (7, 2): 1.76, (7, 3): 3.92,
-    (8, 0): 0.68, (8, 1): 0.91, (8, 2): 1.76, (8, 3): 3.92,
-    (9, 0): 0.63, (9, 1): 0.91, (9, 2): 1.76, (9, 3): 2.25, (9, 4): 3.92,
-    (10, 0): 0.57, (10, 1): 0.83, (10, 2): 1.76, (10, 3): 2.25, (10, 4): 3.92,
-    (11, 0): 0.52, (11, 1): 0.83, (11, 2): 1.76, (11, 3): 2.25, (11, 4): 3.92,
-    (12, 0): 0.46, (12, 1): 0.78, (12, 2): 1.76, (12, 3): 2.25, (12, 4): 3.92,
-}
-
-KM_COEFFICIENTS = {
-    50: 0.6, 70: 1, 100: 1.1, 120: 1.2, 150: 1.4
-}
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('PORT', 8443))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 100))
+
+# Polling: пачки getUpdates обрабатываются пулом потоков, update_id последнего
+# обработанного обновления сохраняется (file — в UPDATE_OFFSET_FILE, redis — рядом
+# с сессиями), поэтому после перезапуска обновления не повторяются и не теряются
+POLL_WORKERS = int(os.getenv('POLL_WORKERS', 8))
+POLL_BATCH_SIZE = int(os.getenv('POLL_BATCH_SIZE', 100))
+POLL_TIMEOUT = int(os.getenv('POLL_TIMEOUT', 25))
+UPDATE_OFFSET_BACKEND = os.getenv('UPDATE_OFFSET_BACKEND', 'redis' if SESSION_BACKEND == 'redis' else 'file')
+UPDATE_OFFSET_FILE = os.getenv('UPDATE_OFFSET_FILE', 'update_offset')
+
+# Адрес Bot API можно подменить, например на локальный тестовый сервер
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+    apihelper.FILE_URL = TELEGRAM_API_URL.rstrip('/') + '/file/bot{0}/{1}'
+
+# Обработчики сообщений выбираются по индексу: команда, текст кнопки, состояние
+bot = IndexedTeleBot(BOT_TOKEN, state_storage=sessions)
+
+# Метрики Prometheus на локальном порту; без METRICS_PORT обработчики не оборачиваются
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+metrics = Metrics(enabled=bool(METRICS_PORT))
+
+# Исходящие сообщения отправляются из очереди с учетом лимитов Telegram:
+# общего (около 30 сообщений в секунду) и на один чат
+OUTBOX_RATE = float(os.getenv('OUTBOX_RATE', 30))
+OUTBOX_CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', 1))
+OUTBOX_CHAT_BURST = int(os.getenv('OUTBOX_CHAT_BURST', 3))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 4))
+OUTBOX_QUEUE_SIZE = int(os.getenv('OUTBOX_QUEUE_SIZE', 10000))
+outbox = Outbox(
+    rate=OUTBOX_RATE, chat_rate=OUTBOX_CHAT_RATE, chat_burst=OUTBOX_CHAT_BURST,
+    workers=OUTBOX_WORKERS, queue_size=OUTBOX_QUEUE_SIZE
+)
+
+# Результаты расчета по набору коэффициентов (общие для диалога, /quote и инлайн-режима)
+quote_cache = QuoteCache(
+    maxsize=int(os.getenv('QUOTE_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('QUOTE_CACHE_TTL', 3600))
+)
+INLINE_CACHE_TIME = 300  # секунд, сколько Telegram хранит ответ на одинаковый инлайн-запрос
+
+# История расчетов в SQLite: запись пачками в фоновом потоке, /history и /repeat
+# читают последние HISTORY_LIMIT расчетов чата по индексу; базу открывает start()
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', 'history.db')
+HISTORY_LIMIT = int(os.getenv('HISTORY_LIMIT', 5))
+history = None
+
+# Тарифы читаются из файла с версией и заменяются без перезапуска:
+# при изменении файла (проверка раз в TARIFF_WATCH_INTERVAL секунд, 0 — не следить)
+# или командой /reload_tariffs от администратора
+TARIFF_FILE = os.getenv('TARIFF_FILE')
+TARIFF_WATCH_INTERVAL = float(os.getenv('TARIFF_WATCH_INTERVAL', 30))
+if TARIFF_FILE:
+    tariff.use(TARIFF_FILE)
+ADMIN_CHAT_IDS = {int(chat_id) for chat_id in os.getenv('ADMIN_CHAT_IDS', '').replace(',', ' ').split()}
+
+# Профилирование потоков обработки по команде /profile из ADMIN_CHAT_IDS:
+# снимок стеков раз в PROFILE_INTERVAL секунд, сбор не дольше PROFILE_MAX_SECONDS
+profiler = Profiler(
+    interval=float(os.getenv('PROFILE_INTERVAL', 0.005)),
+    max_seconds=int(os.getenv('PROFILE_MAX_SECONDS', 120))
+)
+
+# Сравнение вариантов последнего расчета: все периоды, город пользователя и
+# COMPARE_CITIES (если в /compare не указаны свои), стаж ±COMPARE_EXPERIENCE_DELTA лет.
+# Без переменных — значения batch_quote; сам batch_quote (NumPy) импортируется при первом сравнении
+COMPARE_CITIES = [city.strip() for city in os.getenv('COMPARE_CITIES', '').split(',') if city.strip()]
+COMPARE_EXPERIENCE_DELTA = os.getenv('COMPARE_EXPERIENCE_DELTA')
+
+# Полис на несколько водителей: к последнему расчету добавляются водители
+# (вместе с первым не больше MAX_DRIVERS), КВС и КБМ полиса — наибольшие среди них
+MAX_DRIVERS = int(os.getenv('MAX_DRIVERS', 50))
+
+def send_message(chat_id, text, **kwargs):
+    """Ставит сообщение в очередь исходящих, не дожидаясь ответа Bot API."""
+    outbox.submit(chat_id, bot.send_message, chat_id, text, **kwargs)
+
+# Ограничение входящих сообщений одного чата: THROTTLE_RATE в секунду, не больше
+# THROTTLE_BURST подряд (0 — без ограничения). Лишние отбрасываются до выбора
+# обработчика, о превышении чат узнает одним сообщением
+THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', 1))
+THROTTLE_BURST = int(os.getenv('THROTTLE_BURST', 10))
+if THROTTLE_RATE > 0:
+    bot.throttle = Throttle(
+        rate=THROTTLE_RATE, burst=THROTTLE_BURST,
+        notify=lambda chat_id: send_message(chat_id, messages.THROTTLED)
+    )
 
 # Определение состояний
 class UserState(StatesGroup):
@@ -149,465 +175,528 @@ class UserState(StatesGroup):
     waiting_for_novice = State()
     waiting_for_accidents = State()
     waiting_for_accident_period = State()
-
-# Хранение данных пользователя
-user_data = {}
-
-# Функции расчета (исправленные)
-def ko_coef(lico):
-    return KO_COEFFICIENTS.get(lico, 1)
-
-def kbm_coef(period, accidents):
-    for (per, acc), coef in KBM_COEFFICIENTS.items():
-        if per == period and acc == accidents:
-            return coef
-    return 3.92  # Максимальный коэффициент при несовпадении
-
-def kt_coef(city):
-    return KT_COEFFICIENTS.get(city, 1.5)
-
-def kbs_coef(experience, age):
-    max_exp = int(min(experience, 20))  # Исправлено: приведение к int
-    for (exp, min_age, max_age), coef in KBS_COEFFICIENTS.items():
-        if exp == max_exp and min_age <= age < max_age:
-            return coef
-    return 1.5
-
-def kc_coef(period):
-    return KC_COEFFICIENTS.get(period, 1)
-
-def km_coef(power):
-    for key in sorted(KM_COEFFICIENTS):
-        if power <= key:
-            return KM_COEFFICIENTS[key]
-    if power > 150:
-        return 1.6
-    return 1
+    waiting_for_drivers = State()
 
 # Команда /start
 @bot.message_handler(commands=['start'])
 def start(message):
-    logger.info(f"Пользователь {message.chat.id} запустил бота")
-    
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    btn1 = types.KeyboardButton("👋 Начать расчет")
-    btn2 = types.KeyboardButton("ℹ️ Какие данные нужны?")
-    btn3 = types.KeyboardButton("📚 Помощь")
-    markup.add(btn1, btn2, btn3)
-    
-    welcome_text = (
-        "👋 Привет! Я твой бот-калькулятор ОСАГО!\n\n"
-        "Я помогу рассчитать стоимость полиса ОСАГО "
-        "на основе твоих данных.\n\n"
-        "Выбери действие:"
-    )
-    bot.send_message(message.chat.id, welcome_text, reply_markup=markup)
+    logger.info(f"Пользователь {message.chat.id} запустил бота",
+                extra={'chat_id': message.chat.id, 'handler': 'start'})
+    send_message(message.chat.id, messages.WELCOME, reply_markup=keyboards.start_menu())
 
 # Команда /help
 @bot.message_handler(commands=['help'])
-@bot.message_handler(func=lambda message: message.text == "📚 Помощь")
+@bot.message_handler(text=[messages.BTN_HELP])
 def show_help(message):
-    help_text = (
-        "📚 <b>Доступные команды:</b>\n\n"
-        "/start - Начать работу с ботом\n"
-        "/help - Показать это сообщение\n"
-        "/calc - Начать новый расчет\n\n"
-        "<b>Для расчета ОСАГО потребуются:</b>\n"
-        "• Вид страхователя\n"
-        "• Город регистрации ТС\n"
-        "• Мощность двигателя (л.с.)\n"
-        "• Стаж вождения (лет)\n"
-        "• Возраст водителя\n"
-        "• Период страхования\n"
-        "• Информация об авариях\n\n"
-        "<i>Расчет производится по данным водителя "
-        "с наименьшим стажем или новичка.</i>"
-    )
-    bot.send_message(message.chat.id, help_text, parse_mode='HTML')
+    send_message(message.chat.id, messages.HELP, parse_mode='HTML')
 
 # Команда /calc
 @bot.message_handler(commands=['calc'])
-@bot.message_handler(func=lambda message: message.text == "👋 Начать расчет")
+@bot.message_handler(text=[messages.BTN_START_CALC])
 def start_calculation(message):
     try:
-        # Инициализируем данные пользователя
-        user_data[message.chat.id] = {}
-        
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=1)
-        btn1 = types.KeyboardButton('Физическое лицо')
-        btn2 = types.KeyboardButton('Юридическое лицо')
-        btn3 = types.KeyboardButton('Ограниченная страховка')
-        markup.add(btn1, btn2, btn3)
-        
-        bot.send_message(
+        send_message(
             message.chat.id,
-            "🏢 Выберите вид страхователя:",
-            reply_markup=markup
+            messages.ASK_INSURANCE_TYPE,
+            reply_markup=keyboards.insurance_types()
         )
-        bot.set_state(message.from_user.id, UserState.waiting_for_insurance_type, message.chat.id)
-        logger.info(f"Пользователь {message.chat.id} начал расчет")
+        # Начинаем новую сессию: данные пользователя сбрасываются вместе с состоянием
+        sessions.start(message.chat.id, message.from_user.id, UserState.waiting_for_insurance_type)
+        logger.info(f"Пользователь {message.chat.id} начал расчет",
+                    extra={'chat_id': message.chat.id, 'handler': 'start_calculation'})
         
     except Exception as e:
         logger.error(f"Ошибка в start_calculation: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
-@bot.message_handler(func=lambda message: message.text == "ℹ️ Какие данные нужны?")
+@bot.message_handler(text=[messages.BTN_INSTRUCTIONS])
 def show_instructions(message):
-    instructions = (
-        "📋 <b>Для расчета ОСАГО нужны следующие данные:</b>\n\n"
-        "1. <b>Вид страхователя:</b>\n"
-        "   • Физическое лицо\n"
-        "   • Юридическое лицо\n"
-        "   • Ограниченная страховка\n\n"
-        "2. <b>Город регистрации ТС</b>\n"
-        "3. <b>Мощность двигателя</b> (л.с.)\n"
-        "4. <b>Стаж вождения</b> (лет)\n"
-        "5. <b>Возраст водителя</b>\n"
-        "6. <b>Период страхования</b> (3-12 мес.)\n"
-        "7. <b>Начинающий водитель?</b>\n"
-        "8. <b>Количество аварий</b> (если не новичок)\n\n"
-        "<i>Расчет производится по данным водителя "
-        "с наименьшим стажем или новичка.</i>"
+    send_message(
+        message.chat.id, messages.INSTRUCTIONS, parse_mode='HTML',
+        reply_markup=keyboards.instructions_menu()
+    )
+
+# Расчет одной строкой: /quote физ Казань 105 5 30 12 0 3
+@bot.message_handler(commands=['quote'])
+def quick_quote(message):
+    try:
+        data = validation.parse_quote(message.text)
+    except validation.InputError as e:
+        text = str(e) if e.field is None else f"❌ {e}\n\n{messages.QUOTE_USAGE}"
+        send_message(message.chat.id, text)
+        return
+    except Exception as e:
+        logger.error(f"Ошибка в quick_quote: {e}")
+        send_message(message.chat.id, messages.ERROR)
+        return
+    # Диалог, если он начат, не прерывается: расчет одной строкой не трогает сессию
+    perform_calculation(message.chat.id, message.from_user.id, data, finish_session=False)
+
+# Сравнение последнего расчета одной таблицей: /compare [города через запятую]
+@bot.message_handler(commands=['compare'])
+@bot.message_handler(text=[messages.BTN_COMPARE])
+def compare_quotes(message):
+    data = (sessions.get(message.chat.id) or {}).get('last_quote')
+    if not data:
+        send_message(message.chat.id, messages.COMPARE_NO_QUOTE)
+        return
+    if 'drivers' in data:
+        send_message(message.chat.id, messages.COMPARE_SINGLE_DRIVER)
+        return
+    try:
+        import batch_quote
+
+        cities = [] if message.text == messages.BTN_COMPARE else validation.parse_compare_cities(message.text)
+        grid = batch_quote.compare_profile(
+            data, cities or COMPARE_CITIES or batch_quote.COMPARE_CITIES,
+            experience_delta=int(COMPARE_EXPERIENCE_DELTA or batch_quote.COMPARE_EXPERIENCE_DELTA)
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
+        return
+    except Exception as e:
+        logger.error(f"Ошибка в compare_quotes: {e}")
+        send_message(message.chat.id, messages.ERROR)
+        return
+    send_message(message.chat.id, messages.format_compare(data, grid), parse_mode='HTML')
+
+# Водители к последнему расчету: кнопка или /drivers спрашивают список,
+# /drivers со строками водителей после команды сразу пересчитывает полис
+@bot.message_handler(commands=['drivers'])
+@bot.message_handler(text=[messages.BTN_ADD_DRIVERS])
+def add_drivers(message):
+    data = (sessions.get(message.chat.id) or {}).get('last_quote')
+    if not data:
+        send_message(message.chat.id, messages.DRIVERS_NO_QUOTE)
+        return
+    text = message.text.split(maxsplit=1)[1:] if message.text.startswith('/') else []
+    if text:
+        price_drivers(message, data, text[0])
+        return
+    count = drivers.count(data['drivers']) if 'drivers' in data else 1
+    send_message(
+        message.chat.id, messages.ASK_DRIVERS.format(count=count, limit=MAX_DRIVERS),
+        reply_markup=keyboards.remove(), parse_mode='HTML'
+    )
+    sessions.advance(message.chat.id, message.from_user.id, UserState.waiting_for_drivers)
+
+def price_drivers(message, data, text):
+    """Добавляет водителей из text к расчету data и считает полис."""
+    try:
+        added = validation.parse_drivers(text)
+        # Первый водитель — из обычного расчета; список хранится в сессии строкой drivers.pack
+        packed = data.get('drivers') or drivers.pack([drivers.from_profile(data)])
+        if drivers.count(packed) + len(added) > MAX_DRIVERS:
+            send_message(
+                message.chat.id, messages.DRIVERS_TOO_MANY.format(limit=MAX_DRIVERS, count=drivers.count(packed))
+            )
+            return
+        perform_calculation(message.chat.id, message.from_user.id, {**data, 'drivers': packed + drivers.pack(added)})
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
+    except Exception as e:
+        logger.error(f"Ошибка в price_drivers: {e}")
+        send_message(message.chat.id, messages.ERROR)
+
+# Последние расчеты чата
+@bot.message_handler(commands=['history'])
+def show_history(message):
+    try:
+        entries = history.recent(message.chat.id, HISTORY_LIMIT)
+    except Exception as e:
+        logger.error(f"Ошибка в show_history: {e}")
+        send_message(message.chat.id, messages.ERROR)
+        return
+    send_message(
+        message.chat.id, messages.format_history(entries) if entries else messages.HISTORY_EMPTY, parse_mode='HTML'
+    )
+
+# Повтор последнего расчета: результат берется из истории без пересчета,
+# если с тех пор не сменилась версия тарифов
+@bot.message_handler(commands=['repeat'])
+@bot.message_handler(text=[messages.BTN_REPEAT])
+def repeat_last_quote(message):
+    chat_id = message.chat.id
+    try:
+        entry = history.last(chat_id)
+    except Exception as e:
+        logger.error(f"Ошибка в repeat_last_quote: {e}")
+        send_message(chat_id, messages.ERROR)
+        return
+    if entry is None:
+        send_message(chat_id, messages.HISTORY_EMPTY)
+        return
+    if entry['quote']['tariff_version'] != tariff.VERSION:
+        perform_calculation(chat_id, message.from_user.id, entry['data'], finish_session=False)
+        return
+    send_message(
+        chat_id, messages.format_result(entry['data'], entry['quote']),
+        reply_markup=keyboards.result_menu(), parse_mode='HTML'
     )
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    btn1 = types.KeyboardButton("👋 Начать расчет")
-    markup.add(btn1)
-    bot.send_message(message.chat.id, instructions, parse_mode='HTML', reply_markup=markup)
+    sessions.update(chat_id, last_quote=entry['data'])
 
 # Обработчики состояний
 @bot.message_handler(state=UserState.waiting_for_insurance_type)
 def get_insurance_type(message):
     try:
-        if message.text in ['Физическое лицо', 'Юридическое лицо', 'Ограниченная страховка']:
-            user_data[message.chat.id]['insurance_type'] = message.text
-            user_data[message.chat.id]['ko'] = KO_COEFFICIENTS[message.text]
-            
-            # Создаем клавиатуру с городами
-            cities = list(KT_COEFFICIENTS.keys())
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-            
-            # Добавляем кнопки для городов
-            buttons = []
-            for i in range(0, len(cities), 2):
-                row = cities[i:i+2]
-                markup.row(*[types.KeyboardButton(city) for city in row])
-            
-            bot.send_message(
-                message.chat.id,
-                "📍 Выберите город регистрации транспортного средства:",
-                reply_markup=markup
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_city, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Пожалуйста, выберите один из предложенных вариантов.")
+        insurance_type = validation.parse_insurance_type(message.text)
+        send_message(message.chat.id, messages.ASK_CITY, reply_markup=keyboards.cities())
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_city,
+            insurance_type=insurance_type, ko=tariff.KO_COEFFICIENTS[insurance_type]
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_insurance_type: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_city)
 def get_city(message):
     try:
-        if message.text in KT_COEFFICIENTS:
-            user_data[message.chat.id]['city'] = message.text
-            user_data[message.chat.id]['kt'] = KT_COEFFICIENTS[message.text]
-            
-            bot.send_message(
-                message.chat.id,
-                "🚗 Введите мощность двигателя в лошадиных силах (например: 105):",
-                reply_markup=types.ReplyKeyboardRemove()
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_power, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Пожалуйста, выберите город из списка.")
+        city = validation.parse_city(message.text)
+        send_message(message.chat.id, messages.ASK_POWER, reply_markup=keyboards.remove())
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_power,
+            city=city, kt=tariff.KT_COEFFICIENTS[city]
+        )
+    except validation.InputError as e:
+        # Похожие города — кнопками, состояние не меняется; ничего похожего — снова весь список
+        markup = keyboards.city_suggestions(e.options) if e.options else keyboards.cities()
+        send_message(message.chat.id, str(e), reply_markup=markup)
     except Exception as e:
         logger.error(f"Ошибка в get_city: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_power)
 def get_power(message):
     try:
-        power = float(message.text.replace(',', '.'))
-        if power > 0:
-            user_data[message.chat.id]['power'] = power
-            
-            bot.send_message(
-                message.chat.id,
-                "📅 Введите стаж вождения в годах (например: 5):"
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_experience, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Мощность должна быть положительным числом. Попробуйте снова:")
-    except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, введите число (например: 105):")
+        power = validation.parse_power(message.text)
+        send_message(message.chat.id, messages.ASK_EXPERIENCE)
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_experience,
+            power=power
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_power: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_experience)
 def get_experience(message):
     try:
-        experience = float(message.text.replace(',', '.'))
-        if experience >= 0:
-            user_data[message.chat.id]['experience'] = experience
-            
-            bot.send_message(
-                message.chat.id,
-                "🎂 Введите возраст водителя (от 18 лет):"
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_age, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Стаж не может быть отрицательным. Попробуйте снова:")
-    except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, введите число (например: 5):")
+        experience = validation.parse_experience(message.text)
+        send_message(message.chat.id, messages.ASK_AGE)
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_age,
+            experience=experience
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_experience: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_age)
 def get_age(message):
     try:
-        age = int(message.text)
-        if age >= 18:
-            user_data[message.chat.id]['age'] = age
-            
-            # Создаем клавиатуру для выбора периода
-            periods = list(KC_COEFFICIENTS.keys())
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-            
-            for i in range(0, len(periods), 3):
-                row = periods[i:i+3]
-                markup.row(*[types.KeyboardButton(str(period)) for period in row])
-            
-            bot.send_message(
-                message.chat.id,
-                "📆 Выберите период страхования (в месяцах):",
-                reply_markup=markup
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_period, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Возраст должен быть не менее 18 лет. Попробуйте снова:")
-    except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, введите целое число (например: 25):")
+        age = validation.parse_age(message.text)
+        send_message(message.chat.id, messages.ASK_PERIOD, reply_markup=keyboards.periods())
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_period,
+            age=age
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_age: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_period)
 def get_period(message):
     try:
-        period = int(message.text)
-        if 3 <= period <= 12:
-            user_data[message.chat.id]['period'] = period
-            user_data[message.chat.id]['kc'] = KC_COEFFICIENTS[period]
-            
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-            btn1 = types.KeyboardButton('Да')
-            btn2 = types.KeyboardButton('Нет')
-            markup.add(btn1, btn2)
-            
-            bot.send_message(
-                message.chat.id,
-                "🎓 Вы начинающий водитель (стаж менее 3 лет)?",
-                reply_markup=markup
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_novice, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Период должен быть от 3 до 12 месяцев. Выберите из списка:")
-    except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, выберите период из списка:")
+        period = validation.parse_period(message.text)
+        send_message(message.chat.id, messages.ASK_NOVICE, reply_markup=keyboards.yes_no())
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_novice,
+            period=period, kc=tariff.KC_COEFFICIENTS[period]
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_period: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_novice)
 def get_novice(message):
     try:
-        if message.text in ['Да', 'Нет']:
-            is_novice = (message.text == 'Да')
-            user_data[message.chat.id]['is_novice'] = is_novice
-            
-            if is_novice:
-                user_data[message.chat.id]['kbm'] = 1.17
-                # Переходим к расчету
-                perform_calculation(message.chat.id, message.from_user.id)
-            else:
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-                
-                # Создаем кнопки для количества аварий
-                accidents_buttons = []
-                for i in range(0, 5):
-                    accidents_buttons.append(types.KeyboardButton(str(i)))
-                
-                for i in range(0, len(accidents_buttons), 3):
-                    row = accidents_buttons[i:i+3]
-                    markup.row(*row)
-                
-                bot.send_message(
-                    message.chat.id,
-                    "⚠️ Введите количество аварий за последние несколько лет:",
-                    reply_markup=markup
-                )
-                bot.set_state(message.from_user.id, UserState.waiting_for_accidents, message.chat.id)
+        is_novice = validation.parse_yes_no(message.text)
+        if is_novice:
+            data = sessions.get(message.chat.id)
+            data.update(is_novice=is_novice, kbm=tariff.NOVICE_KBM)
+            # Переходим к расчету
+            perform_calculation(message.chat.id, message.from_user.id, data)
         else:
-            bot.send_message(message.chat.id, "Пожалуйста, ответьте 'Да' или 'Нет':")
+            send_message(message.chat.id, messages.ASK_ACCIDENTS, reply_markup=keyboards.accidents())
+            sessions.advance(
+                message.chat.id, message.from_user.id, UserState.waiting_for_accidents, is_novice=is_novice
+            )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_novice: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_accidents)
 def get_accidents(message):
     try:
-        accidents = int(message.text)
-        if accidents >= 0:
-            user_data[message.chat.id]['accidents'] = accidents
-            
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-            
-            # Создаем кнопки для периода аварийности
-            period_buttons = []
-            for i in range(1, 13):
-                period_buttons.append(types.KeyboardButton(str(i)))
-            
-            for i in range(0, len(period_buttons), 3):
-                row = period_buttons[i:i+3]
-                markup.row(*row)
-            
-            bot.send_message(
-                message.chat.id,
-                "📊 За какой период (в годах) учитываются аварии?",
-                reply_markup=markup
-            )
-            bot.set_state(message.from_user.id, UserState.waiting_for_accident_period, message.chat.id)
-        else:
-            bot.send_message(message.chat.id, "Количество аварий не может быть отрицательным. Попробуйте снова:")
-    except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, введите число (например: 0, 1, 2):")
+        accidents = validation.parse_accidents(message.text)
+        send_message(
+            message.chat.id, messages.ASK_ACCIDENT_PERIOD,
+            reply_markup=keyboards.accident_periods()
+        )
+        sessions.advance(
+            message.chat.id, message.from_user.id, UserState.waiting_for_accident_period,
+            accidents=accidents
+        )
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_accidents: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
+        send_message(message.chat.id, messages.ERROR)
 
 @bot.message_handler(state=UserState.waiting_for_accident_period)
 def get_accident_period(message):
     try:
-        accident_period = int(message.text)
-        if 1 <= accident_period <= 12:
-            user_data[message.chat.id]['accident_period'] = accident_period
-            
-            # Рассчитываем КБМ
-            accidents = user_data[message.chat.id].get('accidents', 0)
-            kbm = kbm_coef(accident_period, accidents)
-            user_data[message.chat.id]['kbm'] = kbm
-            
-            # Переходим к расчету
-            perform_calculation(message.chat.id, message.from_user.id)
-        else:
-            bot.send_message(message.chat.id, "Период должен быть от 1 до 12 лет. Выберите из списка:")
-    except ValueError:
-        bot.send_message(message.chat.id, "Пожалуйста, выберите период из списка:")
+        accident_period = validation.parse_accident_period(message.text)
+        # Рассчитываем КБМ
+        data = sessions.get(message.chat.id)
+        kbm = tariff.kbm_coef(accident_period, data.get('accidents', 0))
+        data.update(accident_period=accident_period, kbm=kbm)
+
+        # Переходим к расчету
+        perform_calculation(message.chat.id, message.from_user.id, data)
+    except validation.InputError as e:
+        send_message(message.chat.id, str(e))
     except Exception as e:
         logger.error(f"Ошибка в get_accident_period: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла ошибка. Попробуйте снова /start")
-
-def perform_calculation(chat_id, user_id):
+        send_message(message.chat.id, messages.ERROR)
+
+@bot.message_handler(state=UserState.waiting_for_drivers)
+def get_drivers(message):
+    data = (sessions.get(message.chat.id) or {}).get('last_quote')
+    if not data:
+        send_message(message.chat.id, messages.DATA_NOT_FOUND)
+        return
+    price_drivers(message, data, message.text)
+
+@metrics.timed('perform_calculation')
+def perform_calculation(chat_id, user_id, data=None, finish_session=True):
+    started = time.perf_counter()
+    priced = None
     try:
-        data = user_data.get(chat_id, {})
+        if data is None:
+            data = sessions.get(chat_id)
         if not data:
-            bot.send_message(chat_id, "❌ Данные не найдены. Начните расчет снова /start")
+            send_message(chat_id, messages.DATA_NOT_FOUND)
             return
         
-        # Получаем все коэффициенты
-        ko = data.get('ko', 1)
-        kt = data.get('kt', 1)
-        power = data.get('power', 100)
-        experience = data.get('experience', 5)
-        age = data.get('age', 30)
-        period = data.get('period', 10)
-        kc = data.get('kc', 1)
-        kbm = data.get('kbm', 1)
-        
-        # Рассчитываем остальные коэффициенты
-        kbs = kbs_coef(experience, age)
-        km = km_coef(power)
+        # Рассчитываем коэффициенты и стоимость
+        result, price_text = quote_cache.quote(data)
+        result_text = messages.format_result(data, result, price_text)
         
-        # Базовые тарифы
-        tarif_min = 1646
-        tarif_max = 3535
-        
-        # Рассчитываем стоимость
-        summa_min = int(tarif_min * ko * km * kc * kbs * kbm * kt)
-        summa_max = int(tarif_max * ko * km * kc * kbs * kbm * kt)
-        
-        # Формируем результат
-        result_text = (
-            f"✅ <b>Расчет ОСАГО завершен!</b>\n\n"
-            f"📊 <b>Итоговая стоимость:</b>\n"
-            f"   <b>От:</b> {summa_min:,} руб.\n"
-            f"   <b>До:</b> {summa_max:,} руб.\n\n"
-            f"📈 <b>Примененные коэффициенты:</b>\n"
-            f"   КО (вид страхования): {ko}\n"
-            f"   КТ (территория): {kt}\n"
-            f"   КВС (стаж/возраст): {kbs}\n"
-            f"   КС (период): {kc}\n"
-            f"   КБМ (аварийность): {kbm}\n"
-            f"   КМ (мощность): {km}\n\n"
-            f"📋 <b>Введенные данные:</b>\n"
-            f"   Вид страхования: {data.get('insurance_type', 'Не указано')}\n"
-            f"   Город: {data.get('city', 'Не указан')}\n"
-            f"   Мощность: {power} л.с.\n"
-            f"   Стаж: {experience} лет\n"
-            f"   Возраст: {age} лет\n"
-            f"   Период: {period} мес.\n"
-            f"   Новичок: {'Да' if data.get('is_novice', False) else 'Нет'}"
-        )
-        
-        if not data.get('is_novice', True):
-            result_text += f"\n   Аварий: {data.get('accidents', 0)} за {data.get('accident_period', 1)} лет"
-        
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        btn1 = types.KeyboardButton("👋 Начать новый расчет")
-        btn2 = types.KeyboardButton("📚 Помощь")
-        markup.add(btn1, btn2)
-        
-        bot.send_message(chat_id, result_text, reply_markup=markup, parse_mode='HTML')
+        send_message(chat_id, result_text, reply_markup=keyboards.result_menu(), parse_mode='HTML')
+        # Профиль последнего расчета остается в сессии для сравнения вариантов
+        priced = {key: value for key, value in data.items() if key != 'last_quote'}
+        history.record(chat_id, priced, result)
         
         # Логируем успешный расчет
-        logger.info(f"Пользователь {chat_id} выполнил расчет: {summa_min} - {summa_max} руб.")
+        logger.info(
+            f"Пользователь {chat_id} выполнил расчет: {result['summa_min']} - {result['summa_max']} руб.",
+            extra={
+                'chat_id': chat_id, 'handler': 'perform_calculation',
+                'latency': round(time.perf_counter() - started, 6),
+                'summa_min': result['summa_min'], 'summa_max': result['summa_max'],
+                'tariff_version': result['tariff_version'],
+            }
+        )
         
     except Exception as e:
         logger.error(f"Ошибка в perform_calculation для пользователя {chat_id}: {e}")
-        bot.send_message(chat_id, "❌ Произошла ошибка при расчете. Попробуйте снова /start")
+        send_message(chat_id, messages.CALCULATION_ERROR)
     
     finally:
         # Очищаем состояние и данные пользователя
-        try:
-            bot.delete_state(user_id, chat_id)
-            if chat_id in user_data:
-                del user_data[chat_id]
-        except:
-            pass
+        if finish_session:
+            sessions.finish(chat_id, **({'last_quote': priced} if priced else {}))
+        elif priced:
+            sessions.update(chat_id, last_quote=priced)
+
+# Администрирование тарифов: команды видны только чатам из ADMIN_CHAT_IDS
+@bot.message_handler(commands=['tariffs'], func=lambda message: message.chat.id in ADMIN_CHAT_IDS)
+def show_tariffs(message):
+    send_message(message.chat.id, messages.TARIFFS_CURRENT.format(version=tariff.VERSION))
+
+@bot.message_handler(commands=['reload_tariffs'], func=lambda message: message.chat.id in ADMIN_CHAT_IDS)
+def reload_tariffs(message):
+    previous = tariff.VERSION
+    try:
+        current, changed = tariff.reload()
+    except tariff.TariffError as e:
+        logger.error(f"Тарифы не обновлены по команде {message.chat.id}: {e}")
+        send_message(message.chat.id, messages.TARIFFS_RELOAD_FAILED.format(error=e))
+        return
+    if changed:
+        logger.info(f"Администратор {message.chat.id} обновил тарифы: {previous} -> {current.version}",
+                    extra={'chat_id': message.chat.id, 'handler': 'reload_tariffs'})
+        send_message(message.chat.id, messages.TARIFFS_RELOADED.format(previous=previous, version=current.version))
+    else:
+        send_message(message.chat.id, messages.TARIFFS_UNCHANGED.format(version=current.version))
+
+# Профилирование: /profile [sample|cprofile|trace] [секунд], результат — сводка и файл
+@bot.message_handler(commands=['profile'], func=lambda message: message.chat.id in ADMIN_CHAT_IDS)
+def start_profile(message):
+    mode, seconds = 'sample', 10
+    for arg in message.text.split()[1:]:
+        if arg in PROFILE_MODES:
+            mode = arg
+        elif arg.isdigit():
+            seconds = int(arg)
+        else:
+            send_message(message.chat.id, messages.PROFILE_USAGE)
+            return
+    try:
+        seconds = profiler.start(mode, seconds, lambda report: send_profile(message.chat.id, report))
+    except ProfileBusy as e:
+        send_message(message.chat.id, messages.PROFILE_BUSY.format(mode=e))
+        return
+    logger.info(f"Администратор {message.chat.id} запустил профилирование {mode} на {seconds} с",
+                extra={'chat_id': message.chat.id, 'handler': 'start_profile'})
+    send_message(message.chat.id, messages.PROFILE_STARTED.format(mode=mode, seconds=seconds))
+
+def send_profile(chat_id, report):
+    # Вызывается из потока профилировщика, поэтому отправка идет напрямую, как у файлов автопарка
+    try:
+        bot.send_message(chat_id, messages.format_profile(report), parse_mode='HTML')
+        if report.content:
+            bot.send_document(chat_id, io.BytesIO(report.content), visible_file_name=report.file_name)
+    except Exception as e:
+        logger.error(f"Не удалось отправить профиль администратору {chat_id}: {e}")
 
-@bot.message_handler(func=lambda message: message.text == "👋 Начать новый расчет")
+@bot.message_handler(text=[messages.BTN_NEW_CALC])
 def new_calculation(message):
     start_calculation(message)
 
 # Обработчик всех остальных сообщений
 @bot.message_handler(func=lambda message: True)
 def handle_other_messages(message):
-    if message.text not in ["👋 Начать расчет", "ℹ️ Какие данные нужны?", "👋 Начать новый расчет", "📚 Помощь"]:
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        btn1 = types.KeyboardButton("👋 Начать расчет")
-        btn2 = types.KeyboardButton("📚 Помощь")
-        markup.add(btn1, btn2)
-        
-        bot.send_message(
-            message.chat.id,
-            "Для начала расчета нажмите '👋 Начать расчет'.\n"
-            "Для получения помощи нажмите '📚 Помощь'",
-            reply_markup=markup
+    # Все параметры одной строкой, как в /quote, но без команды
+    if message.text and len(message.text.split()) >= validation.QUOTE_MIN_WORDS:
+        try:
+            data = validation.parse_quote(message.text)
+        except validation.InputError:
+            pass
+        else:
+            perform_calculation(message.chat.id, message.from_user.id, data, finish_session=False)
+            return
+    # Кнопки меню сюда не доходят: у каждой свой обработчик в индексе
+    send_message(message.chat.id, messages.OTHER_MESSAGE, reply_markup=keyboards.other_messages_menu())
+
+# Инлайн-режим: @bot Москва 150 10 35 12 в любом чате
+@bot.inline_handler(func=lambda query: True)
+def inline_quote(inline_query):
+    try:
+        try:
+            data = validation.parse_quote(inline_query.query, partial=True)
+        except validation.InputError:
+            results = [types.InlineQueryResultArticle(
+                'help', messages.INLINE_HELP_TITLE,
+                types.InputTextMessageContent(messages.QUOTE_USAGE),
+                description=messages.INLINE_HELP_DESCRIPTION
+            )]
+        else:
+            result, price_text = quote_cache.quote(data)
+            results = [types.InlineQueryResultArticle(
+                f"{result['summa_min']}-{result['summa_max']}", messages.format_inline_title(result),
+                types.InputTextMessageContent(messages.format_result(data, result, price_text), parse_mode='HTML'),
+                description=messages.format_inline_description(data, result)
+            )]
+        # Ответ нужен сразу, пока пользователь печатает, поэтому он идет мимо очереди исходящих
+        bot.answer_inline_query(inline_query.id, results, cache_time=INLINE_CACHE_TIME)
+    except Exception as e:
+        logger.error(f"Ошибка в inline_quote: {e}")
+
+# Расчет автопарка по файлу
+FLEET_WORKERS = int(os.getenv('FLEET_WORKERS', 2))
+FLEET_PROGRESS_INTERVAL = 3  # секунд между обновлениями статуса
+fleet_executor = ThreadPoolExecutor(max_workers=FLEET_WORKERS, thread_name_prefix='fleet')
+
+@bot.message_handler(content_types=['document'])
+def handle_fleet_document(message):
+    try:
+        file_name = message.document.file_name or ''
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in ('.csv', '.xlsx'):
+            send_message(message.chat.id, messages.FLEET_WRONG_FORMAT)
+            return
+
+        status = bot.send_message(message.chat.id, messages.FLEET_RECEIVED)
+        # Расчет идет в отдельном потоке, чтобы не задерживать диалоги других пользователей
+        fleet_executor.submit(
+            process_fleet_document, message.chat.id, message.document.file_id,
+            file_name, status.message_id
         )
+        logger.info(f"Пользователь {message.chat.id} загрузил файл {file_name}")
+
+    except Exception as e:
+        logger.error(f"Ошибка в handle_fleet_document: {e}")
+        send_message(message.chat.id, messages.ERROR)
+
+def process_fleet_document(chat_id, file_id, file_name, status_id):
+    workdir = tempfile.mkdtemp(prefix='fleet_')
+    name, extension = os.path.splitext(file_name)
+    source_path = os.path.join(workdir, 'source' + extension.lower())
+    result_path = os.path.join(workdir, 'result' + extension.lower())
+    last_update = [time.monotonic()]
+
+    def update_status(text):
+        try:
+            bot.edit_message_text(text, chat_id, status_id)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить статус для пользователя {chat_id}: {e}")
+
+    def progress(rows):
+        now = time.monotonic()
+        if now - last_update[0] >= FLEET_PROGRESS_INTERVAL:
+            last_update[0] = now
+            update_status(messages.FLEET_PROGRESS.format(rows=rows))
+
+    try:
+        with requests.get(bot.get_file_url(file_id), stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(source_path, 'wb') as source:
+                for block in response.iter_content(chunk_size=64 * 1024):
+                    source.write(block)
+
+        total, errors = fleet_upload.process_file(source_path, result_path, progress)
+
+        update_status(messages.format_fleet_done(total, errors))
+        with open(result_path, 'rb') as result:
+            bot.send_document(chat_id, result, visible_file_name=f"{name}_osago{extension.lower()}")
+        logger.info(f"Пользователь {chat_id} получил расчет файла: {total} строк, ошибок {errors}")
+
+    except fleet_upload.FleetFileError as e:
+        update_status(messages.FLEET_FILE_ERROR.format(error=e))
+    except Exception as e:
+        logger.error(f"Ошибка в process_fleet_document для пользователя {chat_id}: {e}")
+        update_status(messages.FLEET_FAILED)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
 
-# Регистрация фильтров состояний
+# Регистрация фильтров состояний и текста кнопок
 bot.add_custom_filter(custom_filters.StateFilter(bot))
+bot.add_custom_filter(custom_filters.TextMatchFilter())
 
 # Обработка ошибок
 @bot.callback_query_handler(func=lambda call: True)
@@ -617,9 +706,71 @@ def callback_query(call):
     except Exception as e:
         logger.error(f"Ошибка в callback_query: {e}")
 
+def start():
+    """Открывает хранилища и запускает фоновые потоки бота.
+
+    Импорт main только создает объекты и регистрирует обработчики: файлы,
+    соединения и потоки появляются здесь, после всех импортов. Вызывается
+    при запуске бота и после import main в бенчмарках.
+    """
+    global history
+    sessions.backend = create_backend(
+        SESSION_BACKEND, ttl=SESSION_TTL, max_entries=SESSION_MAX_ENTRIES,
+        path=SESSION_DB_PATH, url=REDIS_URL
+    )
+    outbox.start()
+    history = QuoteHistory(HISTORY_DB_PATH).start()
+
+    # Замеры обработчиков и состояние очереди исходящих и сессий
+    metrics.instrument(bot)
+    profiler.instrument(bot)
+    metrics.add_collector('osago_outbox', outbox.stats)
+    metrics.add_collector('osago_sessions', sessions.stats)
+    metrics.add_collector('osago_quote_cache', quote_cache.stats)
+    metrics.add_collector('osago_history', history.stats)
+    if bot.throttle is not None:
+        metrics.add_collector('osago_throttle', bot.throttle.stats)
+
 if __name__ == "__main__":
-    logger.info("Бот запускается...")
+    logger.info(f"Бот запускается в режиме {BOT_MODE}, тарифы версии {tariff.VERSION}...")
+    start()
+    metrics.serve(METRICS_HOST, METRICS_PORT)
+    tariff_watcher = tariff.Watcher(interval=TARIFF_WATCH_INTERVAL).start() if TARIFF_WATCH_INTERVAL > 0 else None
+    poller = None
+    if BOT_MODE != 'webhook':
+        poller = Poller(
+            bot, create_checkpoint(UPDATE_OFFSET_BACKEND, path=UPDATE_OFFSET_FILE, url=REDIS_URL),
+            workers=POLL_WORKERS, batch_size=POLL_BATCH_SIZE, timeout=POLL_TIMEOUT
+        )
+        metrics.add_collector('osago_polling', poller.stats)
+
+    # SIGTERM (остановка дино, docker stop): начатые обработчики дорабатывают,
+    # очередь исходящих отправляется, смещение и сессии сохраняются
+    def handle_sigterm(signum, frame):
+        if poller is not None:
+            poller.stop()
+        else:
+            # Прерывает serve_forever; пул вебхука дорабатывает принятые обновления
+            raise SystemExit(0)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
     try:
-        bot.polling(none_stop=True, interval=0, timeout=60)
+        if poller is None:
+            run_webhook(
+                bot, WEBHOOK_HOST, WEBHOOK_PORT, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET,
+                url=WEBHOOK_URL, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE
+            )
+        else:
+            poller.run()
     except Exception as e:
-        logger.error(f"Ошибка при запуске бота: {e}")
\ No newline at end of file
+        logger.error(f"Ошибка при запуске бота: {e}")
+    finally:
+        logger.info("Бот останавливается...")
+        if tariff_watcher is not None:
+            tariff_watcher.stop()
+        fleet_executor.shutdown(wait=True)
+        outbox.stop(timeout=10)
+        history.stop(timeout=10)
+        if poller is not None:
+            poller.checkpoint.close()
+        sessions.backend.close()
\ No newline at end of file
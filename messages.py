@@ -0,0 +1,295 @@
+# Тексты и подписи кнопок бота (общие для синхронной и asyncio-версии)
+import html
+from datetime import datetime
+
+# Кнопки меню
+BTN_START_CALC = "👋 Начать расчет"
+BTN_INSTRUCTIONS = "ℹ️ Какие данные нужны?"
+BTN_HELP = "📚 Помощь"
+BTN_NEW_CALC = "👋 Начать новый расчет"
+BTN_COMPARE = "📊 Сравнить варианты"
+BTN_REPEAT = "🔁 Повторить последний расчет"
+BTN_ADD_DRIVERS = "👥 Добавить водителей"
+MENU_BUTTONS = [BTN_START_CALC, BTN_INSTRUCTIONS, BTN_NEW_CALC, BTN_HELP, BTN_COMPARE, BTN_REPEAT, BTN_ADD_DRIVERS]
+
+INSURANCE_TYPES = ['Физическое лицо', 'Юридическое лицо', 'Ограниченная страховка']
+YES = 'Да'
+NO = 'Нет'
+
+WELCOME = (
+    "👋 Привет! Я твой бот-калькулятор ОСАГО!\n\n"
+    "Я помогу рассчитать стоимость полиса ОСАГО "
+    "на основе твоих данных.\n\n"
+    "Выбери действие:"
+)
+
+HELP = (
+    "📚 <b>Доступные команды:</b>\n\n"
+    "/start - Начать работу с ботом\n"
+    "/help - Показать это сообщение\n"
+    "/calc - Начать новый расчет\n"
+    "/quote - Расчет одной строкой, например "
+    "<code>/quote физ Казань 105 5 30 12 0 3</code>\n"
+    "/compare - Сравнить последний расчет по периодам, городам и стажу, например "
+    "<code>/compare Москва, Пермь</code>\n"
+    "/drivers - Добавить водителей к последнему расчету (полис на несколько водителей)\n"
+    "/history - Последние расчеты\n"
+    "/repeat - Повторить последний расчет\n\n"
+    "<b>Для расчета ОСАГО потребуются:</b>\n"
+    "• Вид страхователя\n"
+    "• Город регистрации ТС\n"
+    "• Мощность двигателя (л.с.)\n"
+    "• Стаж вождения (лет)\n"
+    "• Возраст водителя\n"
+    "• Период страхования\n"
+    "• Информация об авариях\n\n"
+    "<i>Расчет производится по данным водителя "
+    "с наименьшим стажем или новичка. Для полиса на несколько водителей "
+    "добавьте их после расчета: КВС и КБМ возьмутся наибольшие.</i>\n\n"
+    "📎 Для расчета автопарка пришлите CSV или XLSX файл со столбцами "
+    "<code>city, power, experience, age, period, accidents, accident_period</code>"
+)
+
+INSTRUCTIONS = (
+    "📋 <b>Для расчета ОСАГО нужны следующие данные:</b>\n\n"
+    "1. <b>Вид страхователя:</b>\n"
+    "   • Физическое лицо\n"
+    "   • Юридическое лицо\n"
+    "   • Ограниченная страховка\n\n"
+    "2. <b>Город регистрации ТС</b>\n"
+    "3. <b>Мощность двигателя</b> (л.с.)\n"
+    "4. <b>Стаж вождения</b> (лет)\n"
+    "5. <b>Возраст водителя</b>\n"
+    "6. <b>Период страхования</b> (3-12 мес.)\n"
+    "7. <b>Начинающий водитель?</b>\n"
+    "8. <b>Количество аварий</b> (если не новичок)\n\n"
+    "<i>Расчет производится по данным водителя "
+    "с наименьшим стажем или новичка.</i>"
+)
+
+OTHER_MESSAGE = (
+    "Для начала расчета нажмите '👋 Начать расчет'.\n"
+    "Для получения помощи нажмите '📚 Помощь'"
+)
+
+THROTTLED = "⏳ Слишком много сообщений подряд. Подождите несколько секунд — лишние сообщения пропущены."
+
+QUOTE_USAGE = (
+    "⚡ Расчет одной строкой:\n"
+    "/quote вид город мощность стаж возраст период аварии период_аварий\n\n"
+    "Например: /quote физ Казань 105 5 30 12 0 3\n"
+    "Вид: физ, юр или огр. Для начинающего водителя вместо аварий "
+    "напишите «новичок»: /quote физ Москва 90 1 19 12 новичок"
+)
+
+# Вопросы диалога
+ASK_INSURANCE_TYPE = "🏢 Выберите вид страхователя:"
+ASK_CITY = "📍 Выберите или введите город регистрации транспортного средства (можно начало названия):"
+ASK_POWER = "🚗 Введите мощность двигателя в лошадиных силах (например: 105):"
+ASK_EXPERIENCE = "📅 Введите стаж вождения в годах (например: 5):"
+ASK_AGE = "🎂 Введите возраст водителя (от 18 лет):"
+ASK_PERIOD = "📆 Выберите период страхования (в месяцах):"
+ASK_NOVICE = "🎓 Вы начинающий водитель (стаж менее 3 лет)?"
+ASK_ACCIDENTS = "⚠️ Введите количество аварий за последние несколько лет:"
+ASK_ACCIDENT_PERIOD = "📊 За какой период (в годах) учитываются аварии?"
+
+# Ошибки ввода
+CHOOSE_OPTION = "Пожалуйста, выберите один из предложенных вариантов."
+CITY_NOT_FOUND = "Город не найден в тарифах. Проверьте название и попробуйте снова:"
+CITY_SUGGESTIONS = "🔎 Уточните город: {cities}"
+POWER_NOT_POSITIVE = "Мощность должна быть положительным числом. Попробуйте снова:"
+POWER_NOT_NUMBER = "Пожалуйста, введите число (например: 105):"
+EXPERIENCE_NEGATIVE = "Стаж не может быть отрицательным. Попробуйте снова:"
+EXPERIENCE_NOT_NUMBER = "Пожалуйста, введите число (например: 5):"
+AGE_TOO_LOW = "Возраст должен быть не менее 18 лет. Попробуйте снова:"
+AGE_NOT_INTEGER = "Пожалуйста, введите целое число (например: 25):"
+PERIOD_OUT_OF_RANGE = "Период должен быть от 3 до 12 месяцев. Выберите из списка:"
+PERIOD_NOT_NUMBER = "Пожалуйста, выберите период из списка:"
+ANSWER_YES_NO = "Пожалуйста, ответьте 'Да' или 'Нет':"
+ACCIDENTS_NEGATIVE = "Количество аварий не может быть отрицательным. Попробуйте снова:"
+ACCIDENTS_NOT_NUMBER = "Пожалуйста, введите число (например: 0, 1, 2):"
+ACCIDENT_PERIOD_OUT_OF_RANGE = "Период должен быть от 1 до 12 лет. Выберите из списка:"
+
+ERROR = "❌ Произошла ошибка. Попробуйте снова /start"
+CALCULATION_ERROR = "❌ Произошла ошибка при расчете. Попробуйте снова /start"
+DATA_NOT_FOUND = "❌ Данные не найдены. Начните расчет снова /start"
+
+# Администрирование тарифов
+TARIFFS_CURRENT = "🗂 Действующие тарифы: версия {version}"
+TARIFFS_RELOADED = "✅ Тарифы обновлены: версия {previous} → {version}"
+TARIFFS_UNCHANGED = "🗂 Тарифы не изменились: версия {version}"
+TARIFFS_RELOAD_FAILED = "❌ Тарифы не обновлены, действуют прежние: {error}"
+
+# Профилирование (только администраторам)
+PROFILE_USAGE = (
+    "⏱ /profile [sample|cprofile|trace] [секунд]\n"
+    "sample — выборочный профиль потоков обработки (свернутые стеки для flamegraph),\n"
+    "cprofile — cProfile обработчиков (файл .prof),\n"
+    "trace — время каждого вызова обработчика (CSV)"
+)
+PROFILE_STARTED = "⏱ Профилирование ({mode}) на {seconds} с, результат придет отдельным сообщением"
+PROFILE_BUSY = "⏱ Уже идет профилирование ({mode}), дождитесь результата"
+
+# Расчет автопарка по файлу
+FLEET_WRONG_FORMAT = "📎 Пришлите таблицу в формате CSV или XLSX."
+FLEET_RECEIVED = "⏳ Файл получен, начинаю расчет..."
+FLEET_PROGRESS = "⏳ Обработано строк: {rows:,}"
+FLEET_FAILED = "❌ Не удалось обработать файл. Проверьте формат и попробуйте снова."
+FLEET_FILE_ERROR = "❌ {error}"
+FLEET_EMPTY = "Файл пуст"
+FLEET_MISSING_COLUMNS = "В заголовке не найдены столбцы: {columns}"
+# Ошибки строк файла: пишутся в столбец «Ошибка»
+FLEET_NOT_NUMBER = "Нечисловое значение"
+FLEET_POWER_NOT_POSITIVE = "Мощность должна быть положительным числом"
+FLEET_EXPERIENCE_NEGATIVE = "Стаж не может быть отрицательным"
+FLEET_AGE_INVALID = "Возраст должен быть целым числом не менее 18"
+FLEET_PERIOD_OUT_OF_RANGE = "Период должен быть от 3 до 12 месяцев"
+FLEET_NO_CITY = "Не указан город"
+FLEET_UNKNOWN_CITY = "Неизвестный город: {city}"
+FLEET_UNKNOWN_INSURANCE_TYPE = "Неизвестный вид страхователя: {insurance_type}"
+FLEET_ACCIDENTS_NEGATIVE = "Количество аварий не может быть отрицательным"
+FLEET_ACCIDENT_PERIOD_OUT_OF_RANGE = "Период аварийности должен быть от 1 до 12 лет"
+FLEET_NO_ACCIDENT_PERIOD = "Не указан период аварийности"
+
+
+def format_fleet_done(total, errors):
+    text = f"✅ Рассчитано строк: {total:,}"
+    if errors:
+        text += f", с ошибками: {errors:,}"
+    return text
+
+
+def format_price(quote):
+    """Стоимость и коэффициенты: зависят только от набора коэффициентов."""
+    return (
+        f"✅ <b>Расчет ОСАГО завершен!</b>\n\n"
+        f"📊 <b>Итоговая стоимость:</b>\n"
+        f"   <b>От:</b> {quote['summa_min']:,} руб.\n"
+        f"   <b>До:</b> {quote['summa_max']:,} руб.\n\n"
+        f"📈 <b>Примененные коэффициенты:</b>\n"
+        f"   КО (вид страхования): {quote['ko']}\n"
+        f"   КТ (территория): {quote['kt']}\n"
+        f"   КВС (стаж/возраст): {quote['kbs']}\n"
+        f"   КС (период): {quote['kc']}\n"
+        f"   КБМ (аварийность): {quote['kbm']}\n"
+        f"   КМ (мощность): {quote['km']}\n"
+        f"   Тарифы: версия {quote['tariff_version']}"
+    )
+
+
+def format_input(data, quote):
+    """Введенные пользователем данные."""
+    text = (
+        f"📋 <b>Введенные данные:</b>\n"
+        f"   Вид страхования: {data.get('insurance_type', 'Не указано')}\n"
+        f"   Город: {data.get('city', 'Не указан')}\n"
+        f"   Мощность: {quote['power']} л.с.\n"
+        f"   Стаж: {quote['experience']} лет\n"
+        f"   Возраст: {quote['age']} лет\n"
+        f"   Период: {quote['period']} мес.\n"
+    )
+    if 'is_novice' not in data:
+        text += "   История аварий: не указана, КБМ базовый"
+    else:
+        text += f"   Новичок: {'Да' if data['is_novice'] else 'Нет'}"
+        if not data['is_novice']:
+            text += f"\n   Аварий: {data.get('accidents', 0)} за {data.get('accident_period', 1)} лет"
+    if 'drivers' in quote:
+        text += (
+            f"\n\n👥 <b>Водителей в полисе:</b> {quote['drivers']}\n"
+            f"   КВС — по водителю №{quote['kbs_driver']}, КБМ — по водителю №{quote['kbm_driver']}"
+        )
+    return text
+
+
+def format_result(data, quote, price_text=None):
+    """Текст с результатом расчета по данным диалога и результату tariff.quote.
+
+    price_text — готовый format_price(quote), например из кэша расчетов.
+    """
+    return (price_text or format_price(quote)) + "\n\n" + format_input(data, quote)
+
+
+# Сравнение вариантов
+COMPARE_NO_QUOTE = "📊 Сравнение строится по последнему расчету. Сначала рассчитайте стоимость: /calc"
+COMPARE_SINGLE_DRIVER = "📊 Сравнение вариантов строится для одного водителя. Начните новый расчет: /calc"
+
+# Полис на несколько водителей
+ASK_DRIVERS = (
+    "👥 Введите водителей, которых нужно добавить в полис, по одному в строке:\n"
+    "<code>стаж возраст [аварии период]</code>\n\n"
+    "Например:\n<code>2 19\n10 45 1 3</code>\n\n"
+    "Если указаны аварии, КБМ берется по числу аварий и периоду. Без аварий КБМ равен 1.17 "
+    "у водителя со стажем меньше 3 лет (начинающий) и 1 у остальных.\n"
+    "Уже в полисе: {count} из {limit}."
+)
+DRIVERS_NO_QUOTE = "👥 Водители добавляются к последнему расчету. Сначала рассчитайте стоимость: /calc"
+DRIVERS_LINE_FORMAT = "ожидается «стаж возраст» или «стаж возраст аварии период»"
+DRIVERS_LINE_INVALID = "❌ Строка {line} «{text}»: {error}"
+DRIVERS_TOO_MANY = "👥 В полисе может быть не больше {limit} водителей, сейчас {count}. Введите меньше водителей:"
+
+
+def format_compare(data, grid):
+    """Сетка batch_quote.quote_grid одним сообщением: блок на город, строки — периоды, столбцы — стаж."""
+    experiences = grid['experiences']
+    header = "мес." + "".join(
+        f"{('*' if experience == data.get('experience') else '') + f'{experience:g}':>8}"
+        for experience in experiences
+    )
+    blocks = []
+    for j, city in enumerate(grid['cities']):
+        lines = [html.escape(city) + (" *" if city == data.get('city') else ""), header]
+        for i, period in enumerate(grid['periods']):
+            mark = "*" if period == data.get('period') else " "
+            prices = "".join(f"{grid['summa_min'][i, j, k]:>8,}" for k in range(len(experiences)))
+            lines.append(f"{mark}{period:>3}{prices}")
+        blocks.append("\n".join(lines))
+    return (
+        f"📊 <b>Сравнение вариантов</b> — стоимость «от», руб.\n"
+        f"{html.escape(data.get('insurance_type', 'Не указано'))}, {data.get('power', 0):g} л.с., "
+        f"возраст {data.get('age')}, КБМ {grid['kbm']}\n"
+        f"Строки — период (мес.), столбцы — стаж (лет), * — ваши значения.\n"
+        f"<pre>" + "\n\n".join(blocks) + "</pre>\n"
+        f"Тарифы: версия {grid['tariff_version']}"
+    )
+
+
+
+def format_profile(report, limit=3500):
+    """Сводка profiler.Report; длинная сводка обрезается, полные данные — в файле."""
+    summary = report.summary if len(report.summary) <= limit else report.summary[:limit] + "\n…"
+    return f"⏱ <b>Профиль: {report.mode}, {report.seconds} с</b>\n<pre>{html.escape(summary)}</pre>"
+
+
+# История расчетов
+HISTORY_EMPTY = "🗂 Расчетов пока нет. Начните расчет: /calc"
+
+
+def format_history(entries):
+    """Последние расчеты из quote_history.QuoteHistory.recent, новые первыми."""
+    lines = []
+    for number, entry in enumerate(entries, 1):
+        data, quote = entry['data'], entry['quote']
+        lines.append(
+            f"{number}. {datetime.fromtimestamp(entry['created_at']):%d.%m.%Y %H:%M} — "
+            f"{html.escape(data.get('city', 'Не указан'))}, {quote['power']:g} л.с., {quote['period']} мес.: "
+            f"<b>{quote['summa_min']:,}–{quote['summa_max']:,} руб.</b>"
+            + (f", водителей: {quote['drivers']}" if 'drivers' in quote else "")
+        )
+    return "🗂 <b>Последние расчеты:</b>\n\n" + "\n".join(lines) + "\n\nПовторить последний: /repeat"
+
+
+# Инлайн-режим
+INLINE_HELP_TITLE = "⚡ Расчет ОСАГО одной строкой"
+INLINE_HELP_DESCRIPTION = "город мощность стаж возраст период, например: Москва 150 10 35 12"
+
+
+def format_inline_title(quote):
+    return f"ОСАГО: {quote['summa_min']:,} – {quote['summa_max']:,} руб."
+
+
+def format_inline_description(data, quote):
+    return (
+        f"{data['city']}, {quote['power']:g} л.с., стаж {quote['experience']:g}, "
+        f"{quote['age']} лет, {quote['period']} мес., КБМ {quote['kbm']}"
+    )
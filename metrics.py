@@ -0,0 +1,255 @@
+"""Метрики бота в текстовом формате Prometheus.
+
+Для каждого обработчика считаются вызовы, ошибки и гистограммы времени:
+полное время и время без ожидания Bot API (вычисления). Ожидание Bot API
+замеряется отдельно по методам через apihelper.CUSTOM_REQUEST_SENDER.
+Метки обработчика — имя функции и состояние UserState из ее фильтра.
+Ошибкой считается исключение из обработчика или запись уровня ERROR,
+сделанная в его потоке (обработчики бота перехватывают исключения сами).
+
+Отключенные метрики (Metrics(enabled=False)) ничего не оборачивают:
+обработчики вызываются напрямую, без накладных расходов.
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import apihelper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class _ErrorCounter(logging.Handler):
+    """Считает записи уровня ERROR, сделанные в текущем потоке."""
+
+    def __init__(self, local):
+        super().__init__(logging.ERROR)
+        self.local = local
+
+    def emit(self, record):
+        self.local.errors = getattr(self.local, 'errors', 0) + 1
+
+
+def _state_label(handler):
+    state = handler['filters'].get('state')
+    if state is None:
+        return ''
+    states = state if isinstance(state, (list, tuple)) else [state]
+    return ','.join(getattr(s, 'name', str(s)) for s in states)
+
+
+def _api_method(url):
+    return url.rsplit('/', 1)[-1].split('?', 1)[0]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Metrics:
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.handlers = {}   # (handler, state) -> [полное время, вычисления, ошибки]
+        self.api = {}        # метод Bot API -> [время, ошибки]
+        self.collectors = []
+        self.server = None
+        if enabled:
+            logging.getLogger().addHandler(_ErrorCounter(self.local))
+            self._install_request_sender()
+
+    # Замеры
+    def observe_handler(self, handler, state, seconds, api_seconds, failed):
+        with self.lock:
+            entry = self.handlers.get((handler, state))
+            if entry is None:
+                entry = self.handlers[(handler, state)] = [
+                    Histogram(self.buckets), Histogram(self.buckets), 0
+                ]
+            entry[0].observe(seconds)
+            entry[1].observe(max(0.0, seconds - api_seconds))
+            if failed:
+                entry[2] += 1
+
+    def observe_api(self, method, seconds, failed):
+        self.local.api_seconds = getattr(self.local, 'api_seconds', 0.0) + seconds
+        with self.lock:
+            entry = self.api.get(method)
+            if entry is None:
+                entry = self.api[method] = [Histogram(self.buckets), 0]
+            entry[0].observe(seconds)
+            if failed:
+                entry[1] += 1
+
+    def timed(self, handler, state=''):
+        """Декоратор: замеряет функцию как обработчик handler."""
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                local = self.local
+                api_before = getattr(local, 'api_seconds', 0.0)
+                errors_before = getattr(local, 'errors', 0)
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = func(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    elapsed = time.perf_counter() - started
+                    failed = failed or getattr(local, 'errors', 0) != errors_before
+                    self.observe_handler(
+                        handler, state, elapsed,
+                        getattr(local, 'api_seconds', 0.0) - api_before, failed
+                    )
+            return wrapper
+        return decorator
+
+    def instrument(self, bot):
+        """Оборачивает все зарегистрированные обработчики сообщений и инлайн-запросов."""
+        if not self.enabled:
+            return
+        for handler in bot.message_handlers + bot.inline_handlers:
+            func = handler['function']
+            handler['function'] = self.timed(func.__name__, _state_label(handler))(func)
+
+    def _install_request_sender(self):
+        previous = apihelper.CUSTOM_REQUEST_SENDER
+
+        def send(method, url, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                if previous:
+                    response = previous(method, url, **kwargs)
+                else:
+                    response = apihelper._get_req_session().request(method, url, **kwargs)
+                failed = response.status_code >= 400
+                return response
+            finally:
+                self.observe_api(_api_method(url), time.perf_counter() - started, failed)
+
+        apihelper.CUSTOM_REQUEST_SENDER = send
+
+    # Экспорт
+    def add_collector(self, prefix, collect):
+        """Добавляет источник значений: collect() возвращает словарь чисел."""
+        self.collectors.append((prefix, collect))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            handlers = sorted(self.handlers.items())
+            api = sorted(self.api.items())
+            if handlers:
+                lines += [
+                    '# HELP osago_handler_calls_total Вызовы обработчиков.',
+                    '# TYPE osago_handler_calls_total counter',
+                ]
+                lines += [
+                    f'osago_handler_calls_total{{{self._labels(key)}}} {entry[0].count}'
+                    for key, entry in handlers
+                ]
+                lines += [
+                    '# HELP osago_handler_errors_total Вызовы обработчиков с ошибкой.',
+                    '# TYPE osago_handler_errors_total counter',
+                ]
+                lines += [f'osago_handler_errors_total{{{self._labels(key)}}} {entry[2]}' for key, entry in handlers]
+                for index, name, description in (
+                    (0, 'osago_handler_seconds', 'Полное время обработчика.'),
+                    (1, 'osago_handler_compute_seconds', 'Время обработчика без ожидания Bot API.'),
+                ):
+                    lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                    for key, entry in handlers:
+                        lines.extend(entry[index].render(name, self._labels(key)))
+            if api:
+                lines += [
+                    '# HELP osago_telegram_api_seconds Ожидание ответа Bot API.',
+                    '# TYPE osago_telegram_api_seconds histogram',
+                ]
+                for method, entry in api:
+                    lines.extend(entry[0].render('osago_telegram_api_seconds', f'method="{_escape(method)}"'))
+                lines += [
+                    '# HELP osago_telegram_api_errors_total Неуспешные запросы к Bot API.',
+                    '# TYPE osago_telegram_api_errors_total counter',
+                ]
+                lines += [
+                    f'osago_telegram_api_errors_total{{method="{_escape(method)}"}} {entry[1]}'
+                    for method, entry in api
+                ]
+        for prefix, collect in self.collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"Не удалось получить метрики {prefix}: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    lines += [f'# TYPE {prefix}_{key} gauge', f'{prefix}_{key} {value}']
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(key):
+        handler, state = key
+        return f'handler="{_escape(handler)}",state="{_escape(state)}"'
+
+    def serve(self, host='127.0.0.1', port=9100):
+        """Запускает HTTP-сервер с /metrics в фоновом потоке."""
+        if not self.enabled:
+            return None
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        logger.info(f"Метрики доступны на http://{host}:{self.server.server_port}/metrics")
+        return self.server
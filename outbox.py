@@ -0,0 +1,251 @@
+"""Очередь исходящих сообщений с ограничением скорости и повторами.
+
+Обработчики ставят сообщения в очередь и сразу возвращаются. Рабочие
+потоки отправляют их, соблюдая общий лимит Bot API (около 30 сообщений
+в секунду) и лимит на один чат, учитывают retry_after из ответа 429 и
+повторяют сетевые ошибки с экспоненциальной задержкой. Сообщения одного
+чата обрабатывает один поток, поэтому их порядок сохраняется.
+
+Поток не спит из-за одного чата: сообщение, которому рано уходить (лимит
+чата, 429, повтор после ошибки), откладывается в кучу по времени
+готовности, и поток тем временем отправляет сообщения других чатов.
+Следующие сообщения того же чата ждут за отложенным. Ответ 429 ставит на
+паузу только свой чат; всю отправку он останавливает, если лимит получили
+сразу несколько чатов — тогда это общий лимит бота.
+"""
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from telebot.apihelper import ApiTelegramException
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не более capacity подряд."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def reserve(self, now):
+        """Забирает токен и возвращает, сколько секунд подождать до отправки."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def take(self, now):
+        """Забирает токен, если он есть. False — лимит исчерпан, токен не списан."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Outbox:
+    CHAT_BUCKET_IDLE = 60  # секунд простоя, после которых ведро чата удаляется
+    GLOBAL_LIMIT_CHATS = 3  # столько чатов с действующим 429 — общий лимит, пауза для всех
+
+    def __init__(self, rate=30, chat_rate=1, chat_burst=3, workers=4, queue_size=10000,
+                 max_retries=5, backoff=0.5, clock=time.monotonic, sleep=time.sleep):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.global_bucket = TokenBucket(rate, rate, clock())
+        self.paused_until = 0.0
+        self.limited = {}  # chat_id -> до какого времени действует 429 этого чата
+        # Лимит очереди делится между потоками, общий объем не превышает queue_size
+        self.queues = [queue.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        # Сообщения, которые поток уже взял из очереди, но еще не отправил; пишет только свой поток
+        self.waiting = [0] * workers
+        self.threads = []
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def start(self):
+        for i, q in enumerate(self.queues):
+            thread = threading.Thread(target=self._run, args=(i, q), name=f'outbox-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        """Отправляет все, что уже в очереди, и останавливает потоки."""
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def submit(self, chat_id, func, *args, **kwargs):
+        """Ставит вызов func(*args, **kwargs) в очередь чата. False — очередь переполнена."""
+        q = self.queues[hash(chat_id) % len(self.queues)]
+        try:
+            q.put_nowait((chat_id, func, args, kwargs, self.clock(), 0))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logger.warning(f"Очередь исходящих переполнена, сообщение для {chat_id} отброшено")
+            return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                'depth': sum(q.qsize() for q in self.queues) + sum(self.waiting),
+                'sent': self.sent,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'retries': self.retries,
+                'latency_avg': self.latency_total / self.sent if self.sent else 0.0,
+                'latency_max': self.latency_max,
+            }
+
+    def _wait_global(self):
+        with self.lock:
+            now = self.clock()
+            delay = max(self.global_bucket.reserve(now), self.paused_until - now)
+        if delay > 0:
+            self.sleep(delay)
+
+    def _run(self, index, q):
+        chat_buckets = {}
+        waiting = {}  # chat_id -> сообщения чата, которые ждут отправки, по порядку
+        ready = []  # куча (время готовности, номер, chat_id) для отложенных чатов
+        order = itertools.count()
+        processed = 0
+        stopping = False
+
+        def process(chat_id):
+            """Отправляет сообщения чата по порядку, пока первое из них не придется отложить."""
+            jobs = waiting[chat_id]
+            while jobs:
+                chat_id, func, args, kwargs, queued_at, attempt = jobs[0]
+                now = self.clock()
+                bucket = chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+                # Лимит чата расходует первая попытка; повторы ждут свою задержку
+                if not attempt and not bucket.take(now):
+                    heapq.heappush(ready, (now + (1 - bucket.tokens) / bucket.rate, next(order), chat_id))
+                    return
+                delay = self._deliver(chat_id, func, args, kwargs, queued_at, attempt)
+                if delay is not None:
+                    jobs[0] = (chat_id, func, args, kwargs, queued_at, attempt + 1)
+                    heapq.heappush(ready, (self.clock() + delay, next(order), chat_id))
+                    return
+                jobs.popleft()
+                self.waiting[index] -= 1
+            del waiting[chat_id]
+
+        while True:
+            timeout = max(0.0, ready[0][0] - self.clock()) if ready else None
+            if stopping:
+                # Новых сообщений не будет: дождаться и отправить отложенные
+                if not waiting:
+                    break
+                self.sleep(timeout)
+            else:
+                try:
+                    job = q.get(timeout=timeout)
+                except queue.Empty:
+                    pass
+                else:
+                    if job is None:
+                        stopping = True
+                        continue
+                    self.waiting[index] += 1
+                    if job[0] in waiting:
+                        # Чат ждет — сообщение встает за отложенным, порядок сохраняется
+                        waiting[job[0]].append(job)
+                    else:
+                        waiting[job[0]] = deque([job])
+                        process(job[0])
+
+            now = self.clock()
+            while ready and ready[0][0] <= now:
+                process(heapq.heappop(ready)[2])
+
+            processed += 1
+            if processed % 1000 == 0:
+                idle = self.clock() - self.CHAT_BUCKET_IDLE
+                for key in [key for key, b in chat_buckets.items() if b.updated < idle and key not in waiting]:
+                    del chat_buckets[key]
+
+    def _deliver(self, chat_id, func, args, kwargs, queued_at, attempt):
+        """Одна попытка отправки. Возвращает задержку перед повтором или None — больше не пытаться."""
+        self._wait_global()
+        try:
+            func(*args, **kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                if self._give_up(chat_id, attempt, e):
+                    return None
+                self._limit(chat_id, retry_after)
+                logger.warning(f"Лимит Telegram для {chat_id}, повтор через {retry_after} с")
+                return retry_after
+            if e.error_code < 500:
+                # Ошибка запроса (чат недоступен, неверные параметры) — повтор не поможет
+                logger.error(f"Сообщение для {chat_id} не отправлено: {e}")
+                with self.lock:
+                    self.failed += 1
+                return None
+            return self._backoff(chat_id, attempt, e)
+        except Exception as e:
+            return self._backoff(chat_id, attempt, e)
+        latency = self.clock() - queued_at
+        with self.lock:
+            self.sent += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+        return None
+
+    def _limit(self, chat_id, retry_after):
+        """Пауза чата после 429; несколько чатов под лимитом — пауза всей отправки."""
+        with self.lock:
+            now = self.clock()
+            for key in [key for key, until in self.limited.items() if until <= now]:
+                del self.limited[key]
+            self.limited[chat_id] = now + retry_after
+            if len(self.limited) >= self.GLOBAL_LIMIT_CHATS:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def _give_up(self, chat_id, attempt, error):
+        """True, если попытки исчерпаны: сообщение отбрасывается и учитывается как неотправленное."""
+        if attempt < self.max_retries:
+            with self.lock:
+                self.retries += 1
+            return False
+        logger.error(f"Сообщение для {chat_id} отброшено после {attempt + 1} попыток: {error}")
+        with self.lock:
+            self.failed += 1
+        return True
+
+    def _backoff(self, chat_id, attempt, error):
+        if self._give_up(chat_id, attempt, error):
+            return None
+        delay = self.backoff * 2 ** attempt
+        logger.warning(f"Ошибка отправки для {chat_id} (попытка {attempt + 1}): {error}; повтор через {delay} с")
+        return delay
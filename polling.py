@@ -0,0 +1,198 @@
+"""Получение обновлений через getUpdates с сохраненным смещением.
+
+bot.polling подтверждает полученные обновления только следующим запросом
+getUpdates, а обработчики выполняет в пуле потоков без учета того, что
+уже сделано. При перезапуске воркера (Heroku перезапускает дино раз
+в сутки и при каждом деплое) обработанные, но не подтвержденные
+обновления приходят снова, а ждавшие в очереди пула теряются.
+
+Poller забирает обновления пачками до batch_size штук, раскладывает их
+по пулу потоков (обновления одного чата — в один поток, как в вебхуке),
+ждет, пока пачка обработана, и только потом записывает update_id
+последнего обновления в хранилище смещения. Следующий getUpdates
+подтверждает пачку в Telegram. После перезапуска опрос продолжается
+с сохраненного смещения; обновления, которые Telegram прислал повторно,
+пропускаются. Накопившаяся очередь разбирается полными пачками без
+ожидания — Telegram отвечает сразу, пока есть необработанные обновления.
+
+stop (например, по SIGTERM) не прерывает обработку: текущая пачка
+дорабатывается, смещение записывается и подтверждается в Telegram. Если
+сигнал пришел во время ожидания getUpdates, запрос прерывается — его
+обновления не подтверждены и достанутся следующему запуску.
+"""
+import logging
+import os
+import threading
+
+from webhook_server import UpdateWorkers
+
+logger = logging.getLogger(__name__)
+
+
+class FileCheckpoint:
+    """Смещение в локальном файле. Запись атомарная: временный файл и os.replace."""
+
+    def __init__(self, path='update_offset'):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def save(self, update_id):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(str(update_id))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    def close(self):
+        pass
+
+
+class RedisCheckpoint:
+    """Смещение в Redis — переживает замену дино вместе с сессиями."""
+
+    def __init__(self, url='redis://localhost:6379/0', key='osago:update_offset'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, protocol=2)
+        self.key = key
+
+    def load(self):
+        value = self.client.get(self.key)
+        return int(value) if value is not None else None
+
+    def save(self, update_id):
+        self.client.set(self.key, update_id)
+
+    def close(self):
+        self.client.close()
+
+
+def create_checkpoint(kind='file', path='update_offset', url=None):
+    if kind == 'file':
+        return FileCheckpoint(path)
+    if kind == 'redis':
+        return RedisCheckpoint(url or 'redis://localhost:6379/0')
+    raise ValueError(f"Неизвестное хранилище смещения: {kind}")
+
+
+class _Interrupted(BaseException):
+    """Ожидание getUpdates прервано остановкой.
+
+    BaseException, чтобы исключение не перехватили обработчики Exception
+    внутри requests и telebot.
+    """
+
+
+class Poller:
+    def __init__(self, bot, checkpoint, workers=8, queue_size=100, batch_size=100, timeout=25,
+                 retry_delay=3, allowed_updates=None):
+        self.bot = bot
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.allowed_updates = allowed_updates
+        self.workers = UpdateWorkers(bot.process_new_updates, workers, queue_size, name='poll-worker')
+        self.stopping = threading.Event()
+        self.thread = None
+        self.fetching = False
+        self.last_update_id = checkpoint.load()
+        self.confirmed = None  # offset последнего успешного getUpdates
+        self.batches = 0
+        self.updates = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def run(self):
+        """Опрашивает Telegram до вызова stop; блокирует поток."""
+        self.thread = threading.current_thread()
+        # Порядок и параллелизм обработки задает пул Poller, а не пул бота
+        self.bot.threaded = False
+        self.workers.start()
+        logger.info(f"Опрос обновлений начинается после update_id {self.last_update_id}")
+        try:
+            while not self.stopping.is_set():
+                updates = self._fetch()
+                if updates:
+                    self._process(updates)
+        finally:
+            self.workers.stop()
+            self._confirm()
+            logger.info(f"Опрос остановлен на update_id {self.last_update_id}")
+
+    def stop(self):
+        """Просит завершить работу после текущей пачки. Можно вызывать из обработчика сигнала."""
+        self.stopping.set()
+        # Ожидание getUpdates прерываем, только если оно идет в этом же потоке
+        if self.fetching and threading.current_thread() is self.thread:
+            raise _Interrupted()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'updates': self.updates,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'last_update_id': self.last_update_id or 0,
+        }
+
+    def _offset(self):
+        return self.last_update_id + 1 if self.last_update_id is not None else None
+
+    def _fetch(self):
+        offset = self._offset()
+        try:
+            self.fetching = True
+            try:
+                if self.stopping.is_set():
+                    return []
+                updates = self.bot.get_updates(
+                    offset=offset, limit=self.batch_size, long_polling_timeout=self.timeout,
+                    allowed_updates=self.allowed_updates
+                )
+            finally:
+                self.fetching = False
+        except _Interrupted:
+            return []
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка getUpdates: {e}")
+            self.stopping.wait(self.retry_delay)
+            return []
+        self.confirmed = offset
+        return updates
+
+    def _process(self, updates):
+        last = self.last_update_id
+        fresh = [update for update in updates if last is None or update.update_id > last]
+        self.skipped += len(updates) - len(fresh)
+        for update in fresh:
+            self.workers.submit(update, block=True)
+        self.workers.join()
+
+        self.last_update_id = max(update.update_id for update in updates)
+        self.batches += 1
+        self.updates += len(fresh)
+        try:
+            self.checkpoint.save(self.last_update_id)
+        except Exception as e:
+            # Следующий getUpdates все равно подтвердит пачку в Telegram
+            logger.error(f"Не удалось сохранить смещение {self.last_update_id}: {e}")
+
+    def _confirm(self):
+        """Подтверждает в Telegram обработанные обновления, не дожидаясь следующего опроса."""
+        offset = self._offset()
+        if offset is None or offset == self.confirmed:
+            return
+        try:
+            self.bot.get_updates(offset=offset, limit=1, long_polling_timeout=1)
+            self.confirmed = offset
+        except Exception as e:
+            logger.warning(f"Не удалось подтвердить обновления до {offset}: {e}")
@@ -0,0 +1,267 @@
+"""Профилирование бота по команде администратора, без перезапуска.
+
+Три режима, каждый на заданное число секунд:
+
+- sample — выборочный профиль: отдельный поток каждые interval секунд
+  снимает стеки потоков обработки обновлений (sys._current_frames) и
+  считает одинаковые стеки. Накладные расходы почти не зависят от
+  нагрузки. Результат — самые частые функции и файл свернутых стеков
+  («a;b;c 42» на строку) для flamegraph.pl, speedscope или inferno.
+  Простаивающие потоки (ждут обновление в очереди) не учитываются;
+- cprofile — cProfile на каждый вызов обработчика, профили объединяются
+  в pstats. Точные числа вызовов и время по функциям, но обработчики
+  заметно замедляются. Результат — таблица pstats и файл .prof;
+- trace — время каждого вызова обработчика с состоянием UserState и
+  чатом. Результат — сводка по обработчикам и CSV со всеми вызовами.
+
+Одновременно идет только один сбор. Обработчики оборачиваются один раз
+(instrument); вне сбора обертка только проверяет, идет ли cprofile или
+trace. cProfile, pstats и csv импортируются при первом сборе в своем
+режиме, а не при запуске бота.
+"""
+import functools
+import io
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from metrics import _state_label
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sample', 'cprofile', 'trace')
+THREAD_PREFIXES = ('poll-worker', 'webhook-worker', 'WorkerThread')
+TOP = 15  # строк в сводке
+
+
+class ProfileBusy(Exception):
+    """Сбор уже идет."""
+
+
+class Report:
+    """Итог сбора: текст сводки и файл для скачивания."""
+
+    def __init__(self, mode, seconds, summary, file_name, content):
+        self.mode = mode
+        self.seconds = seconds
+        self.summary = summary
+        self.file_name = file_name
+        self.content = content
+
+
+def _frame_label(code, labels):
+    label = labels.get(code)
+    if label is None:
+        label = labels[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+    return label
+
+
+class Sampler:
+    def __init__(self, interval=0.005, thread_prefixes=THREAD_PREFIXES):
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle = 0
+        self._labels = {}
+        self._idle_code = queue.Queue.get.__code__
+
+    def run(self, seconds):
+        deadline = time.monotonic() + seconds
+        own = threading.get_ident()
+        while time.monotonic() < deadline:
+            idents = {
+                thread.ident for thread in threading.enumerate()
+                if thread.name.startswith(self.thread_prefixes) and thread.ident != own
+            }
+            for ident, frame in sys._current_frames().items():
+                if ident in idents:
+                    self._sample(frame)
+            time.sleep(self.interval)
+
+    def _sample(self, frame):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        self.samples += 1
+        # Поток пула ждет следующее обновление: queue.get прямо из цикла потока
+        # (_run у UpdateWorkers, run у пула потоков telebot)
+        for i, code in enumerate(codes[:-1]):
+            if code is self._idle_code:
+                if codes[i + 1].co_name in ('_run', 'run'):
+                    self.idle += 1
+                    return
+                break
+        self.stacks[';'.join(_frame_label(code, self._labels) for code in reversed(codes))] += 1
+
+    def report(self, seconds):
+        busy = self.samples - self.idle
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        lines = [f"Снимков: {self.samples}, в работе: {busy}, простой: {self.idle}"]
+        if busy:
+            lines.append("\nСобственное время:")
+            lines += [f"{count / busy:6.1%}  {frame}" for frame, count in own.most_common(TOP)]
+            lines.append("\nВместе с вызванными:")
+            lines += [f"{count / busy:6.1%}  {frame}" for frame, count in total.most_common(TOP)]
+        content = ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+        return Report('sample', seconds, '\n'.join(lines), 'profile.collapsed', content.encode('utf-8'))
+
+
+class CProfileCapture:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = None
+        self.calls = 0
+
+    def call(self, func, handler, state, args, kwargs):
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            with self.lock:
+                self.calls += 1
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    def report(self, seconds):
+        with self.lock:
+            stats, calls = self.stats, self.calls
+        if stats is None:
+            return Report('cprofile', seconds, "Обработчики не вызывались", 'profile.prof', b'')
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(TOP)
+        # Без заголовка pstats, начиная с таблицы
+        table = text.getvalue()
+        table = table[table.find('   ncalls'):].rstrip() if '   ncalls' in table else table.strip()
+        # Тот же формат, что у Stats.dump_stats: читается pstats, snakeviz, flameprof
+        import marshal
+
+        content = marshal.dumps(stats.stats)
+        return Report('cprofile', seconds, f"Вызовов обработчиков: {calls}\n\n{table}", 'profile.prof', content)
+
+
+class TraceCapture:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+
+    def call(self, func, handler, state, args, kwargs):
+        message = args[0] if args else None
+        chat = getattr(message, 'chat', None)
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.records.append((started_at, handler, state, getattr(chat, 'id', ''), elapsed))
+
+    def report(self, seconds):
+        with self.lock:
+            records = list(self.records)
+        groups = {}
+        for _, handler, state, _, elapsed in records:
+            groups.setdefault((handler, state), []).append(elapsed)
+        lines = [f"Вызовов обработчиков: {len(records)}"]
+        if groups:
+            lines.append(f"\n{'обработчик [состояние]':<50}{'вызовов':>8}{'p50 мс':>9}{'p99 мс':>9}{'max мс':>9}")
+        rows = sorted(groups.items(), key=lambda item: max(item[1]), reverse=True)
+        for (handler, state), timings in rows[:TOP]:
+            timings.sort()
+            # UserState:waiting_for_city -> waiting_for_city
+            name = f"{handler} [{state.rsplit(':', 1)[-1]}]" if state else handler
+            lines.append(
+                f"{name[:50]:<50}{len(timings):>8}{timings[len(timings) // 2] * 1000:>9.1f}"
+                f"{timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000:>9.1f}{timings[-1] * 1000:>9.1f}"
+            )
+        import csv
+
+        content = io.StringIO()
+        writer = csv.writer(content)
+        writer.writerow(['started_at', 'handler', 'state', 'chat_id', 'ms'])
+        for started_at, handler, state, chat_id, elapsed in records:
+            writer.writerow([
+                datetime.fromtimestamp(started_at).isoformat(timespec='milliseconds'),
+                handler, state, chat_id, f'{elapsed * 1000:.3f}',
+            ])
+        return Report('trace', seconds, '\n'.join(lines), 'trace.csv', content.getvalue().encode('utf-8'))
+
+
+class Profiler:
+    def __init__(self, interval=0.005, max_seconds=120, thread_prefixes=THREAD_PREFIXES):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.thread_prefixes = thread_prefixes
+        self.lock = threading.Lock()
+        self.running = None
+        self.capture = None  # CProfileCapture или TraceCapture, пока идет сбор
+
+    def instrument(self, bot):
+        """Оборачивает обработчики сообщений для режимов cprofile и trace."""
+        for handler in bot.message_handlers:
+            func = handler['function']
+            handler['function'] = self._wrap(func, func.__name__, _state_label(handler))
+
+    def _wrap(self, func, handler, state):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            capture = self.capture
+            if capture is None:
+                return func(*args, **kwargs)
+            return capture.call(func, handler, state, args, kwargs)
+        return wrapper
+
+    def start(self, mode, seconds, done):
+        """Запускает сбор в фоне; по окончании вызывает done(Report). ProfileBusy — сбор уже идет."""
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        seconds = min(max(1, seconds), self.max_seconds)
+        with self.lock:
+            if self.running is not None:
+                raise ProfileBusy(self.running)
+            self.running = mode
+        thread = threading.Thread(target=self._run, args=(mode, seconds, done), name='profiler', daemon=True)
+        thread.start()
+        return seconds
+
+    def _run(self, mode, seconds, done):
+        # done вызывается всегда: при ошибке сбора — с отчетом без файла, чтобы /profile получил ответ
+        try:
+            if mode == 'sample':
+                sampler = Sampler(self.interval, self.thread_prefixes)
+                sampler.run(seconds)
+                report = sampler.report(seconds)
+            else:
+                capture = CProfileCapture() if mode == 'cprofile' else TraceCapture()
+                self.capture = capture
+                try:
+                    time.sleep(seconds)
+                finally:
+                    self.capture = None
+                report = capture.report(seconds)
+        except Exception as e:
+            logger.exception(f"Ошибка профилирования ({mode})")
+            report = Report(mode, seconds, f"Сбор прерван ошибкой: {e}", None, b'')
+        finally:
+            with self.lock:
+                self.running = None
+        done(report)
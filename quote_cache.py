@@ -0,0 +1,92 @@
+"""Мемоизация расчетов по набору коэффициентов.
+
+Стоимость и текст с коэффициентами зависят только от набора
+(ko, kt, kbs, kc, kbm, km), а таких наборов намного меньше, чем вариантов
+ввода: разные мощности попадают в один диапазон КМ, разные стаж и
+возраст — в одну клетку КВС. Набор находится прямыми выборками из
+таблиц (Tariff.coefficient_set), до сборки результата; кэш (LRU с временем
+жизни) хранит по набору готовые summa_min/summa_max и текст format_price,
+поэтому повторные и популярные запросы, например инлайн-запросы на каждое
+нажатие клавиши, не пересчитываются и не форматируются заново.
+
+Время поиска в кэше замеряется у каждого LOOKUP_SAMPLE-го запроса:
+замер на каждом запросе с общей блокировкой стоил бы больше самого поиска.
+"""
+import itertools
+import threading
+import time
+
+import drivers
+import messages
+import tariff
+from ttl_cache import TTLCache
+
+LOOKUP_SAMPLE = 64
+
+
+class QuoteCache:
+    def __init__(self, maxsize=10000, ttl=3600, sample=LOOKUP_SAMPLE):
+        # Статистика попаданий ведется в TTLCache под его блокировкой
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.sample = sample
+        self.requests = itertools.count()
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.lookup_total = 0.0
+        self.lookup_max = 0.0
+
+    def quote(self, data):
+        """То же, что tariff.quote(data), плюс готовый текст format_price.
+
+        Возвращает (результат расчета, текст стоимости и коэффициентов).
+        """
+        sampled = next(self.requests) % self.sample == 0
+        if sampled:
+            started = time.perf_counter()
+        # Одна версия тарифов на весь расчет, даже если их заменят в это время
+        current = tariff.current()
+        ko, kt, kbs, kc, kbm, km = current.coefficient_set(data)
+        policy = None
+        if 'drivers' in data:
+            # Полис на несколько водителей: КВС и КБМ — наибольшие по списку
+            policy = drivers.coefficients(data['drivers'], current)
+            kbs, kbm = policy['kbs'], policy['kbm']
+        key = (current.version, ko, kt, kbs, kc, kbm, km)
+        entry = self.cache.get(key)
+        if sampled:
+            self._observe(time.perf_counter() - started)
+
+        result = current.coefficients(data, (ko, kt, kbs, kc, kbm, km))
+        if policy is not None:
+            result.update(policy)
+        if entry is None:
+            summa_min, summa_max = current.calculate(ko, km, kc, kbs, kbm, kt)
+            result['summa_min'], result['summa_max'] = summa_min, summa_max
+            entry = (summa_min, summa_max, messages.format_price(result))
+            self.cache.set(key, entry)
+        result['summa_min'], result['summa_max'], price_text = entry
+        return result, price_text
+
+    def _observe(self, elapsed):
+        with self.lock:
+            self.lookups += 1
+            self.lookup_total += elapsed
+            self.lookup_max = max(self.lookup_max, elapsed)
+
+    def stats(self):
+        stats = self.cache.stats()
+        requests = stats['hits'] + stats['misses']
+        with self.lock:
+            lookup_avg = self.lookup_total / self.lookups if self.lookups else 0.0
+            lookup_max = self.lookup_max
+        return {
+            'size': stats['size'],
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hits'] / requests if requests else 0.0,
+            'evictions': stats['evictions'],
+            'expirations': stats['expirations'],
+            # По выборке из каждого LOOKUP_SAMPLE-го запроса: выбор коэффициентов и поиск в кэше
+            'lookup_avg_seconds': lookup_avg,
+            'lookup_max_seconds': lookup_max,
+        }
@@ -0,0 +1,188 @@
+"""История расчетов в SQLite: запись пачками в фоновом потоке.
+
+Обработчик только ставит расчет в очередь (record) и сразу отвечает
+пользователю. Фоновый поток забирает из очереди до batch_size расчетов
+или все, что накопилось за flush_interval секунд, и записывает их одной
+транзакцией, поэтому ответ никогда не ждет записи на диск, а число
+синхронизаций не растет вместе с числом расчетов.
+
+Сохраняются введенные данные, результат tariff.quote (коэффициенты,
+summa_min/summa_max, версия тарифов) и время. Чтение последних расчетов
+чата идет по индексу (chat_id, created_at) через соединение своего
+потока, без общей блокировки: под ней только копируются расчеты, которые
+еще ждут записи, — они тоже видны при чтении, поэтому «повторить расчет»
+сразу после расчета не потеряет его.
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = 'chat_id, created_at, inputs, quote, summa_min, summa_max, tariff_version'
+
+
+def _row(chat_id, created_at, data, result):
+    return (
+        chat_id, created_at, json.dumps(data, ensure_ascii=False), json.dumps(result, ensure_ascii=False),
+        result['summa_min'], result['summa_max'], result['tariff_version'],
+    )
+
+
+def _entry(row):
+    _, created_at, inputs, quote, *_ = row
+    return {'created_at': created_at, 'data': json.loads(inputs), 'quote': json.loads(quote)}
+
+
+class QuoteHistory:
+    def __init__(self, path='history.db', batch_size=200, flush_interval=0.5, queue_size=10000,
+                 clock=time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.pending = {}  # chat_id -> строки в очереди, еще не записанные в базу
+        self.thread = None
+        self.local = threading.local()  # соединение для чтения у каждого потока
+        self.readers = []
+
+        self.writes = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self.conn = self._connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS quotes ('
+            'id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL, created_at REAL NOT NULL, '
+            'inputs TEXT NOT NULL, quote TEXT NOT NULL, summa_min INTEGER NOT NULL, '
+            'summa_max INTEGER NOT NULL, tariff_version TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS quotes_chat_time ON quotes (chat_id, created_at)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='quote-history', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Записывает все, что уже в очереди, и останавливает поток."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            self.thread = None
+        with self.lock:
+            self.conn.close()
+            for conn in self.readers:
+                conn.close()
+            self.readers = []
+
+    def record(self, chat_id, data, result):
+        """Ставит расчет в очередь на запись. False — очередь переполнена, расчет не сохранен."""
+        row = _row(chat_id, self.clock(), data, result)
+        with self.lock:
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+                logger.warning(f"Очередь истории переполнена, расчет для {chat_id} не сохранен")
+                return False
+            self.pending.setdefault(chat_id, []).append(row)
+        return True
+
+    def recent(self, chat_id, limit=5):
+        """Последние limit расчетов чата, новые первыми: [{'created_at', 'data', 'quote'}]."""
+        # Сначала pending, потом SELECT: строка, записанная между ними, попадет в оба — но не потеряется
+        with self.lock:
+            pending = list(self.pending.get(chat_id, ()))
+        rows = self._reader().execute(
+            f'SELECT {_COLUMNS} FROM quotes WHERE chat_id = ? ORDER BY created_at DESC LIMIT ?',
+            (chat_id, limit)
+        ).fetchall()
+        # Сразу после COMMIT строка еще может оставаться в pending — не показываем ее дважды
+        rows = sorted(pending, key=lambda row: row[1], reverse=True) + [
+            row for row in rows if row not in pending
+        ]
+        return [_entry(row) for row in rows[:limit]]
+
+    def _reader(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+            with self.lock:
+                self.readers.append(conn)
+        return conn
+
+    def last(self, chat_id):
+        found = self.recent(chat_id, limit=1)
+        return found[0] if found else None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'depth': self.queue.qsize(),
+                'writes': self.writes,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            row = self.queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    row = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(f'INSERT INTO quotes ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except Exception as e:
+            logger.error(f"Не удалось записать историю расчетов ({len(batch)} шт.): {e}")
+            failed = True
+        else:
+            failed = False
+        with self.lock:
+            for row in batch:
+                rows = self.pending.get(row[0])
+                if rows:
+                    rows.remove(row)
+                    if not rows:
+                        del self.pending[row[0]]
+            if failed:
+                self.failed += len(batch)
+            else:
+                self.writes += len(batch)
+                self.batches += 1
@@ -0,0 +1,163 @@
+"""Индексированная маршрутизация сообщений по обработчикам.
+
+TeleBot проверяет обработчики сообщений по очереди: фильтры func, text
+и commands каждого из них, а фильтр state для каждого обработчика
+состояния заново читает хранилище. IndexedTeleBot при первом обновлении
+строит индекс по команде, точному тексту кнопки и состоянию, читает
+состояние пользователя один раз и проверяет только обработчики, которые
+могут подойти: найденные по индексу и обработчики без индексируемых
+фильтров (например, последний func=lambda message: True). Среди
+кандидатов, как и в TeleBot, побеждает зарегистрированный первым.
+
+Если задан throttle (throttle.Throttle), сообщения чатов, превысивших
+лимит, отбрасываются до выбора обработчика.
+"""
+import heapq
+import re
+
+import telebot
+from telebot import util
+from telebot.handler_backends import ContinueHandling, State
+
+_NO_STATE = object()  # состояние не читалось (нет обработчиков состояний)
+
+
+def _state_names(value):
+    values = value if isinstance(value, list) else [value]
+    return [v.name if isinstance(v, State) else v for v in values]
+
+
+def _index_keys(filters):
+    """Ключи индекса обработчика или None, если его нужно проверять всегда."""
+    commands = filters.get('commands')
+    if commands:
+        return [('command', command) for command in commands]
+    text = filters.get('text')
+    if isinstance(text, str):
+        return [('text', text)]
+    if isinstance(text, list) and all(isinstance(t, str) for t in text):
+        return [('text', t) for t in text]
+    state = filters.get('state')
+    if state is not None and state != '*':
+        return [('state', name) for name in _state_names(state)]
+    return None
+
+
+class Routes:
+    """Индекс обработчиков сообщений: ключ -> [(порядковый номер, обработчик)]."""
+
+    def __init__(self, handlers):
+        self.handlers = list(handlers)
+        self.index = {}
+        self.generic = []
+        self.uses_state = False
+        for position, handler in enumerate(self.handlers):
+            filters = handler['filters']
+            if filters.get('state') is not None:
+                self.uses_state = True
+            keys = _index_keys(filters)
+            if keys is None:
+                self.generic.append((position, handler))
+                continue
+            for key in dict.fromkeys(keys):
+                self.index.setdefault(key, []).append((position, handler))
+
+    def candidates(self, command, text, state):
+        lists = [self.generic]
+        for key in (('command', command), ('text', text), ('state', state)):
+            found = self.index.get(key)
+            if found:
+                lists.append(found)
+        if len(lists) == 1:
+            return self.generic
+        return heapq.merge(*lists, key=lambda item: item[0])
+
+
+class IndexedTeleBot(telebot.TeleBot):
+    """TeleBot с индексом обработчиков сообщений и одним чтением состояния на обновление."""
+
+    def __init__(self, *args, throttle=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._routes = None
+        self.throttle = throttle
+        self.state_reads = 0
+
+    def build_routes(self):
+        """Перестраивает индекс (вызывается сам, если список обработчиков изменился)."""
+        self._routes = Routes(self.message_handlers)
+        return self._routes
+
+    def _get_routes(self):
+        routes = self._routes
+        if routes is None or len(routes.handlers) != len(self.message_handlers):
+            routes = self.build_routes()
+        return routes
+
+    def process_new_messages(self, new_messages):
+        if self.throttle is not None:
+            new_messages = [message for message in new_messages if self.throttle.admit(message.chat.id)]
+            if not new_messages:
+                return
+        super().process_new_messages(new_messages)
+
+    def _run_middlewares_and_handler(self, message, handlers, middlewares, update_type):
+        if self.use_class_middlewares or handlers is not self.message_handlers:
+            return super()._run_middlewares_and_handler(message, handlers, middlewares, update_type)
+        self.route(message)
+
+    def route(self, message):
+        """Вызывает подходящий обработчик сообщения; False — ни один не подошел."""
+        routes = self._get_routes()
+        text = message.text if message.content_type == 'text' else None
+        command = util.extract_command(text) if text else None
+
+        state = _NO_STATE
+        if routes.uses_state and message.from_user is not None:
+            # Единственное обращение к хранилищу состояний за обновление
+            state = self.current_states.get_state(message.chat.id, message.from_user.id)
+            self.state_reads += 1
+
+        handled = False
+        for _, handler in routes.candidates(command, text, state):
+            if not self._matches(handler['filters'], message, command, state):
+                continue
+            if handler.get('pass_bot', False):
+                result = handler['function'](message, bot=self)
+            else:
+                result = handler['function'](message)
+            handled = True
+            if not isinstance(result, ContinueHandling):
+                break
+        return handled
+
+    def _matches(self, filters, message, command, state):
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == 'content_types':
+                if message.content_type not in value:
+                    return False
+            elif name == 'commands':
+                if command not in value:
+                    return False
+            elif name == 'state':
+                if value == '*':
+                    continue
+                if state is _NO_STATE or state not in _state_names(value):
+                    return False
+            elif name == 'text' and isinstance(value, (str, list)):
+                if (message.text not in value) if isinstance(value, list) else (message.text != value):
+                    return False
+            elif name == 'regexp':
+                if message.content_type != 'text' or not re.search(value, message.text, re.IGNORECASE):
+                    return False
+            elif name == 'chat_types':
+                if message.chat.type not in value:
+                    return False
+            elif name == 'func':
+                if not value(message):
+                    return False
+            elif not (self.custom_filters and name in self.custom_filters
+                      and self._check_filter(name, value, message)):
+                return False
+        return True
@@ -0,0 +1,198 @@
+"""Хранилища сессий: в памяти процесса, SQLite (WAL) и Redis.
+
+Сессия чата — набор полей «имя → значение» (состояния FSM и данные
+расчета). Любое изменение сессии записывается одним вызовом write, то есть
+одной транзакцией SQLite или одним конвейером Redis.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from ttl_cache import TTLCache
+
+
+class SessionBackend:
+    def load(self, chat_id):
+        """Все поля сессии чата (пустой словарь, если сессии нет)."""
+        raise NotImplementedError
+
+    def write(self, chat_id, fields=None, remove=(), reset=False):
+        """Записывает поля fields и удаляет поля remove за один вызов.
+
+        reset — перед записью удалить все прежние поля сессии.
+        """
+        raise NotImplementedError
+
+    def delete(self, chat_id):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(SessionBackend):
+    """Сессии в памяти процесса с ограничением по TTL и количеству (LRU)."""
+
+    def __init__(self, ttl=3600, max_entries=10000):
+        self.cache = TTLCache(maxsize=max_entries, ttl=ttl)
+
+    def load(self, chat_id):
+        return dict(self.cache.get(chat_id) or {})
+
+    def write(self, chat_id, fields=None, remove=(), reset=False):
+        with self.cache.lock:
+            session = None if reset else self.cache.get(chat_id)
+            session = dict(session or {})
+            session.update(fields or {})
+            for field in remove:
+                session.pop(field, None)
+            if session:
+                self.cache.set(chat_id, session)
+            else:
+                self.cache.pop(chat_id)
+
+    def delete(self, chat_id):
+        self.cache.pop(chat_id)
+
+    def stats(self):
+        stats = self.cache.stats()
+        return {
+            'live': stats['size'],
+            'evictions': stats['evictions'],
+            'expirations': stats['expirations'],
+        }
+
+
+class SQLiteBackend(SessionBackend):
+    """Сессии в файле SQLite в режиме WAL — общие для процессов на одной машине."""
+
+    CLEANUP_EVERY = 500  # записей между удалениями устаревших сессий
+
+    def __init__(self, path='sessions.db', ttl=3600):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.expirations = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'chat_id INTEGER PRIMARY KEY, fields TEXT NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)')
+
+    def load(self, chat_id):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT fields FROM sessions WHERE chat_id = ? AND updated_at > ?',
+                (chat_id, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def write(self, chat_id, fields=None, remove=(), reset=False):
+        now = time.time()
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                session = {}
+                if not reset:
+                    row = self.conn.execute(
+                        'SELECT fields FROM sessions WHERE chat_id = ? AND updated_at > ?',
+                        (chat_id, now - self.ttl)
+                    ).fetchone()
+                    if row:
+                        session = json.loads(row[0])
+                session.update(fields or {})
+                for field in remove:
+                    session.pop(field, None)
+                if session:
+                    self.conn.execute(
+                        'INSERT INTO sessions (chat_id, fields, updated_at) VALUES (?, ?, ?) '
+                        'ON CONFLICT(chat_id) DO UPDATE SET fields = excluded.fields, updated_at = excluded.updated_at',
+                        (chat_id, json.dumps(session, ensure_ascii=False), now)
+                    )
+                else:
+                    self.conn.execute('DELETE FROM sessions WHERE chat_id = ?', (chat_id,))
+
+                self.writes += 1
+                if self.writes % self.CLEANUP_EVERY == 0:
+                    cursor = self.conn.execute('DELETE FROM sessions WHERE updated_at <= ?', (now - self.ttl,))
+                    self.expirations += cursor.rowcount
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def delete(self, chat_id):
+        with self.lock:
+            self.conn.execute('DELETE FROM sessions WHERE chat_id = ?', (chat_id,))
+
+    def stats(self):
+        with self.lock:
+            live = self.conn.execute(
+                'SELECT COUNT(*) FROM sessions WHERE updated_at > ?', (time.time() - self.ttl,)
+            ).fetchone()[0]
+        return {'live': live, 'evictions': 0, 'expirations': self.expirations}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisBackend(SessionBackend):
+    """Сессии в Redis (или совместимом по протоколу сервере) — общие для всех процессов.
+
+    Сессия хранится хешем с JSON-значениями; запись вместе с продлением TTL
+    уходит одним конвейером MULTI/EXEC.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', ttl=3600, prefix='osago:session:'):
+        import redis
+
+        # RESP2 понимают и Redis, и совместимые с ним серверы
+        self.client = redis.Redis.from_url(url, protocol=2)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, chat_id):
+        return f'{self.prefix}{chat_id}'
+
+    def load(self, chat_id):
+        raw = self.client.hgetall(self._key(chat_id))
+        return {field.decode(): json.loads(value) for field, value in raw.items()}
+
+    def write(self, chat_id, fields=None, remove=(), reset=False):
+        key = self._key(chat_id)
+        pipe = self.client.pipeline(transaction=True)
+        if reset:
+            pipe.delete(key)
+        if remove:
+            pipe.hdel(key, *remove)
+        if fields:
+            pipe.hset(key, mapping={
+                field: json.dumps(value, ensure_ascii=False) for field, value in fields.items()
+            })
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete(self, chat_id):
+        self.client.delete(self._key(chat_id))
+
+    def close(self):
+        self.client.close()
+
+
+def create_backend(kind='memory', ttl=3600, max_entries=10000, path='sessions.db', url=None):
+    if kind == 'memory':
+        return MemoryBackend(ttl=ttl, max_entries=max_entries)
+    if kind == 'sqlite':
+        return SQLiteBackend(path=path, ttl=ttl)
+    if kind == 'redis':
+        return RedisBackend(url=url or 'redis://localhost:6379/0', ttl=ttl)
+    raise ValueError(f"Неизвестное хранилище сессий: {kind}")
@@ -0,0 +1,148 @@
+"""Хранилище сессий диалога: состояние FSM и данные расчета вместе.
+
+Сессия чата хранится в одном из хранилищ session_backends (в памяти,
+SQLite или Redis) как набор полей: «state:<user_id>» — состояние
+пользователя, «data:<имя>» — данные расчета. Состояние и данные живут
+в одной записи и удаляются одновременно, а переход диалога к следующему
+шагу (advance) записывает и то и другое одним вызовом хранилища.
+
+AsyncSessionStore — хранилище состояний FSM для AsyncTeleBot: записи
+пользователей лежат в TTLCache, поэтому брошенные диалоги вытесняются
+по времени и по размеру так же, как сессии синхронного бота.
+"""
+from telebot import asyncio_storage
+from telebot.storage.base_storage import StateContext, StateStorageBase
+
+from ttl_cache import TTLCache
+
+STATE_PREFIX = 'state:'
+DATA_PREFIX = 'data:'
+
+
+def _state_name(state):
+    return state.name if hasattr(state, 'name') else state
+
+
+def _data_fields(fields):
+    return {DATA_PREFIX + key: value for key, value in fields.items()}
+
+
+class SessionStore(StateStorageBase):
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+
+    # Данные расчета
+    def start(self, chat_id, user_id=None, state=None):
+        """Начинает новый расчет, сбрасывая прежние данные чата."""
+        fields = {} if state is None else {f'{STATE_PREFIX}{user_id}': _state_name(state)}
+        self.backend.write(chat_id, fields, reset=True)
+
+    def get(self, chat_id):
+        session = self.backend.load(chat_id)
+        if not session:
+            return None
+        return {
+            field[len(DATA_PREFIX):]: value
+            for field, value in session.items() if field.startswith(DATA_PREFIX)
+        }
+
+    def update(self, chat_id, **fields):
+        self.backend.write(chat_id, _data_fields(fields))
+
+    def advance(self, chat_id, user_id, state, **fields):
+        """Сохраняет данные шага и переводит пользователя в состояние state."""
+        fields = _data_fields(fields)
+        fields[f'{STATE_PREFIX}{user_id}'] = _state_name(state)
+        self.backend.write(chat_id, fields)
+
+    def finish(self, chat_id, **keep):
+        """Удаляет сессию чата — состояние и данные, кроме полей keep (например, последнего расчета)."""
+        if keep:
+            self.backend.write(chat_id, _data_fields(keep), reset=True)
+        else:
+            self.backend.delete(chat_id)
+
+    def stats(self):
+        return self.backend.stats()
+
+    # Интерфейс хранилища состояний telebot
+    def set_state(self, chat_id, user_id, state):
+        self.backend.write(chat_id, {f'{STATE_PREFIX}{user_id}': _state_name(state)})
+        return True
+
+    def get_state(self, chat_id, user_id):
+        return self.backend.load(chat_id).get(f'{STATE_PREFIX}{user_id}')
+
+    def delete_state(self, chat_id, user_id):
+        self.backend.write(chat_id, remove=[f'{STATE_PREFIX}{user_id}'])
+        return True
+
+    def get_data(self, chat_id, user_id):
+        return self.get(chat_id)
+
+    def set_data(self, chat_id, user_id, key, value):
+        self.update(chat_id, **{key: value})
+        return True
+
+    def reset_data(self, chat_id, user_id):
+        self.save(chat_id, user_id, {})
+        return True
+
+    def get_interactive_data(self, chat_id, user_id):
+        return StateContext(self, chat_id, user_id)
+
+    def save(self, chat_id, user_id, data):
+        stale = [field for field in self.backend.load(chat_id)
+                 if field.startswith(DATA_PREFIX) and field[len(DATA_PREFIX):] not in data]
+        self.backend.write(chat_id, _data_fields(data), remove=stale)
+
+
+class AsyncSessionStore(asyncio_storage.StateStorageBase):
+    def __init__(self, maxsize=10000, ttl=3600):
+        super().__init__()
+        # (chat_id, user_id) -> {'state': ..., 'data': {...}}
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def stats(self):
+        return self.cache.stats()
+
+    async def set_state(self, chat_id, user_id, state):
+        with self.cache.lock:
+            record = self.cache.get((chat_id, user_id)) or {'data': {}}
+            record['state'] = _state_name(state)
+            self.cache.set((chat_id, user_id), record)
+        return True
+
+    async def get_state(self, chat_id, user_id):
+        record = self.cache.get((chat_id, user_id))
+        return None if record is None else record['state']
+
+    async def delete_state(self, chat_id, user_id):
+        return self.cache.pop((chat_id, user_id)) is not None
+
+    async def get_data(self, chat_id, user_id):
+        record = self.cache.get((chat_id, user_id))
+        return None if record is None else record['data']
+
+    async def set_data(self, chat_id, user_id, key, value):
+        record = self.cache.get((chat_id, user_id))
+        if record is None:
+            raise RuntimeError(f'chat_id {chat_id} and user_id {user_id} does not exist')
+        record['data'][key] = value
+        return True
+
+    async def reset_data(self, chat_id, user_id):
+        record = self.cache.get((chat_id, user_id))
+        if record is None:
+            return False
+        record['data'] = {}
+        return True
+
+    def get_interactive_data(self, chat_id, user_id):
+        return asyncio_storage.StateContext(self, chat_id, user_id)
+
+    async def save(self, chat_id, user_id, data):
+        record = self.cache.get((chat_id, user_id))
+        if record is not None:
+            record['data'] = data
@@ -0,0 +1,353 @@
+"""Тарифный движок ОСАГО.
+
+Тарифные таблицы (КО, КТ, КС, КВС, КБМ, КМ и базовый тариф) хранятся
+вместе с номером версии в файле tariffs.json. При загрузке они
+компилируются в объект Tariff с доступом за O(1): КВС — массив
+«стаж × возрастная группа», КБМ — прямые ключи, КМ — таблица для bisect.
+
+Действующий Tariff заменяется целиком одним присваиванием (reload, Watcher),
+без перезапуска бота. Расчет один раз берет current() и целиком считает
+по одной версии без блокировок. Модульные имена (KT_COEFFICIENTS, VERSION,
+kbs_coef, ...) всегда относятся к текущей версии.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from city_search import CityIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tariffs.json')
+
+# Значения по умолчанию при отсутствии совпадения в таблицах
+DEFAULT_KO = 1
+DEFAULT_KT = 1.5
+DEFAULT_KBS = 1.5
+DEFAULT_KC = 1
+DEFAULT_KBM = 3.92  # Максимальный коэффициент при несовпадении
+NOVICE_KBM = 1.17  # Начинающий водитель: аварии не учитываются
+BASE_KBM = 1  # История аварий не указана
+KM_OVER_MAX = 1.6
+MAX_EXPERIENCE = 20
+
+
+class TariffError(ValueError):
+    """Файл тарифов не читается или не проходит проверку."""
+
+
+# Компиляция таблиц
+def _compile_kbs(table):
+    bounds = sorted({b for (_, lo, hi) in table for b in (lo, hi)})
+    bands = len(bounds) - 1
+    coefs = array('d', [DEFAULT_KBS]) * ((MAX_EXPERIENCE + 1) * bands)
+    filled = set()
+    # Как и при линейном поиске, побеждает первая подходящая запись
+    for (exp, min_age, max_age), coef in table.items():
+        if not 0 <= exp <= MAX_EXPERIENCE:
+            continue
+        for band in range(bisect_left(bounds, min_age), bisect_left(bounds, max_age)):
+            slot = exp * bands + band
+            if slot not in filled:
+                coefs[slot] = coef
+                filled.add(slot)
+    return bounds, bands, coefs
+
+
+def _compile_km(table):
+    limits = sorted(table)
+    return limits, array('d', [table[limit] for limit in limits])
+
+
+def _number(value):
+    # Числа остаются как в файле: 1 выводится в расчете как 1, а не 1.0
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"ожидалось число, получено {value!r}")
+    return value
+
+
+class Tariff:
+    """Тарифные таблицы одной версии. После создания не изменяются."""
+
+    def __init__(self, version, ko, kt, kc, kbs, kbm, km, tarif_min, tarif_max, checksum=None):
+        self.version = version
+        self.checksum = checksum
+        self.ko_coefficients = dict(ko)
+        self.kt_coefficients = dict(kt)
+        self.kc_coefficients = dict(kc)
+        self.kbs_coefficients = dict(kbs)
+        self.kbm_coefficients = dict(kbm)
+        self.km_coefficients = dict(km)
+        self.tarif_min = tarif_min
+        self.tarif_max = tarif_max
+
+        self.kbs_age_bounds, self.kbs_bands, self.kbs_table = _compile_kbs(self.kbs_coefficients)
+        self.kbm_table = dict(self.kbm_coefficients)
+        self.km_limits, self.km_values = _compile_km(self.km_coefficients)
+        self._kbs_max_age = self.kbs_age_bounds[-1]
+        # Поиск города по таблице КТ: тысячи территорий вводятся текстом, а не кнопками
+        self.city_index = CityIndex(self.kt_coefficients)
+
+    @classmethod
+    def from_dict(cls, raw, checksum=None):
+        """Tariff из содержимого tariffs.json; TariffError, если данные неполные."""
+        try:
+            version = str(raw['version'])
+            tariff = cls(
+                version,
+                ko={name: _number(coef) for name, coef in raw['ko'].items()},
+                kt={city: _number(coef) for city, coef in raw['kt'].items()},
+                kc={int(period): _number(coef) for period, coef in raw['kc'].items()},
+                kbs={(int(exp), int(lo), int(hi)): _number(coef) for exp, lo, hi, coef in raw['kbs']},
+                kbm={(int(per), int(acc)): _number(coef) for per, acc, coef in raw['kbm']},
+                km={_number(limit): _number(coef) for limit, coef in raw['km']},
+                tarif_min=int(raw['base_rate']['min']),
+                tarif_max=int(raw['base_rate']['max']),
+                checksum=checksum,
+            )
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            raise TariffError(f"Неверный формат тарифов: {e!r}") from e
+        if not version or not all((tariff.ko_coefficients, tariff.kt_coefficients,
+                                   tariff.kc_coefficients, tariff.kbs_coefficients,
+                                   tariff.kbm_coefficients, tariff.km_coefficients)):
+            raise TariffError("В файле тарифов нет версии или одной из таблиц")
+        return tariff
+
+    # Функции расчета
+    def ko_coef(self, lico):
+        return self.ko_coefficients.get(lico, DEFAULT_KO)
+
+    def kbm_coef(self, period, accidents):
+        return self.kbm_table.get((period, accidents), DEFAULT_KBM)
+
+    def kt_coef(self, city):
+        return self.kt_coefficients.get(city, DEFAULT_KT)
+
+    def kbs_coef(self, experience, age):
+        exp = int(min(experience, MAX_EXPERIENCE))
+        if exp < 0:
+            return DEFAULT_KBS
+        band = bisect_right(self.kbs_age_bounds, age) - 1
+        if band < 0 or not age < self._kbs_max_age:
+            return DEFAULT_KBS
+        return self.kbs_table[exp * self.kbs_bands + band]
+
+    def kc_coef(self, period):
+        return self.kc_coefficients.get(period, DEFAULT_KC)
+
+    def km_coef(self, power):
+        index = bisect_left(self.km_limits, power)
+        if index < len(self.km_limits) and power <= self.km_limits[index]:
+            return self.km_values[index]
+        if power > self.km_limits[-1]:
+            return KM_OVER_MAX
+        return 1
+
+    def calculate(self, ko, km, kc, kbs, kbm, kt):
+        """Возвращает (summa_min, summa_max) для набора коэффициентов."""
+        summa_min = int(self.tarif_min * ko * km * kc * kbs * kbm * kt)
+        summa_max = int(self.tarif_max * ko * km * kc * kbs * kbm * kt)
+        return summa_min, summa_max
+
+    def coefficient_set(self, data):
+        """(ko, kt, kbs, kc, kbm, km) по данным диалога — без исходных значений и словаря результата."""
+        ko = self.ko_coef(data['insurance_type']) if 'insurance_type' in data else data.get('ko', 1)
+        kt = self.kt_coef(data['city']) if 'city' in data else data.get('kt', 1)
+        kc = self.kc_coef(data['period']) if 'period' in data else data.get('kc', 1)
+        if data.get('is_novice') is False and 'accidents' in data and 'accident_period' in data:
+            kbm = self.kbm_coef(data['accident_period'], data['accidents'])
+        else:
+            kbm = data.get('kbm', BASE_KBM)
+        kbs = self.kbs_coef(data.get('experience', 5), data.get('age', 30))
+        return ko, kt, kbs, kc, kbm, self.km_coef(data.get('power', 100))
+
+    def coefficients(self, data, coefficient_set=None):
+        """Коэффициенты и исходные значения по данным диалога (значения по умолчанию — как в боте).
+
+        КО, КТ, КС и КБМ берутся из таблиц этой версии по введенным значениям,
+        поэтому диалог, начатый до смены тарифов, считается по новым.
+        coefficient_set — уже найденный coefficient_set(data), например кэшем расчетов.
+        """
+        ko, kt, kbs, kc, kbm, km = coefficient_set or self.coefficient_set(data)
+        return {
+            'ko': ko, 'kt': kt, 'kbs': kbs, 'kc': kc, 'kbm': kbm, 'km': km,
+            'power': data.get('power', 100), 'experience': data.get('experience', 5),
+            'age': data.get('age', 30), 'period': data.get('period', 10),
+            'tariff_version': self.version,
+        }
+
+    def quote(self, data):
+        """Расчет по данным диалога."""
+        result = self.coefficients(data)
+        result['summa_min'], result['summa_max'] = self.calculate(
+            result['ko'], result['km'], result['kc'], result['kbs'], result['kbm'], result['kt']
+        )
+        return result
+
+
+def load(path=DEFAULT_PATH):
+    """Читает и компилирует файл тарифов, не делая его текущим."""
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        raw = json.loads(content)
+    except (OSError, ValueError) as e:
+        raise TariffError(f"Не удалось прочитать тарифы из {path}: {e}") from e
+    return Tariff.from_dict(raw, checksum=hashlib.sha256(content).hexdigest())
+
+
+_current = load(DEFAULT_PATH)
+_path = DEFAULT_PATH
+_reload_lock = threading.Lock()
+
+
+def current():
+    """Действующие тарифы. Берите один раз на расчет, чтобы не смешать версии."""
+    return _current
+
+
+def install(tariff):
+    """Делает tariff текущим; возвращает предыдущий."""
+    global _current
+    previous, _current = _current, tariff
+    return previous
+
+
+def use(path):
+    """Загружает тарифы из path и делает его файлом для reload и Watcher."""
+    global _path
+    with _reload_lock:
+        install(load(path))
+        _path = path
+    return _current
+
+
+def reload(path=None):
+    """Перечитывает файл тарифов и подменяет текущие, если они изменились.
+
+    Возвращает (тарифы, изменились ли они). Новые таблицы должны иметь
+    новую версию: по ней сбрасываются кэши расчетов и клавиатуры.
+    """
+    global _path
+    with _reload_lock:
+        path = path or _path
+        tariff = load(path)
+        if tariff.checksum == _current.checksum:
+            _path = path
+            return _current, False
+        if tariff.version == _current.version:
+            raise TariffError(f"Таблицы в {path} изменились, но версия осталась {tariff.version}")
+        previous = install(tariff)
+        _path = path
+    logger.info(f"Тарифы обновлены: версия {previous.version} -> {tariff.version} ({path})")
+    return tariff, True
+
+
+class Watcher:
+    """Фоновый поток: перечитывает файл тарифов при изменении его времени или размера."""
+
+    def __init__(self, path=None, interval=30):
+        self.path = path or _path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='tariff-watcher', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        signature = self._signature()
+        while not self.stopped.wait(self.interval):
+            new_signature = self._signature()
+            if new_signature is None or new_signature == signature:
+                continue
+            signature = new_signature
+            try:
+                reload(self.path)
+            except TariffError as e:
+                # Остаются прежние тарифы; файл перечитается при следующем изменении
+                logger.error(f"Тарифы не обновлены: {e}")
+
+
+# Имена таблиц модуля относятся к текущей версии
+_ATTRIBUTES = {
+    'VERSION': 'version',
+    'KO_COEFFICIENTS': 'ko_coefficients',
+    'KT_COEFFICIENTS': 'kt_coefficients',
+    'KC_COEFFICIENTS': 'kc_coefficients',
+    'KBS_COEFFICIENTS': 'kbs_coefficients',
+    'KBM_COEFFICIENTS': 'kbm_coefficients',
+    'KM_COEFFICIENTS': 'km_coefficients',
+    'TARIF_MIN': 'tarif_min',
+    'TARIF_MAX': 'tarif_max',
+    'KBS_AGE_BOUNDS': 'kbs_age_bounds',
+    'KBS_BANDS': 'kbs_bands',
+    'KBS_TABLE': 'kbs_table',
+    'KBM_TABLE': 'kbm_table',
+    'KM_LIMITS': 'km_limits',
+    'KM_VALUES': 'km_values',
+}
+
+
+def __getattr__(name):
+    attribute = _ATTRIBUTES.get(name)
+    if attribute is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(_current, attribute)
+
+
+def ko_coef(lico):
+    return _current.ko_coef(lico)
+
+
+def kbm_coef(period, accidents):
+    return _current.kbm_coef(period, accidents)
+
+
+def kt_coef(city):
+    return _current.kt_coef(city)
+
+
+def kbs_coef(experience, age):
+    return _current.kbs_coef(experience, age)
+
+
+def kc_coef(period):
+    return _current.kc_coef(period)
+
+
+def km_coef(power):
+    return _current.km_coef(power)
+
+
+def calculate(ko, km, kc, kbs, kbm, kt):
+    """Возвращает (summa_min, summa_max) для набора коэффициентов."""
+    return _current.calculate(ko, km, kc, kbs, kbm, kt)
+
+
+def coefficients(data):
+    return _current.coefficients(data)
+
+
+def quote(data):
+    """Расчет по данным диалога."""
+    return _current.quote(data)
@@ -0,0 +1,5 @@
+# Модули бота лежат в корне репозитория, как у benchmarks/
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,37 @@
+import pytest
+
+import drivers
+import tariff
+
+
+@pytest.mark.parametrize('experience', [2.96, 2.99, 3.0, 4.99, 5.0])
+def test_packed_experience_keeps_kbs_band(experience):
+    current = tariff.current()
+    packed = drivers.pack([drivers.Driver(experience, 30, accidents=0, accident_period=3)])
+    assert drivers.coefficients(packed, current)['kbs'] == current.kbs_coef(experience, 30)
+
+
+def test_accidents_override_novice_kbm():
+    current = tariff.current()
+    packed = drivers.pack([drivers.Driver(2.96, 30, accidents=2, accident_period=5)])
+    assert drivers.coefficients(packed, current)['kbm'] == current.kbm_coef(5, 2)
+
+
+def test_novice_without_accidents():
+    packed = drivers.pack([drivers.Driver(1, 19), drivers.Driver(10, 40)])
+    result = drivers.coefficients(packed)
+    assert result['kbm'] == tariff.NOVICE_KBM
+    assert result['kbm_driver'] == 1
+
+
+def test_vector_lookup_matches_scan():
+    current = tariff.current()
+    items = [
+        drivers.Driver(experience / 3, 18 + age, accidents=accidents, accident_period=period)
+        for experience, age, accidents, period in zip(range(0, 90), range(0, 90), [0, 1, 2, 3] * 23, [0, 1, 3, 7, 12] * 18)
+    ]
+    packed = drivers.pack(items)
+    assert drivers.count(packed) >= drivers.SCALAR_DRIVERS
+    import batch_quote
+
+    assert batch_quote.driver_coefficients(packed, current) == drivers._scan(packed, current)
@@ -0,0 +1,47 @@
+import fleet_upload
+
+HEADER = ['Город', 'Мощность', 'Стаж', 'Возраст', 'Период', 'Страхователь', 'Комментарий']
+MAPPING = fleet_upload.map_header(HEADER)
+
+
+def test_short_row_is_padded_to_header():
+    rows = [['Казань', '105', '5', '30', '12', 'физ']]  # без последнего столбца
+    [row] = fleet_upload.price_chunk(rows, MAPPING, width=len(HEADER))
+    assert len(row) == len(HEADER) + len(fleet_upload.RESULT_HEADER)
+    result = dict(zip(fleet_upload.RESULT_HEADER, row[len(HEADER):]))
+    assert result['Ошибка'] == ''
+    assert result['КО'] == fleet_upload.tariff.KO_COEFFICIENTS['Физическое лицо']
+
+
+def test_unknown_insurance_type_is_row_error():
+    rows = [['Казань', '105', '5', '30', '12', 'самозанятый', '']]
+    [row] = fleet_upload.price_chunk(rows, MAPPING, width=len(HEADER))
+    assert row[-1] == 'Неизвестный вид страхователя: самозанятый'
+    assert row[len(HEADER)] == ''
+
+
+def test_unknown_city_is_row_error():
+    rows = [['Урюпинск', '105', '5', '30', '12', 'физ', ''], ['казань', '105', '5', '30', '12', 'физ', '']]
+    unknown, known = fleet_upload.price_chunk(rows, MAPPING, width=len(HEADER))
+    assert unknown[-1] == 'Неизвестный город: Урюпинск'
+    assert known[-1] == ''
+    assert known[len(HEADER) + 1] == fleet_upload.tariff.KT_COEFFICIENTS['Казань']
+
+
+def test_missing_accident_history_uses_base_kbm():
+    mapping = fleet_upload.map_header(HEADER + ['Аварии', 'Период аварий'])
+    rows = [
+        ['Казань', '105', '5', '30', '12', 'физ', '', '', ''],
+        ['Казань', '105', '5', '30', '12', 'физ', '', '0', '1'],
+        ['Казань', '105', '5', '30', '12', 'физ', '', '1', ''],
+    ]
+    width = len(HEADER) + 2
+    without, with_history, no_period = fleet_upload.price_chunk(rows, mapping, width=width)
+    kbm = width + fleet_upload.RESULT_HEADER.index('КБМ')
+    assert without[kbm] == fleet_upload.tariff.BASE_KBM
+    assert with_history[kbm] == fleet_upload.tariff.kbm_coef(1, 0)
+    assert no_period[-1] == 'Не указан период аварийности'
+
+    # Без столбцов аварий — тоже базовый КБМ
+    [row] = fleet_upload.price_chunk([rows[0][:len(HEADER)]], MAPPING, width=len(HEADER))
+    assert row[len(HEADER) + fleet_upload.RESULT_HEADER.index('КБМ')] == fleet_upload.tariff.BASE_KBM
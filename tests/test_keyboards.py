@@ -0,0 +1,19 @@
+import json
+
+import keyboards
+import tariff
+
+
+def labels(markup):
+    return [button['text'] for row in json.loads(markup.to_json()).get('keyboard', []) for button in row]
+
+
+def test_small_city_table_is_shown_as_buttons():
+    assert len(tariff.KT_COEFFICIENTS) <= keyboards.CITY_BUTTONS_MAX
+    assert labels(keyboards.cities()) == list(tariff.KT_COEFFICIENTS)
+
+
+def test_large_city_table_removes_keyboard(monkeypatch):
+    monkeypatch.setattr(keyboards, 'CITY_BUTTONS_MAX', 5)
+    markup = keyboards.build_cities()
+    assert json.loads(markup.to_json()) == {'remove_keyboard': True}
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from outbox import Outbox
+
+
+def too_many_requests(retry_after):
+    return ApiTelegramException('sendMessage', None, {
+        'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': retry_after},
+    })
+
+
+def make_outbox(**kwargs):
+    kwargs.setdefault('rate', 1000)
+    kwargs.setdefault('workers', 1)
+    return Outbox(**kwargs).start()
+
+
+def test_throttled_chat_does_not_block_other_chats():
+    outbox = make_outbox(chat_rate=1, chat_burst=1)
+    sent = []
+    done = threading.Event()
+
+    def send(chat_id, text):
+        sent.append((time.monotonic(), chat_id, text))
+        if chat_id == 2:
+            done.set()
+
+    outbox.submit(1, send, 1, 'первое')
+    outbox.submit(1, send, 1, 'второе')  # ждет токен чата 1 около секунды
+    outbox.submit(2, send, 2, 'другой чат')
+    assert done.wait(0.5)
+    outbox.stop(timeout=5)
+
+    assert [(chat_id, text) for _, chat_id, text in sent] == [(1, 'первое'), (2, 'другой чат'), (1, 'второе')]
+    assert sent[2][0] - sent[0][0] >= 0.9
+
+
+def test_429_pauses_only_its_chat():
+    outbox = make_outbox()
+    sent = []
+    failed_once = []
+
+    def send(chat_id, text):
+        if chat_id == 1 and not failed_once:
+            failed_once.append(True)
+            raise too_many_requests(1)
+        sent.append((chat_id, text))
+
+    outbox.submit(1, send, 1, 'a')
+    outbox.submit(1, send, 1, 'b')
+    outbox.submit(2, send, 2, 'c')
+    time.sleep(0.3)
+    assert sent == [(2, 'c')]
+    assert outbox.paused_until == 0.0
+    outbox.stop(timeout=5)
+    assert sent == [(2, 'c'), (1, 'a'), (1, 'b')]
+    assert outbox.stats()['retries'] == 1
+
+
+def test_429_in_several_chats_pauses_everything():
+    outbox = make_outbox()
+    outbox.GLOBAL_LIMIT_CHATS = 2
+    failed = set()
+
+    def send(chat_id):
+        if chat_id not in failed:
+            failed.add(chat_id)
+            raise too_many_requests(1)
+
+    outbox.submit(1, send, 1)
+    outbox.submit(2, send, 2)
+    outbox.stop(timeout=5)
+    assert outbox.paused_until > 0
+    assert outbox.stats()['sent'] == 2
+
+
+def test_dropped_after_retries_is_logged(caplog):
+    outbox = make_outbox(max_retries=2, backoff=0.01)
+
+    def send():
+        raise ConnectionError('нет сети')
+
+    with caplog.at_level(logging.ERROR, logger='outbox'):
+        outbox.submit(1, send)
+        outbox.stop(timeout=5)
+
+    stats = outbox.stats()
+    assert (stats['failed'], stats['retries'], stats['depth']) == (1, 2, 0)
+    assert 'отброшено после 3 попыток' in caplog.text
@@ -0,0 +1,24 @@
+import threading
+
+import profiler
+from profiler import Profiler
+
+
+def test_failed_collection_still_reports(monkeypatch):
+    def broken_report(self, seconds):
+        raise RuntimeError('нет данных')
+
+    monkeypatch.setattr(profiler.TraceCapture, 'report', broken_report)
+    reports = []
+    done = threading.Event()
+
+    def on_done(report):
+        reports.append(report)
+        done.set()
+
+    Profiler().start('trace', 1, on_done)
+    assert done.wait(5)
+    report, = reports
+    assert report.mode == 'trace'
+    assert 'нет данных' in report.summary
+    assert report.content == b''
@@ -0,0 +1,26 @@
+import messages
+import tariff
+from quote_cache import QuoteCache
+
+PROFILE = {'insurance_type': 'Физическое лицо', 'city': 'Казань', 'power': 105, 'experience': 5, 'age': 30,
+           'period': 12}
+
+
+def test_inputs_with_same_coefficients_share_an_entry():
+    cache = QuoteCache(sample=1)
+    for changes in ({}, {'experience': 5.3}, {'power': 101}, {'age': 31}):
+        data = dict(PROFILE, **changes)
+        result, price_text = cache.quote(data)
+        assert result == tariff.quote(data)
+        assert price_text == messages.format_price(result)
+
+    stats = cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (1, 3, 1)
+    assert stats['lookup_max_seconds'] >= stats['lookup_avg_seconds'] > 0
+
+
+def test_different_coefficients_miss():
+    cache = QuoteCache()
+    cache.quote(PROFILE)
+    cache.quote(dict(PROFILE, experience=1))
+    assert cache.stats()['misses'] == 2
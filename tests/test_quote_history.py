@@ -0,0 +1,33 @@
+import threading
+
+from quote_history import QuoteHistory
+
+RESULT = {'summa_min': 1000, 'summa_max': 2000, 'tariff_version': '2024.1'}
+
+
+def test_recent_sees_pending_and_written_quotes_once(tmp_path):
+    history = QuoteHistory(str(tmp_path / 'history.db'), flush_interval=0.01)
+    for i in range(3):
+        history.record(1, {'power': i}, RESULT)
+    # Поток записи еще не запущен: все три расчета пока только в pending
+    assert [entry['data']['power'] for entry in history.recent(1)] == [2, 1, 0]
+
+    history.start()
+    history.record(1, {'power': 3}, RESULT)
+    found = []
+    readers = [threading.Thread(target=lambda: found.append(history.recent(1, 10))) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    history.stop(timeout=5)
+
+    for entries in found:
+        assert [entry['data']['power'] for entry in entries] == [3, 2, 1, 0]
+    assert history.stats()['writes'] == 4
+
+
+def test_last_of_empty_chat(tmp_path):
+    history = QuoteHistory(str(tmp_path / 'history.db'))
+    assert history.last(1) is None
+    history.stop()
@@ -0,0 +1,30 @@
+import asyncio
+
+from sessions import AsyncSessionStore
+
+
+def test_async_store_keeps_state_and_data():
+    async def scenario():
+        store = AsyncSessionStore()
+        await store.set_state(1, 1, 'waiting_for_city')
+        await store.set_data(1, 1, 'city', 'Казань')
+        async with store.get_interactive_data(1, 1) as data:
+            data['power'] = 105
+        assert await store.get_state(1, 1) == 'waiting_for_city'
+        assert await store.get_data(1, 1) == {'city': 'Казань', 'power': 105}
+        assert await store.delete_state(1, 1)
+        assert await store.get_state(1, 1) is None
+
+    asyncio.run(scenario())
+
+
+def test_async_store_evicts_abandoned_dialogs():
+    async def scenario():
+        store = AsyncSessionStore(maxsize=2)
+        for chat_id in (1, 2, 3):
+            await store.set_state(chat_id, chat_id, 'waiting_for_city')
+        assert await store.get_state(1, 1) is None
+        assert await store.get_state(3, 3) == 'waiting_for_city'
+        assert store.stats()['size'] == 2
+
+    asyncio.run(scenario())
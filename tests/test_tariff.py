@@ -0,0 +1,68 @@
+"""Скомпилированный тарифный движок против исходных функций из main.py (линейный поиск)."""
+import math
+
+import tariff
+from tariff import KBM_COEFFICIENTS, KBS_COEFFICIENTS, KM_COEFFICIENTS
+
+
+def ref_kbm_coef(period, accidents):
+    for (per, acc), coef in KBM_COEFFICIENTS.items():
+        if per == period and acc == accidents:
+            return coef
+    return 3.92
+
+
+def ref_kbs_coef(experience, age):
+    max_exp = int(min(experience, 20))
+    for (exp, min_age, max_age), coef in KBS_COEFFICIENTS.items():
+        if exp == max_exp and min_age <= age < max_age:
+            return coef
+    return 1.5
+
+
+def ref_km_coef(power):
+    for key in sorted(KM_COEFFICIENTS):
+        if power <= key:
+            return KM_COEFFICIENTS[key]
+    if power > 150:
+        return 1.6
+    return 1
+
+
+def ref_quote(ko, kt, power, experience, age, kc, kbm):
+    kbs = ref_kbs_coef(experience, age)
+    km = ref_km_coef(power)
+    return int(1646 * ko * km * kc * kbs * kbm * kt), int(3535 * ko * km * kc * kbs * kbm * kt)
+
+
+def test_kbs_matches_linear_scan():
+    experiences = [x / 2 for x in range(-4, 61)]
+    ages = list(range(0, 160)) + [17.5, 21.9, 59.99, 149.5, 150.0]
+    for experience in experiences:
+        for age in ages:
+            assert tariff.kbs_coef(experience, age) == ref_kbs_coef(experience, age), (experience, age)
+
+
+def test_kbm_matches_linear_scan():
+    for period in range(-1, 15):
+        for accidents in range(-1, 8):
+            assert tariff.kbm_coef(period, accidents) == ref_kbm_coef(period, accidents), (period, accidents)
+
+
+def test_km_matches_linear_scan():
+    for power in [x / 4 for x in range(-40, 1200)] + [math.inf, math.nan]:
+        assert tariff.km_coef(power) == ref_km_coef(power), power
+
+
+def test_quote_matches_linear_scan():
+    for ko in tariff.KO_COEFFICIENTS.values():
+        for kt in set(tariff.KT_COEFFICIENTS.values()) | {tariff.DEFAULT_KT}:
+            for kc in set(tariff.KC_COEFFICIENTS.values()):
+                for power in (40, 70, 105, 150, 200):
+                    for experience in (0, 3, 10, 25):
+                        for age in (18, 30, 65):
+                            for kbm in (1.17, 0.46, 3.92):
+                                args = (ko, kt, power, experience, age, kc, kbm)
+                                kbs = tariff.kbs_coef(experience, age)
+                                km = tariff.km_coef(power)
+                                assert tariff.calculate(ko, km, kc, kbs, kbm, kt) == ref_quote(*args), args
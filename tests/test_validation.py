@@ -0,0 +1,15 @@
+import tariff
+import validation
+
+
+def test_partial_quote_without_history_uses_base_kbm():
+    data = validation.parse_quote('Казань 105 5 30 12', partial=True)
+    assert data['insurance_type'] == 'Физическое лицо'
+    assert data['kbm'] == tariff.BASE_KBM
+    assert 'is_novice' not in data
+    assert tariff.quote(data)['kbm'] == tariff.BASE_KBM
+
+
+def test_full_quote_with_novice_word():
+    data = validation.parse_quote('физ Казань 105 2 20 12 новичок')
+    assert (data['is_novice'], data['kbm']) == (True, tariff.NOVICE_KBM)
@@ -0,0 +1,71 @@
+"""Ограничение частоты сообщений от одного чата до выбора обработчика.
+
+Каждое сообщение, даже мусорное, стоит боту чтения состояния, обработчика
+и отправки ответа. Throttle держит для чата ведро токенов (rate сообщений
+в секунду, не больше burst подряд) и отбрасывает сообщения сверх лимита
+еще до маршрутизации. О превышении чат узнает один раз: следующее
+уведомление придет только после того, как сообщение снова пройдет лимит.
+
+Ведра хранятся в TTLCache: ведро, которое не трогали burst / rate секунд,
+уже полное и ничем не отличается от нового, поэтому удаляется попутно
+при обращениях. Число чатов ограничено max_chats (вытесняются давно
+неактивные).
+"""
+import threading
+import time
+
+from outbox import TokenBucket
+from ttl_cache import TTLCache
+
+
+class ChatBucket(TokenBucket):
+    __slots__ = ('noticed',)
+
+    def __init__(self, rate, capacity, now):
+        super().__init__(rate, capacity, now)
+        self.noticed = False
+
+
+class Throttle:
+    def __init__(self, rate=1.0, burst=10, max_chats=100000, notify=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.notify = notify
+        self.clock = clock
+        self.buckets = TTLCache(maxsize=max_chats, ttl=max(1.0, burst / rate), clock=clock)
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.dropped = 0
+        self.notices = 0
+
+    def admit(self, chat_id):
+        """True — сообщение можно обрабатывать; False — отброшено (при первом отказе — с уведомлением)."""
+        with self.lock:
+            now = self.clock()
+            bucket = self.buckets.get(chat_id)
+            if bucket is None:
+                bucket = ChatBucket(self.rate, self.burst, now)
+                self.buckets.set(chat_id, bucket)
+            if bucket.take(now):
+                bucket.noticed = False
+                self.admitted += 1
+                return True
+            self.dropped += 1
+            notify = not bucket.noticed
+            if notify:
+                bucket.noticed = True
+                self.notices += 1
+        if notify and self.notify is not None:
+            self.notify(chat_id)
+        return False
+
+    def stats(self):
+        with self.lock:
+            cache = self.buckets.stats()
+            return {
+                'admitted': self.admitted,
+                'dropped': self.dropped,
+                'notices': self.notices,
+                'chats': cache['size'],
+                'evictions': cache['evictions'],
+            }
@@ -0,0 +1,92 @@
+"""LRU-кэш с ограничением размера и временем жизни записей.
+
+Записи упорядочены по времени последнего обращения, поэтому устаревшие
+всегда находятся в начале и удаляются попутно при обращениях к кэшу —
+отдельный фоновый поток не нужен.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize=10000, ttl=3600, on_remove=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_remove = on_remove
+        self.clock = clock
+        self.lock = threading.RLock()
+        self._items = OrderedDict()  # key -> (время обращения, значение)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        with self.lock:
+            self._expire(self.clock())
+            return key in self._items
+
+    def get(self, key, default=None):
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items[key] = (now, item[1])
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            self._items[key] = (now, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                old_key, (_, old_value) = self._items.popitem(last=False)
+                self.evictions += 1
+                self._removed(old_key, old_value)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            item = self._items.pop(key, None)
+            return default if item is None else item[1]
+
+    def expire(self):
+        """Удаляет устаревшие записи и возвращает их количество."""
+        with self.lock:
+            return self._expire(self.clock())
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _expire(self, now):
+        expired = 0
+        deadline = now - self.ttl
+        while self._items:
+            key, (accessed, value) = next(iter(self._items.items()))
+            if accessed > deadline:
+                break
+            del self._items[key]
+            expired += 1
+            self._removed(key, value)
+        self.expirations += expired
+        return expired
+
+    def _removed(self, key, value):
+        if self.on_remove is not None:
+            self.on_remove(key, value)
@@ -0,0 +1,246 @@
+"""Проверка ввода пользователя.
+
+Одни и те же правила используются в пошаговом диалоге (обработчики
+состояний UserState) и в расчете одной строкой (/quote или текст вида
+«физ Казань 105 5 30 12 0 3»). При ошибке бросается InputError с текстом
+ответа пользователю.
+"""
+import drivers
+import messages
+import tariff
+
+# Короткие названия вида страхователя для ввода одной строкой
+INSURANCE_ALIASES = {
+    'физ': 'Физическое лицо',
+    'фл': 'Физическое лицо',
+    'физлицо': 'Физическое лицо',
+    'юр': 'Юридическое лицо',
+    'юл': 'Юридическое лицо',
+    'юрлицо': 'Юридическое лицо',
+    'огр': 'Ограниченная страховка',
+    'ограниченная': 'Ограниченная страховка',
+}
+NOVICE_WORDS = ('новичок', 'новый', messages.YES.lower())
+QUOTE_MIN_WORDS = 7  # вид, город и пять чисел для новичка
+QUOTE_COMMANDS = ('quote', 'расчет', 'осаго')
+DEFAULT_INSURANCE_TYPE = 'Физическое лицо'
+CITY_SUGGESTIONS = 6  # сколько похожих городов предлагать кнопками
+
+
+class InputError(ValueError):
+    """Неверный ввод; str(error) — текст ответа пользователю.
+
+    options — подходящие варианты ввода (например, найденные города) для кнопок.
+    """
+
+    def __init__(self, message, field=None, options=None):
+        super().__init__(message)
+        self.field = field
+        self.options = options or []
+
+
+def _normalize(text):
+    return ' '.join(text.split()).lower().replace('ё', 'е')
+
+
+def parse_insurance_type(text):
+    if text in tariff.KO_COEFFICIENTS:
+        return text
+    key = _normalize(text or '')
+    for name in tariff.KO_COEFFICIENTS:
+        if _normalize(name) == key:
+            return name
+    if key in INSURANCE_ALIASES:
+        return INSURANCE_ALIASES[key]
+    raise InputError(messages.CHOOSE_OPTION, 'insurance_type')
+
+
+def parse_city(text):
+    """Город из таблицы КТ; иначе InputError с похожими названиями в options."""
+    index = tariff.current().city_index
+    city = index.find(text or '')
+    if city is not None:
+        return city
+    options = index.search(text or '', limit=CITY_SUGGESTIONS)
+    if not options:
+        raise InputError(messages.CITY_NOT_FOUND, 'city')
+    raise InputError(messages.CITY_SUGGESTIONS.format(cities=', '.join(options)), 'city', options)
+
+
+def parse_power(text):
+    try:
+        power = float(text.replace(',', '.'))
+    except ValueError:
+        raise InputError(messages.POWER_NOT_NUMBER, 'power')
+    if not power > 0:
+        raise InputError(messages.POWER_NOT_POSITIVE, 'power')
+    return power
+
+
+def parse_experience(text):
+    try:
+        experience = float(text.replace(',', '.'))
+    except ValueError:
+        raise InputError(messages.EXPERIENCE_NOT_NUMBER, 'experience')
+    if not experience >= 0:
+        raise InputError(messages.EXPERIENCE_NEGATIVE, 'experience')
+    return experience
+
+
+def parse_age(text):
+    try:
+        age = int(text)
+    except ValueError:
+        raise InputError(messages.AGE_NOT_INTEGER, 'age')
+    if age < 18:
+        raise InputError(messages.AGE_TOO_LOW, 'age')
+    return age
+
+
+def parse_period(text):
+    try:
+        period = int(text)
+    except ValueError:
+        raise InputError(messages.PERIOD_NOT_NUMBER, 'period')
+    if not 3 <= period <= 12:
+        raise InputError(messages.PERIOD_OUT_OF_RANGE, 'period')
+    return period
+
+
+def parse_yes_no(text):
+    if text in (messages.YES, messages.NO):
+        return text == messages.YES
+    raise InputError(messages.ANSWER_YES_NO, 'is_novice')
+
+
+def parse_accidents(text):
+    try:
+        accidents = int(text)
+    except ValueError:
+        raise InputError(messages.ACCIDENTS_NOT_NUMBER, 'accidents')
+    if accidents < 0:
+        raise InputError(messages.ACCIDENTS_NEGATIVE, 'accidents')
+    return accidents
+
+
+def parse_accident_period(text):
+    try:
+        accident_period = int(text)
+    except ValueError:
+        raise InputError(messages.PERIOD_NOT_NUMBER, 'accident_period')
+    if not 1 <= accident_period <= 12:
+        raise InputError(messages.ACCIDENT_PERIOD_OUT_OF_RANGE, 'accident_period')
+    return accident_period
+
+
+def parse_compare_cities(text):
+    """Города через запятую после /compare; пустой список — города по умолчанию."""
+    words = (text or '').split(maxsplit=1)
+    if words and words[0].startswith('/'):
+        words = words[1:]
+    parts = [part.strip() for part in ' '.join(words).replace(';', ',').split(',')]
+    return list(dict.fromkeys(parse_city(part) for part in parts if part))
+
+
+def parse_drivers(text):
+    """Водители по одному в строке: «стаж возраст [аварии период]».
+
+    Возвращает список drivers.Driver; начинающим (КБМ 1.17) считается
+    водитель со стажем меньше drivers.NOVICE_EXPERIENCE лет без указанных
+    аварий. Ошибка указывает номер строки.
+    """
+    lines = [line.strip() for line in (text or '').replace(';', '\n').splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        raise InputError(messages.DRIVERS_LINE_FORMAT, 'drivers')
+    result = []
+    for number, line in enumerate(lines, 1):
+        words = line.split()
+        try:
+            if len(words) not in (2, 4):
+                raise InputError(messages.DRIVERS_LINE_FORMAT, 'drivers')
+            experience = parse_experience(words[0])
+            age = parse_age(words[1])
+            accidents = parse_accidents(words[2]) if len(words) == 4 else 0
+            accident_period = parse_accident_period(words[3]) if len(words) == 4 else 0
+        except InputError as e:
+            raise InputError(
+                messages.DRIVERS_LINE_INVALID.format(line=number, text=line, error=e), 'drivers'
+            ) from None
+        result.append(drivers.Driver(experience, age, accidents=accidents, accident_period=accident_period))
+    return result
+
+
+def _is_number(word):
+    try:
+        float(word.replace(',', '.'))
+        return True
+    except ValueError:
+        return False
+
+
+def _take_insurance_type(words, required):
+    # Полное название вида («Физическое лицо») занимает два слова
+    for size in (2, 1):
+        try:
+            return parse_insurance_type(' '.join(words[:size])), words[size:]
+        except InputError:
+            pass
+    if required:
+        raise InputError(messages.CHOOSE_OPTION, 'insurance_type')
+    return DEFAULT_INSURANCE_TYPE, words
+
+
+def parse_quote(text, partial=False):
+    """Разбирает все параметры расчета из одной строки.
+
+    Формат: [/quote] <вид> <город> <мощность> <стаж> <возраст> <период>
+    <аварии> <период аварий>; для начинающего водителя вместо аварий —
+    слово «новичок». Возвращает словарь данных расчета в том же виде,
+    что собирает пошаговый диалог.
+
+    partial=True (инлайн-режим) разрешает не указывать вид страхователя
+    (физическое лицо) и историю аварий (базовый КБМ tariff.BASE_KBM, без is_novice).
+    """
+    words = (text or '').split()
+    if words and (words[0].startswith('/') or words[0].lower() in QUOTE_COMMANDS):
+        words = words[1:]
+    if len(words) < (5 if partial else QUOTE_MIN_WORDS):
+        raise InputError(messages.QUOTE_USAGE)
+
+    insurance_type, words = _take_insurance_type(words, required=not partial)
+
+    # Название города может состоять из нескольких слов: «Нижний Новгород»
+    city_words = 0
+    while city_words < len(words) and not _is_number(words[city_words]):
+        city_words += 1
+    city = parse_city(' '.join(words[:city_words]))
+    numbers = words[city_words:]
+
+    novice = len(numbers) == 5 and numbers[4].lower() in NOVICE_WORDS
+    history = len(numbers) > 4
+    if not (len(numbers) == 6 or novice or (partial and len(numbers) == 4)):
+        raise InputError(messages.QUOTE_USAGE)
+
+    period = parse_period(numbers[3])
+    data = {
+        'insurance_type': insurance_type,
+        'ko': tariff.KO_COEFFICIENTS[insurance_type],
+        'city': city,
+        'kt': tariff.KT_COEFFICIENTS[city],
+        'power': parse_power(numbers[0]),
+        'experience': parse_experience(numbers[1]),
+        'age': parse_age(numbers[2]),
+        'period': period,
+        'kc': tariff.KC_COEFFICIENTS[period],
+    }
+    if not history:
+        data['kbm'] = tariff.BASE_KBM
+    elif novice:
+        data.update(is_novice=True, kbm=tariff.NOVICE_KBM)
+    else:
+        data['is_novice'] = False
+        data['accidents'] = parse_accidents(numbers[4])
+        data['accident_period'] = parse_accident_period(numbers[5])
+        data['kbm'] = tariff.kbm_coef(data['accident_period'], data['accidents'])
+    return data
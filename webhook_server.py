@@ -0,0 +1,146 @@
+"""Прием обновлений Telegram через вебхук.
+
+Встроенный HTTP-сервер принимает POST с обновлениями, проверяет секретный
+токен и раскладывает обновления по ограниченным очередям рабочих потоков.
+Обновления одного чата всегда попадают в одну очередь, поэтому порядок
+шагов диалога сохраняется, а медленный send_message задерживает только
+свой поток.
+"""
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def update_chat_id(update):
+    """Чат, к которому относится обновление (для распределения по потокам)."""
+    for name in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        item = getattr(update, name, None)
+        if item is not None:
+            return item.chat.id
+    if update.callback_query is not None:
+        return update.callback_query.from_user.id
+    if update.inline_query is not None:
+        return update.inline_query.from_user.id
+    return update.update_id
+
+
+class UpdateWorkers:
+    """Пул потоков с ограниченной очередью на каждый поток (общий для вебхука и polling.Poller)."""
+
+    def __init__(self, handle, workers=4, queue_size=100, name='webhook-worker'):
+        self.handle = handle
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.threads = [
+            threading.Thread(target=self._run, args=(q,), name=f'{name}-{i}', daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, update, block=False):
+        """Ставит обновление в очередь. False — очередь переполнена (только при block=False)."""
+        q = self.queues[hash(update_chat_id(update)) % len(self.queues)]
+        try:
+            q.put(update, block=block)
+            return True
+        except queue.Full:
+            return False
+
+    def join(self):
+        """Ждет, пока все поставленные в очередь обновления обработаны."""
+        for q in self.queues:
+            q.join()
+
+    def stop(self, timeout=None):
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _run(self, q):
+        while True:
+            update = q.get()
+            if update is None:
+                q.task_done()
+                break
+            try:
+                self.handle([update])
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                q.task_done()
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Telegram открывает до 40 соединений одновременно; стандартной очереди из 5 не хватает
+    request_queue_size = 128
+
+    def __init__(self, address, workers, path='/', secret=None):
+        super().__init__(address, WebhookRequestHandler)
+        self.workers = workers
+        self.webhook_path = path
+        self.secret = secret
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        if self.path != server.webhook_path:
+            return self._reply(404)
+        if server.secret and self.headers.get(SECRET_HEADER) != server.secret:
+            return self._reply(403)
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= MAX_BODY_SIZE:
+            return self._reply(400)
+        try:
+            update = types.Update.de_json(json.loads(self.rfile.read(length)))
+        except Exception:
+            return self._reply(400)
+
+        # При переполнении отвечаем 503 — Telegram повторит доставку позже
+        self._reply(200 if server.workers.submit(update) else 503)
+
+    def do_GET(self):
+        self._reply(200 if self.path == '/health' else 404)
+
+    def _reply(self, code):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("webhook: " + format, *args)
+
+
+def run_webhook(bot, host, port, path='/', secret=None, url=None, workers=4, queue_size=100):
+    """Запускает сервер вебхука и блокирует поток до остановки.
+
+    Если передан url, вебхук регистрируется в Telegram с тем же секретом.
+    """
+    # Порядок и параллелизм обработки задает пул вебхука, а не пул бота
+    bot.threaded = False
+    update_workers = UpdateWorkers(bot.process_new_updates, workers, queue_size)
+    update_workers.start()
+    server = WebhookServer((host, port), update_workers, path, secret)
+    if url:
+        bot.remove_webhook()
+        bot.set_webhook(url=url, secret_token=secret)
+    logger.info(f"Вебхук слушает {host}:{server.server_port}{path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        update_workers.stop(timeout=10)